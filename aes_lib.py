@@ -1,7 +1,21 @@
 # AES Library Module
 # Contains shared functions for AES encryption used by both app.py and tests
 
-from flask import render_template, current_app
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import partial, wraps
+from operator import itemgetter
+
+from flask import render_template, current_app, has_app_context
+
+# numpy is only needed for the batched API. It is imported on first use
+# (see _load_numpy) to keep it off the import path of the web app.
+np = None
+_numpy_loaded = False
 
 # AES S-box
 Sbox = [
@@ -39,9 +53,61 @@ Sbox = [
     0x41, 0x99, 0x2d, 0x0f, 0xb0, 0x54, 0xbb, 0x16
 ]
 
+# Inverse S-box, derived from the S-box once at import
+InvSbox = [0] * 256
+for _i, _v in enumerate(Sbox):
+    InvSbox[_v] = _i
+del _i, _v
+
 # Round constants
 Rcon = [0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x1B, 0x36]
 
+# Number of rounds for each supported key length in bytes
+KEY_ROUNDS = {16: 10, 24: 12, 32: 14}
+
+# ShiftRows / InvShiftRows as index permutations over a flat 16-byte block.
+# The block is stored column by column, so byte (row, col) lives at row + 4*col.
+SHIFT_ROWS_INDEX = [r + 4 * ((c + r) % 4) for c in range(4) for r in range(4)]
+INV_SHIFT_ROWS_INDEX = [r + 4 * ((c - r) % 4) for c in range(4) for r in range(4)]
+
+def _xtime(a):
+    """
+    Multiply a byte by x (0x02) in GF(2^8).
+    """
+    a <<= 1
+    if a & 0x100:
+        a ^= 0x11B
+    return a
+
+# GF(2^8) antilog/log tables over the generator 0x03. GF_EXP is doubled in
+# length so that GF_EXP[GF_LOG[a] + GF_LOG[b]] never needs a modulo.
+GF_EXP = [0] * 510
+GF_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    GF_EXP[_i] = GF_EXP[_i + 255] = _x
+    GF_LOG[_x] = _i
+    _x ^= _xtime(_x)
+del _i, _x
+
+def galois_mult(a, b):
+    """
+    Multiply two bytes in GF(2^8) using the log/antilog tables.
+    """
+    if a == 0 or b == 0:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+# Fixed-coefficient multiplication tables for MixColumns (x2, x3) and
+# InvMixColumns (x9, x11, x13, x14)
+MUL2 = [_xtime(x) for x in range(256)]
+MUL3 = [MUL2[x] ^ x for x in range(256)]
+MUL9 = [galois_mult(x, 9) for x in range(256)]
+MUL11 = [galois_mult(x, 11) for x in range(256)]
+MUL13 = [galois_mult(x, 13) for x in range(256)]
+MUL14 = [galois_mult(x, 14) for x in range(256)]
+GF_MUL = {1: list(range(256)), 2: MUL2, 3: MUL3, 9: MUL9, 11: MUL11, 13: MUL13, 14: MUL14}
+
 def pad(data):
     """
     Pad the data to a multiple of 16 bytes.
@@ -49,33 +115,425 @@ def pad(data):
     length = 16 - (len(data) % 16)
     return data + bytes([length]) * length
 
+def unpad(data):
+    """
+    Remove the padding added by pad().
+    """
+    if not data or len(data) % 16:
+        raise ValueError("Padded data must be a non-empty multiple of 16 bytes")
+    length = data[-1]
+    if not 1 <= length <= 16 or data[-length:] != bytes([length]) * length:
+        raise ValueError("Invalid padding")
+    return data[:-length]
+
 def bytes_to_matrix(text):
     """
-    Convert a 16-byte array into a 4x4 matrix.
-    The bytes are arranged column by column.
+    Convert a 16-byte array into a 4x4 matrix (or a 24/32-byte key into a
+    4x6/4x8 matrix). The bytes are arranged column by column.
     """
-    matrix = [[0 for _ in range(4)] for _ in range(4)]
+    cols = len(text) // 4
+    matrix = [[0 for _ in range(cols)] for _ in range(4)]
     for i in range(4):
-        for j in range(4):
+        for j in range(cols):
             matrix[i][j] = text[i + 4*j]
     return matrix
 
 def matrix_to_bytes(matrix):
     """
-    Convert a 4x4 matrix into a 16-byte array.
+    Convert a 4xN matrix into a 4N-byte array.
     The bytes are arranged column by column.
     """
-    result = bytearray(16)
+    cols = len(matrix[0])
+    result = bytearray(4 * cols)
     for i in range(4):
-        for j in range(4):
+        for j in range(cols):
             result[i + 4*j] = matrix[i][j]
     return bytes(result)
 
+def _hex_list(values):
+    return f"[{', '.join(f'0x{b:02X}' for b in values)}]"
+
+def _format_sub_bytes(record):
+    state = record['before']
+    return [
+        (f"S-box[0x{state[i][j]:02X}]", f"0x{Sbox[state[i][j]]:02X}")
+        for i in range(4) for j in range(4)
+    ]
+
+def _format_shift_rows(record):
+    return [
+        ("Row 0", "Unchanged"),
+        ("Row 1", "Left-rotate by 1"),
+        ("Row 2", "Left-rotate by 2"),
+        ("Row 3", "Left-rotate by 3"),
+    ]
+
+def _format_mix_columns(record):
+    new_state = record['after']
+    return [
+        (f"Column {col}, Row {row}", f"Result: 0x{new_state[row][col]:02X}")
+        for col in range(4) for row in range(4)
+    ]
+
+def _format_add_round_key(record):
+    state, round_key = record['before'], record['round_key']
+    # Decryption traces use round keys in reverse and say which one explicitly
+    key_index = record.fields.get('key_index', record.round)
+    key_label = "Key" if key_index == 0 else f"RoundKey{key_index}"
+    return [
+        (
+            f"State[{i}][{j}] ⊕ {key_label}[{i}][{j}]",
+            f"0x{state[i][j]:02X} ⊕ 0x{round_key[i][j]:02X} = 0x{state[i][j] ^ round_key[i][j]:02X}"
+        )
+        for i in range(4) for j in range(4)
+    ]
+
+def _format_inv_sub_bytes(record):
+    state = record['before']
+    return [
+        (f"InvS-box[0x{state[i][j]:02X}]", f"0x{InvSbox[state[i][j]]:02X}")
+        for i in range(4) for j in range(4)
+    ]
+
+def _format_inv_shift_rows(record):
+    return [
+        ("Row 0", "Unchanged"),
+        ("Row 1", "Right-rotate by 1"),
+        ("Row 2", "Right-rotate by 2"),
+        ("Row 3", "Right-rotate by 3"),
+    ]
+
+def _format_key_schedule_words(record):
+    n, nk = record.round, record['nk']
+    rows = [(f"Round {n} Key Generation", f"Creating round key for round {n} (AES-{nk * 32})")]
+    for word in record['words']:
+        i = word['index']
+        if word['kind'] == 'key':
+            rows.append((f"w{i} taken from the cipher key", _hex_list(word['result'])))
+            continue
+        if word['kind'] == 'rcon':
+            rows.append((f"RotWord(w{i - 1})", _hex_list(word['rotated'])))
+            rows.append((f"SubWord and XOR with Rcon[{i // nk - 1}]=0x{word['rcon']:02X}", _hex_list(word['temp'])))
+        elif word['kind'] == 'subword':
+            rows.append((f"SubWord(w{i - 1})", _hex_list(word['temp'])))
+        rows.append((f"w{i} = w{i - nk} ⊕ Temp",
+                     f"{_hex_list(word['back'])} ⊕ {_hex_list(word['temp'])} = {_hex_list(word['result'])}"))
+    return rows
+
+def _format_key_expansion(record):
+    # AES-192/256 schedules do not line up with round keys; they record
+    # per-word derivations instead
+    if 'words' in record.fields:
+        return _format_key_schedule_words(record)
+    n = record.round
+    prev_key, new_key = record['prev_key'], record['new_key']
+    substituted, rcon = record['substituted'], record['rcon']
+    rows = [
+        (f"Round {n} Key Generation", f"Creating round key for round {n}"),
+        ("Last column of previous round key", _hex_list(record['last_col'])),
+        ("After rotation (RotWord)", _hex_list(record['rotated'])),
+        ("After S-box substitution (SubWord)", _hex_list(substituted)),
+        (f"XOR first byte with round constant (Rcon[{n - 1}]=0x{rcon:02X})",
+         f"0x{substituted[0] ^ rcon:02X} ⊕ 0x{rcon:02X} = 0x{substituted[0]:02X}"),
+        (f"Generate first column of round key {n}", "Applying transformations to generate the first column"),
+    ]
+    for j in range(4):
+        rows.append((f"Word[0][{j}] = PrevKey[{j}][0] ⊕ Temp[{j}]",
+                     f"0x{prev_key[j][0]:02X} ⊕ 0x{substituted[j]:02X} = 0x{new_key[j][0]:02X}"))
+    rows.append((f"Generate remaining columns of round key {n}", "Generating columns 1-3 using XOR operations"))
+    for col in range(1, 4):
+        for row in range(4):
+            rows.append((f"Word[{col}][{row}] = PrevKey[{row}][{col}] ⊕ Word[{col-1}][{row}]",
+                         f"0x{prev_key[row][col]:02X} ⊕ 0x{new_key[row][col-1]:02X} = 0x{new_key[row][col]:02X}"))
+    return rows
+
+# Lazy formatters turning a record's raw integers into (label, value) rows
+TRACE_FORMATTERS = {
+    'SubBytes': _format_sub_bytes,
+    'ShiftRows': _format_shift_rows,
+    'MixColumns': _format_mix_columns,
+    'AddRoundKey': _format_add_round_key,
+    'KeyExpansion': _format_key_expansion,
+    'InvSubBytes': _format_inv_sub_bytes,
+    'InvShiftRows': _format_inv_shift_rows,
+    'InvMixColumns': _format_mix_columns,
+}
+
+class TraceRecord:
+    """
+    One operation of one round. `fields` holds raw integers and matrices only;
+    display strings are built on demand by rows().
+    """
+    __slots__ = ('round', 'op', 'fields')
+
+    def __init__(self, round, op, fields):
+        self.round = round
+        self.op = op
+        self.fields = fields
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def __repr__(self):
+        return f"TraceRecord(round={self.round}, op={self.op!r})"
+
+    def rows(self):
+        """
+        Format the record as (label, value) explanation rows.
+        """
+        return TRACE_FORMATTERS[self.op](self)
+
+class Trace:
+    """
+    Structured trace of an AES run with one TraceRecord per round and
+    operation. Records are indexed by (round, op) and by round, so lookups
+    are O(1). Pass a Trace as the `log` argument of the step functions;
+    `round` is the round that step functions without their own round
+    number (SubBytes, ShiftRows, MixColumns, AddRoundKey) record into.
+    """
+    __slots__ = ('round', 'meta', '_records', '_by_round')
+
+    def __init__(self):
+        self.round = 0
+        self.meta = {}
+        self._records = {}
+        self._by_round = {}
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def add(self, op, round=None, **fields):
+        """
+        Record an operation for `round` (default: the current round).
+        """
+        record = TraceRecord(self.round if round is None else round, op, fields)
+        self._records[(record.round, op)] = record
+        self._by_round.setdefault(record.round, []).append(record)
+        return record
+
+    def get(self, round, op, default=None):
+        """
+        Return the record for (round, op), or `default`.
+        """
+        return self._records.get((round, op), default)
+
+    def rounds(self):
+        """
+        Round numbers in the order they were first recorded.
+        """
+        return list(self._by_round)
+
+    def round_records(self, round):
+        """
+        Records of one round in the order they were added.
+        """
+        return self._by_round.get(round, [])
+
+    def rows(self, round, op):
+        """
+        Formatted explanation rows for (round, op).
+        """
+        return self._records[(round, op)].rows()
+
+# Stage timings of the request being handled, {stage: [wall seconds, calls]},
+# or None outside Metrics.start_request()/finish_request()
+_request_timings = ContextVar('aes_request_timings', default=None)
+
+class _Stage:
+    """
+    Context manager timing one stage into a Metrics instance.
+    """
+    __slots__ = ('metrics', 'name', 'wall', 'cpu')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+
+class _NullStage:
+    """
+    Shared no-op stage used while metrics are disabled.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class Metrics:
+    """
+    Opt-in, thread-safe per-stage wall and CPU time histograms plus labelled
+    counters, exported in the Prometheus text format. While disabled every
+    instrumented call costs one attribute check.
+    """
+
+    # Histogram bucket upper bounds in seconds
+    BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+    def __init__(self, enabled=False, prefix='aes'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._caches = {}
+
+    def stage(self, name):
+        """
+        Context manager timing the enclosed block as stage `name`.
+        """
+        return _Stage(self, name) if self.enabled else _NULL_STAGE
+
+    def observe(self, name, wall, cpu):
+        """
+        Record one run of stage `name` taking `wall` and `cpu` seconds.
+        """
+        index = bisect_left(self.BUCKETS, wall), bisect_left(self.BUCKETS, cpu)
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = {
+                    clock: [[0] * (len(self.BUCKETS) + 1), 0.0] for clock in ('wall', 'cpu')
+                }
+            for clock, seconds, bucket in (('wall', wall, index[0]), ('cpu', cpu, index[1])):
+                histogram[clock][0][bucket] += 1
+                histogram[clock][1] += seconds
+        timings = _request_timings.get()
+        if timings is not None:
+            entry = timings.setdefault(name, [0.0, 0])
+            entry[0] += wall
+            entry[1] += 1
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Add `amount` to counter `name` (without prefix or _total) with `labels`.
+        """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_cache(self, stage, cache):
+        """
+        Export the hit/miss counters of `cache` (an LRUCache memoising
+        `stage`) alongside the timings.
+        """
+        with self._lock:
+            self._caches[stage] = cache
+
+    def cache_stats(self):
+        """
+        Return {stage: LRUCache.stats()} for every registered cache.
+        """
+        with self._lock:
+            caches = dict(self._caches)
+        return {stage: cache.stats() for stage, cache in caches.items()}
+
+    def start_request(self):
+        """
+        Start collecting the stage timings of the current request.
+        """
+        _request_timings.set({})
+
+    def finish_request(self):
+        """
+        Stop collecting and return {stage: (wall seconds, calls)} for the request.
+        """
+        timings = _request_timings.get() or {}
+        _request_timings.set(None)
+        return {name: tuple(entry) for name, entry in timings.items()}
+
+    def reset(self):
+        """
+        Drop all recorded histograms and counters.
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def to_prometheus(self):
+        """
+        Render every histogram and counter in the Prometheus text format.
+        """
+        with self._lock:
+            histograms = {name: {clock: (list(counts), total) for clock, (counts, total) in h.items()}
+                          for name, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for clock, text in (('wall', 'Wall-clock'), ('cpu', 'Thread CPU')):
+            metric = f"{self.prefix}_stage_{clock}_seconds"
+            lines.append(f"# HELP {metric} {text} time per instrumented stage.")
+            lines.append(f"# TYPE {metric} histogram")
+            for name in sorted(histograms):
+                counts, total = histograms[name][clock]
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS + ('+Inf',), counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{name}"}} {total:.9f}')
+                lines.append(f'{metric}_count{{stage="{name}"}} {cumulative}')
+
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter, labels), value in sorted(counters.items()):
+                if counter == name:
+                    label_text = ','.join(f'{label}="{value}"' for label, value in labels)
+                    lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+
+        caches = self.cache_stats()
+        if caches:
+            for name, metric, kind in (('hits', 'cache_hits_total', 'counter'),
+                                       ('misses', 'cache_misses_total', 'counter'),
+                                       ('hit_ratio', 'cache_hit_ratio', 'gauge')):
+                metric = f"{self.prefix}_{metric}"
+                lines.append(f"# TYPE {metric} {kind}")
+                for stage in sorted(caches):
+                    value = caches[stage][name]
+                    lines.append(f'{metric}{{stage="{stage}"}} {round(value, 6) if kind == "gauge" else value}')
+        return '\n'.join(lines) + '\n'
+
+# Process-wide metrics, enabled with AES_METRICS=1
+METRICS = Metrics(enabled=os.environ.get('AES_METRICS', '').lower() in ('1', 'true', 'yes'))
+
+def timed(stage):
+    """
+    Decorator timing every call of the function as `stage` in METRICS.
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+            with _Stage(METRICS, stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
 def sub_bytes(state, log=None):
     """
     Apply the S-box substitution to each byte in the state matrix.
     """
-    return [[Sbox[b] for b in row] for row in state]
+    new_state = [[Sbox[b] for b in row] for row in state]
+    if isinstance(log, Trace):
+        log.add('SubBytes', before=state, after=new_state)
+    return new_state
 
 def shift_rows(state, log=None):
     """
@@ -91,98 +549,126 @@ def shift_rows(state, log=None):
         state[2][2:] + state[2][:2],
         state[3][3:] + state[3][:3]
     ]
-    if log is not None:
+    if isinstance(log, Trace):
+        log.add('ShiftRows', before=state, after=shifted)
+    elif log is not None:
         log.append(("ShiftRows Transformation", shifted))
     return shifted
 
 def mix_columns(state, log=None):
     """
     Mix the columns of the state matrix using the Galois field multiplication.
+    Products come from the precomputed MUL2/MUL3 tables.
     """
-    mix_matrix = [
-        [2, 3, 1, 1],
-        [1, 2, 3, 1],
-        [1, 1, 2, 3],
-        [3, 1, 1, 2]
-    ]
-
-    def galois_mult(a, b):
-        p = 0
-        for _ in range(8):
-            if b & 1:
-                p ^= a
-            carry = a & 0x80
-            a <<= 1
-            if carry:
-                a ^= 0x1B
-            a &= 0xFF
-            b >>= 1
-        return p
-
+    mul2, mul3 = MUL2, MUL3
     new_state = [[0] * 4 for _ in range(4)]
 
-    # Create a detailed visual explanation for MixColumns
-    if log is not None:
-        # Calculate the results for column 0
-        col0_results = []
-        for row in range(4):
-            result = (
-                galois_mult(state[0][0], mix_matrix[row][0]) ^
-                galois_mult(state[1][0], mix_matrix[row][1]) ^
-                galois_mult(state[2][0], mix_matrix[row][2]) ^
-                galois_mult(state[3][0], mix_matrix[row][3])
-            )
-            col0_results.append(result)
-
     # Calculate the new state
     for col in range(4):
-        for row in range(4):
-            new_state[row][col] = (
-                galois_mult(state[0][col], mix_matrix[row][0]) ^
-                galois_mult(state[1][col], mix_matrix[row][1]) ^
-                galois_mult(state[2][col], mix_matrix[row][2]) ^
-                galois_mult(state[3][col], mix_matrix[row][3])
-            )
-            if log is not None:
-                log.append((
-                    f"Column {col}, Row {row}",
-                    f"Result: 0x{new_state[row][col]:02X}"
-                ))
-
-    # Complete the detailed explanation with the output matrix
-    if log is not None:
-        # Check if we're in a Flask application context
-        try:
-            # Try to access current_app to see if we're in a Flask context
-            app = current_app._get_current_object()
-
-            # If we are, use the template
-            mix_columns_html = render_template(
-                'partials/mix_columns.html',
-                state=state,
-                new_state=new_state,
-                col0_results=col0_results
-            )
-        except RuntimeError:
-            # If we're not in a Flask context (e.g., during testing),
-            # generate a simple HTML string instead
-            mix_columns_html = f"""
+        a0, a1, a2, a3 = state[0][col], state[1][col], state[2][col], state[3][col]
+        new_state[0][col] = mul2[a0] ^ mul3[a1] ^ a2 ^ a3
+        new_state[1][col] = a0 ^ mul2[a1] ^ mul3[a2] ^ a3
+        new_state[2][col] = a0 ^ a1 ^ mul2[a2] ^ mul3[a3]
+        new_state[3][col] = mul3[a0] ^ a1 ^ a2 ^ mul2[a3]
+
+    if isinstance(log, Trace):
+        log.add('MixColumns', before=state, after=new_state)
+    elif log is not None:
+        log.extend(_format_mix_columns(TraceRecord(None, 'MixColumns', {'after': new_state})))
+        # Add the detailed HTML explanation as a single log entry
+        log.append(("MixColumns Detailed", mix_columns_html(state, new_state)))
+
+    return new_state
+
+def mix_columns_html(state, new_state):
+    """
+    Render the detailed MixColumns explanation for one state transition,
+    cached in MIX_COLUMNS_HTML_CACHE by the two states.
+    """
+    cache_key = (matrix_to_bytes(state), matrix_to_bytes(new_state), has_app_context())
+    return MIX_COLUMNS_HTML_CACHE.get_or_compute(cache_key, lambda: _render_mix_columns_html(state, new_state))
+
+@timed('mix_columns_html')
+def _render_mix_columns_html(state, new_state):
+    """
+    Render the detailed MixColumns explanation (uncached).
+    """
+    # The results for column 0 shown in the partial
+    col0_results = [new_state[row][0] for row in range(4)]
+
+    # Check if we're in a Flask application context
+    try:
+        # Try to access current_app to see if we're in a Flask context
+        app = current_app._get_current_object()
+
+        # If we are, use the template
+        return render_template(
+            'partials/mix_columns.html',
+            state=state,
+            new_state=new_state,
+            col0_results=col0_results
+        )
+    except RuntimeError:
+        # If we're not in a Flask context (e.g., during testing),
+        # generate a simple HTML string instead
+        return f"""
             <div class="key-expansion-explanation">
                 <h4>MixColumns Transformation</h4>
                 <p>This is a simplified explanation for non-Flask contexts.</p>
             </div>
             """
 
-        # Add the detailed HTML explanation as a single log entry
-        log.append(("MixColumns Detailed", mix_columns_html))
+def add_round_key(state, round_key, log=None):
+    """
+    XOR each byte of the state matrix with the corresponding byte of the round key.
+    """
+    new_state = [[state[i][j] ^ round_key[i][j] for j in range(4)] for i in range(4)]
+    if isinstance(log, Trace):
+        log.add('AddRoundKey', before=state, after=new_state, round_key=round_key)
+    return new_state
 
+def inv_sub_bytes(state, log=None):
+    """
+    Apply the inverse S-box substitution to each byte in the state matrix.
+    """
+    new_state = [[InvSbox[b] for b in row] for row in state]
+    if isinstance(log, Trace):
+        log.add('InvSubBytes', before=state, after=new_state)
     return new_state
 
-def add_round_key(state, round_key, log=None):
+def inv_shift_rows(state, log=None):
     """
-    XOR each byte of the state matrix with the corresponding byte of the round key.
+    Undo ShiftRows.
+    Row 0: unchanged
+    Row 1: right-rotate by 1
+    Row 2: right-rotate by 2
+    Row 3: right-rotate by 3
     """
-    return [[state[i][j] ^ round_key[i][j] for j in range(4)] for i in range(4)]
+    shifted = [
+        state[0],
+        state[1][3:] + state[1][:3],
+        state[2][2:] + state[2][:2],
+        state[3][1:] + state[3][:1]
+    ]
+    if isinstance(log, Trace):
+        log.add('InvShiftRows', before=state, after=shifted)
+    return shifted
+
+def inv_mix_columns(state, log=None):
+    """
+    Undo MixColumns by multiplying each column with the inverse matrix
+    [0E 0B 0D 09] using the precomputed MUL9/MUL11/MUL13/MUL14 tables.
+    """
+    new_state = [[0] * 4 for _ in range(4)]
+    for col in range(4):
+        a0, a1, a2, a3 = state[0][col], state[1][col], state[2][col], state[3][col]
+        new_state[0][col] = MUL14[a0] ^ MUL11[a1] ^ MUL13[a2] ^ MUL9[a3]
+        new_state[1][col] = MUL9[a0] ^ MUL14[a1] ^ MUL11[a2] ^ MUL13[a3]
+        new_state[2][col] = MUL13[a0] ^ MUL9[a1] ^ MUL14[a2] ^ MUL11[a3]
+        new_state[3][col] = MUL11[a0] ^ MUL13[a1] ^ MUL9[a2] ^ MUL14[a3]
+    if isinstance(log, Trace):
+        log.add('InvMixColumns', before=state, after=new_state)
+    return new_state
 
 def rotate_word(word):
     """
@@ -190,167 +676,1328 @@ def rotate_word(word):
     """
     return word[1:] + word[:1]
 
-def expand_key(key, log=None):
+@timed('key_expansion_html')
+def key_expansion_html(record):
     """
-    Expands the 16-byte key into 11 round keys according to the AES key schedule.
-    Returns a list of 11 round keys, each as a 4x4 matrix.
+    Render the detailed explanation for one 'KeyExpansion' trace record.
     """
-    # First round key is the original key
-    key_bytes = key
-    key_matrix = bytes_to_matrix(key_bytes)
-    round_keys = [key_matrix]
-
-    # Generate the remaining 10 round keys
-    for i in range(10):
-        # Create a detailed visual explanation for this round key generation
-        if log is not None:
-            # Take the last column of the previous round key
-            last_col = [round_keys[i][j][3] for j in range(4)]
-            log.append((f"Round {i+1} Key Generation", f"Creating round key for round {i+1}"))
-
-            # Rotate, substitute, and XOR with round constant
-            rotated = rotate_word(last_col)
-            substituted = [Sbox[b] for b in rotated]
-
-            original_first_byte = substituted[0]
-            substituted[0] ^= Rcon[i]
-
-            # Generate the first column of the new round key
-            new_key = [[0 for _ in range(4)] for _ in range(4)]
+    new_key = record['new_key']
+    round_num = record.round
 
-            for j in range(4):
-                new_key[j][0] = round_keys[i][j][0] ^ substituted[j]
+    # Check if we're in a Flask application context
+    try:
+        # Try to access current_app to see if we're in a Flask context
+        app = current_app._get_current_object()
 
-            # Store the first column for the template
-            new_key_col0 = [new_key[j][0] for j in range(4)]
-
-            # Generate the remaining columns
-            new_key_cols = {1: [], 2: [], 3: []}
-            for col in range(1, 4):
-                for row in range(4):
-                    new_key[row][col] = round_keys[i][row][col] ^ new_key[row][col-1]
-                new_key_cols[col] = [new_key[j][col] for j in range(4)]
-
-            # Check if we're in a Flask application context
-            try:
-                # Try to access current_app to see if we're in a Flask context
-                app = current_app._get_current_object()
-
-                # If we are, use the template
-                key_html = render_template(
-                    'partials/key_expansion.html',
-                    prev_key=round_keys[i],
-                    round_num=i+1,
-                    last_col=last_col,
-                    rotated=rotated,
-                    substituted=substituted,
-                    rcon=Rcon[i],
-                    new_key_col0=new_key_col0,
-                    new_key_cols=new_key_cols,
-                    new_key=new_key
-                )
-            except RuntimeError:
-                # If we're not in a Flask context (e.g., during testing),
-                # generate a simple HTML string instead
-                key_html = f"""
+        # If we are, use the template
+        if 'words' in record.fields:
+            return render_template(
+                'partials/key_schedule_words.html',
+                round_num=round_num,
+                nk=record['nk'],
+                words=record['words'],
+                new_key=new_key
+            )
+        return render_template(
+            'partials/key_expansion.html',
+            prev_key=record['prev_key'],
+            round_num=round_num,
+            last_col=record['last_col'],
+            rotated=record['rotated'],
+            substituted=record['substituted'],
+            rcon=record['rcon'],
+            new_key_col0=[new_key[j][0] for j in range(4)],
+            new_key_cols={col: [new_key[j][col] for j in range(4)] for col in range(1, 4)},
+            new_key=new_key
+        )
+    except RuntimeError:
+        # If we're not in a Flask context (e.g., during testing),
+        # generate a simple HTML string instead
+        return f"""
                 <div class="key-expansion-explanation">
-                    <h4>Round Key {i+1} Generation</h4>
+                    <h4>Round Key {round_num} Generation</h4>
                     <p>This is a simplified explanation for non-Flask contexts.</p>
                 </div>
                 """
 
-            # Add the detailed HTML explanation as a single log entry
-            log.append((f"Round {i+1} Key Generation Detailed", key_html))
+def _word_bytes(word):
+    """
+    Split a big-endian 32-bit key schedule word into its 4 bytes.
+    """
+    return [word >> 24, (word >> 16) & 0xFF, (word >> 8) & 0xFF, word & 0xFF]
 
-            # Also keep the original log entries for compatibility
-            log.append((f"Last column of previous round key", f"[{', '.join(f'0x{b:02X}' for b in last_col)}]"))
-            log.append((f"After rotation (RotWord)", f"[{', '.join(f'0x{b:02X}' for b in rotated)}]"))
-            log.append((f"After S-box substitution (SubWord)", f"[{', '.join(f'0x{b:02X}' for b in substituted)}]"))
-            log.append((f"XOR first byte with round constant (Rcon[{i}]=0x{Rcon[i]:02X})", 
-                       f"0x{original_first_byte:02X} ⊕ 0x{Rcon[i]:02X} = 0x{substituted[0]:02X}"))
-            log.append((f"Generate first column of round key {i+1}", f"Applying transformations to generate the first column"))
-
-            for j in range(4):
-                log.append((f"Word[0][{j}] = PrevKey[{j}][0] ⊕ Temp[{j}]", 
-                           f"0x{round_keys[i][j][0]:02X} ⊕ 0x{substituted[j]:02X} = 0x{new_key[j][0]:02X}"))
-
-            log.append((f"Generate remaining columns of round key {i+1}", f"Generating columns 1-3 using XOR operations"))
-
-            for col in range(1, 4):
-                for row in range(4):
-                    log.append((f"Word[{col}][{row}] = PrevKey[{row}][{col}] ⊕ Word[{col-1}][{row}]", 
-                               f"0x{round_keys[i][row][col]:02X} ⊕ 0x{new_key[row][col-1]:02X} = 0x{new_key[row][col]:02X}"))
+def _words_to_matrix(words):
+    """
+    Build a 4x4 round key matrix from 4 key schedule words (one per column).
+    """
+    return [[(w >> (24 - 8 * row)) & 0xFF for w in words] for row in range(4)]
+
+def _key_schedule_word_records(key, words):
+    """
+    Per-word derivations of an AES-192/256 schedule, grouped by round key.
+    Returns {round: [word derivation dicts]} for rounds 1..Nr.
+    """
+    nk = len(key) // 4
+    by_round = {}
+    for i in range(4, len(words)):
+        result = _word_bytes(words[i])
+        if i < nk:
+            word = {'index': i, 'kind': 'key', 'result': result}
         else:
-            # Take the last column of the previous round key
-            last_col = [round_keys[i][j][3] for j in range(4)]
+            last = _word_bytes(words[i - 1])
+            word = {'index': i, 'kind': 'xor', 'last': last, 'temp': last,
+                    'back': _word_bytes(words[i - nk]), 'result': result}
+            if i % nk == 0:
+                rotated = rotate_word(last)
+                temp = [Sbox[b] for b in rotated]
+                temp[0] ^= Rcon[i // nk - 1]
+                word.update(kind='rcon', rotated=rotated, temp=temp, rcon=Rcon[i // nk - 1])
+            elif nk > 6 and i % nk == 4:
+                word.update(kind='subword', temp=[Sbox[b] for b in last])
+        by_round.setdefault(i // 4, []).append(word)
+    return by_round
 
-            # Rotate, substitute, and XOR with round constant
+@timed('expand_key')
+def expand_key(key, log=None):
+    """
+    Expands a 16-, 24- or 32-byte key into 11, 13 or 15 round keys according
+    to the AES key schedule. The schedule itself is computed as a flat word
+    array by expand_key_words(); this returns it as 4x4 round key matrices.
+    With a Trace as `log`, one raw 'KeyExpansion' record is stored per round;
+    with a list, the formatted rows and rendered HTML are appended.
+    """
+    words = expand_key_words(key)
+    round_keys = [_words_to_matrix(words[i:i + 4]) for i in range(0, len(words), 4)]
+    if log is None:
+        return round_keys
+
+    word_records = _key_schedule_word_records(key, words) if len(key) != 16 else None
+    for i in range(len(round_keys) - 1):
+        prev_key, new_key = round_keys[i], round_keys[i + 1]
+        if word_records is None:
+            # AES-128: each round key derives from the previous one, so the
+            # record shows RotWord/SubWord/Rcon on its last column
+            last_col = [prev_key[j][3] for j in range(4)]
             rotated = rotate_word(last_col)
             substituted = [Sbox[b] for b in rotated]
             substituted[0] ^= Rcon[i]
+            fields = {
+                'prev_key': prev_key,
+                'last_col': last_col,
+                'rotated': rotated,
+                'substituted': substituted,
+                'rcon': Rcon[i],
+                'new_key': new_key,
+            }
+        else:
+            fields = {
+                'nk': len(key) // 4,
+                'words': word_records[i + 1],
+                'new_key': new_key,
+            }
 
-            # Generate the first column of the new round key
-            new_key = [[0 for _ in range(4)] for _ in range(4)]
-            for j in range(4):
-                new_key[j][0] = round_keys[i][j][0] ^ substituted[j]
+        if isinstance(log, Trace):
+            log.add('KeyExpansion', round=i + 1, **fields)
+        else:
+            record = TraceRecord(i + 1, 'KeyExpansion', fields)
+            rows = record.rows()
+            log.append(rows[0])
+            # Add the detailed HTML explanation as a single log entry
+            log.append((f"Round {i+1} Key Generation Detailed", key_expansion_html(record)))
+            # Also keep the original log entries for compatibility
+            log.extend(rows[1:])
 
-            # Generate the remaining columns
-            for col in range(1, 4):
-                for row in range(4):
-                    new_key[row][col] = round_keys[i][row][col] ^ new_key[row][col-1]
+    return round_keys
 
-        round_keys.append(new_key)
+# Precomputed "<td>0x..</td>" cell for every byte value, as hex() renders it
+HEX_CELLS = tuple(f"<td>{hex(i)}</td>" for i in range(256))
 
-    return round_keys
+def _render_matrix_table(matrix):
+    cells = HEX_CELLS
+    parts = ["<table border='1'>"]
+    for row in matrix:
+        parts.append("<tr>")
+        parts.extend([cells[cell] for cell in row])
+        parts.append("</tr>")
+    parts.append("</table>")
+    return "".join(parts)
 
 def matrix_to_html(matrix):
     """
     Convert a matrix to an HTML table representation.
+    Cells come from the precomputed HEX_CELLS and whole tables are cached
+    in MATRIX_HTML_CACHE.
     """
-    html = "<table border='1'>"
-    for row in matrix:
-        html += "<tr>"
-        for cell in row:
-            html += f"<td>{hex(cell)}</td>"
-        html += "</tr>"
-    html += "</table>"
+    cache_key = tuple(map(bytes, matrix))
+    html = MATRIX_HTML_CACHE.get(cache_key)
+    if html is None:
+        html = _render_matrix_table(matrix)
+        MATRIX_HTML_CACHE.put(cache_key, html)
     return html
 
+@timed('matrices_to_process_html')
 def matrices_to_process_html(original, transformed, transformation_name):
     """
     Create HTML to display before and after matrices for a transformation.
     """
-    html = "<div>"
-    html += "<h4>Before</h4>" + matrix_to_html(original)
-    html += f"<h4>{transformation_name}</h4> → "
-    html += "<h4>After</h4>" + matrix_to_html(transformed)
-    html += "</div>"
+    return "".join((
+        "<div><h4>Before</h4>", matrix_to_html(original),
+        f"<h4>{transformation_name}</h4> → <h4>After</h4>", matrix_to_html(transformed),
+        "</div>",
+    ))
+
+def _round_keys_to_bytes(round_keys):
+    """
+    Flatten a list of 4x4 round key matrices into flat 16-byte lists.
+    """
+    return [list(matrix_to_bytes(round_key)) for round_key in round_keys]
+
+def _mix_columns_block(s):
+    """
+    MixColumns over a flat 16-byte block (compute-only).
+    """
+    out = [0] * 16
+    for c in range(0, 16, 4):
+        a0, a1, a2, a3 = s[c], s[c + 1], s[c + 2], s[c + 3]
+        out[c] = MUL2[a0] ^ MUL3[a1] ^ a2 ^ a3
+        out[c + 1] = a0 ^ MUL2[a1] ^ MUL3[a2] ^ a3
+        out[c + 2] = a0 ^ a1 ^ MUL2[a2] ^ MUL3[a3]
+        out[c + 3] = MUL3[a0] ^ a1 ^ a2 ^ MUL2[a3]
+    return out
+
+def _inv_mix_columns_block(s):
+    """
+    InvMixColumns over a flat 16-byte block (compute-only).
+    """
+    out = [0] * 16
+    for c in range(0, 16, 4):
+        a0, a1, a2, a3 = s[c], s[c + 1], s[c + 2], s[c + 3]
+        out[c] = MUL14[a0] ^ MUL11[a1] ^ MUL13[a2] ^ MUL9[a3]
+        out[c + 1] = MUL9[a0] ^ MUL14[a1] ^ MUL11[a2] ^ MUL13[a3]
+        out[c + 2] = MUL13[a0] ^ MUL9[a1] ^ MUL14[a2] ^ MUL11[a3]
+        out[c + 3] = MUL11[a0] ^ MUL13[a1] ^ MUL9[a2] ^ MUL14[a3]
+    return out
+
+def _encrypt_block(block, round_keys):
+    """
+    Compute-only AES encryption of a single 16-byte block.
+    `round_keys` is a list of flat 16-byte round keys. Nothing is logged,
+    formatted or rendered here.
+    """
+    s = [b ^ k for b, k in zip(block, round_keys[0])]
+    for round_key in round_keys[1:-1]:
+        s = [Sbox[s[i]] for i in SHIFT_ROWS_INDEX]
+        s = _mix_columns_block(s)
+        s = [b ^ k for b, k in zip(s, round_key)]
+    s = [Sbox[s[i]] for i in SHIFT_ROWS_INDEX]
+    return bytes(b ^ k for b, k in zip(s, round_keys[-1]))
+
+def _decrypt_block(block, round_keys):
+    """
+    Compute-only AES decryption of a single 16-byte block.
+    `round_keys` is the same list of flat round keys used for encryption.
+    """
+    s = [b ^ k for b, k in zip(block, round_keys[-1])]
+    for round_key in round_keys[-2:0:-1]:
+        s = [InvSbox[s[i]] for i in INV_SHIFT_ROWS_INDEX]
+        s = [b ^ k for b, k in zip(s, round_key)]
+        s = _inv_mix_columns_block(s)
+    s = [InvSbox[s[i]] for i in INV_SHIFT_ROWS_INDEX]
+    return bytes(b ^ k for b, k in zip(s, round_keys[0]))
+
+# S-boxes as 256-byte translation tables for bytes.translate()
+SBOX_BYTES = bytes(Sbox)
+INV_SBOX_BYTES = bytes(InvSbox)
+
+_shift_rows_gather = itemgetter(*SHIFT_ROWS_INDEX)
+_inv_shift_rows_gather = itemgetter(*INV_SHIFT_ROWS_INDEX)
+
+class State:
+    """
+    AES state backed by a single 16-byte bytearray (column-major, so byte
+    (row, col) lives at row + 4*col) and transformed in place. MixColumns
+    and AddRoundKey write straight into the buffer; SubBytes and ShiftRows
+    build one temporary 16-byte sequence each, which is copied back. Every
+    method returns the state itself so steps can be chained. Use
+    from_matrix() and to_matrix() to move between this and the 4x4 matrices
+    of the visualiser.
+    """
+    __slots__ = ('data', '_words')
+
+    def __init__(self, block=bytes(16)):
+        if len(block) != 16:
+            raise ValueError("AES state must be exactly 16 bytes")
+        self.data = bytearray(block)
+        # The same buffer as two native-endian 64-bit words, for AddRoundKey
+        self._words = memoryview(self.data).cast('Q')
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        """
+        Build a State from a 4x4 matrix as used by the educational functions.
+        """
+        return cls(matrix_to_bytes(matrix))
+
+    def to_matrix(self):
+        """
+        Return a new 4x4 matrix copy of the state for the visualiser.
+        """
+        return bytes_to_matrix(self.data)
+
+    def __bytes__(self):
+        return bytes(self.data)
+
+    def __eq__(self, other):
+        return isinstance(other, State) and self.data == other.data
+
+    def __repr__(self):
+        return f"State({self.data.hex()})"
+
+    def copy(self):
+        return State(self.data)
+
+    def sub_bytes(self):
+        """
+        SubBytes as a single bytes.translate() through the S-box.
+        """
+        self.data[:] = self.data.translate(SBOX_BYTES)
+        return self
+
+    def inv_sub_bytes(self):
+        self.data[:] = self.data.translate(INV_SBOX_BYTES)
+        return self
+
+    def shift_rows(self):
+        """
+        ShiftRows as one gather through the precomputed index permutation.
+        """
+        self.data[:] = _shift_rows_gather(self.data)
+        return self
+
+    def inv_shift_rows(self):
+        self.data[:] = _inv_shift_rows_gather(self.data)
+        return self
+
+    def mix_columns(self):
+        """
+        MixColumns column by column, writing back into the same buffer.
+        """
+        d, mul2, mul3 = self.data, MUL2, MUL3
+        for c in range(0, 16, 4):
+            a0, a1, a2, a3 = d[c], d[c + 1], d[c + 2], d[c + 3]
+            d[c] = mul2[a0] ^ mul3[a1] ^ a2 ^ a3
+            d[c + 1] = a0 ^ mul2[a1] ^ mul3[a2] ^ a3
+            d[c + 2] = a0 ^ a1 ^ mul2[a2] ^ mul3[a3]
+            d[c + 3] = mul3[a0] ^ a1 ^ a2 ^ mul2[a3]
+        return self
+
+    def inv_mix_columns(self):
+        d = self.data
+        for c in range(0, 16, 4):
+            a0, a1, a2, a3 = d[c], d[c + 1], d[c + 2], d[c + 3]
+            d[c] = MUL14[a0] ^ MUL11[a1] ^ MUL13[a2] ^ MUL9[a3]
+            d[c + 1] = MUL9[a0] ^ MUL14[a1] ^ MUL11[a2] ^ MUL13[a3]
+            d[c + 2] = MUL13[a0] ^ MUL9[a1] ^ MUL14[a2] ^ MUL11[a3]
+            d[c + 3] = MUL11[a0] ^ MUL13[a1] ^ MUL9[a2] ^ MUL14[a3]
+        return self
+
+    def add_round_key(self, round_key):
+        """
+        XOR in a round key, given as 16 flat bytes or as the pair of 64-bit
+        words from _state_round_keys(), in place through the word view.
+        """
+        if not isinstance(round_key, tuple):
+            round_key = _state_round_key(round_key)
+        words = self._words
+        words[0] ^= round_key[0]
+        words[1] ^= round_key[1]
+        return self
+
+def _state_round_key(round_key):
+    """
+    One flat round key as the (native-endian) pair of 64-bit words that
+    State.add_round_key() XORs into its buffer.
+    """
+    return tuple(memoryview(bytes(round_key)).cast('Q'))
+
+def _state_round_keys(round_keys):
+    """
+    Flat round keys as word pairs for State.add_round_key().
+    """
+    return tuple(_state_round_key(round_key) for round_key in round_keys)
+
+def encrypt_block_state(block, round_keys):
+    """
+    Compute-only AES encryption of a single 16-byte block on one in-place
+    State; `round_keys` comes from _state_round_keys().
+    """
+    state = State(block).add_round_key(round_keys[0])
+    for round_key in round_keys[1:-1]:
+        state.sub_bytes().shift_rows().mix_columns().add_round_key(round_key)
+    state.sub_bytes().shift_rows().add_round_key(round_keys[-1])
+    return bytes(state.data)
+
+def decrypt_block_state(block, round_keys):
+    """
+    Compute-only AES decryption of a single 16-byte block on one in-place
+    State, using the same round keys as encrypt_block_state().
+    """
+    state = State(block).add_round_key(round_keys[-1])
+    for round_key in round_keys[-2:0:-1]:
+        state.inv_shift_rows().inv_sub_bytes().add_round_key(round_key).inv_mix_columns()
+    state.inv_shift_rows().inv_sub_bytes().add_round_key(round_keys[0])
+    return bytes(state.data)
+
+def _build_te_tables():
+    """
+    Build the four encryption T-tables.
+    Te0[x] holds the MixColumns column (02, 01, 01, 03) * S[x] as a big-endian
+    32-bit word; Te1-Te3 are the same word rotated right by 8, 16 and 24 bits.
+    """
+    te0 = [(MUL2[s] << 24) | (s << 16) | (s << 8) | MUL3[s] for s in Sbox]
+    te1 = [((w >> 8) | (w << 24)) & 0xFFFFFFFF for w in te0]
+    te2 = [((w >> 16) | (w << 16)) & 0xFFFFFFFF for w in te0]
+    te3 = [((w >> 24) | (w << 8)) & 0xFFFFFFFF for w in te0]
+    return te0, te1, te2, te3
+
+Te0, Te1, Te2, Te3 = _build_te_tables()
+
+def expand_key_words(key):
+    """
+    Expand a 16-, 24- or 32-byte key into the AES key schedule as a flat list
+    of big-endian 32-bit words (four words per round key, one word per
+    column): 44, 52 or 60 words for AES-128/192/256.
+    """
+    if len(key) not in KEY_ROUNDS:
+        raise ValueError("AES key must be 16, 24 or 32 bytes")
+    nk = len(key) // 4
+    sbox = Sbox
+    w = [int.from_bytes(key[i:i + 4], 'big') for i in range(0, len(key), 4)]
+    for i in range(nk, 4 * (KEY_ROUNDS[len(key)] + 1)):
+        temp = w[i - 1]
+        if i % nk == 0:
+            # RotWord, SubWord and Rcon folded into a single word
+            temp = ((sbox[(temp >> 16) & 0xFF] << 24) |
+                    (sbox[(temp >> 8) & 0xFF] << 16) |
+                    (sbox[temp & 0xFF] << 8) |
+                    sbox[temp >> 24]) ^ (Rcon[i // nk - 1] << 24)
+        elif nk > 6 and i % nk == 4:
+            # AES-256 only: SubWord without rotation
+            temp = ((sbox[temp >> 24] << 24) |
+                    (sbox[(temp >> 16) & 0xFF] << 16) |
+                    (sbox[(temp >> 8) & 0xFF] << 8) |
+                    sbox[temp & 0xFF])
+        w.append(w[i - nk] ^ temp)
+    return w
+
+def encrypt_block_ttable(block, round_words):
+    """
+    Encrypt a single 16-byte block with the T-table engine.
+    SubBytes, ShiftRows and MixColumns are merged into four table lookups per
+    column word; `round_words` comes from expand_key_words().
+    """
+    te0, te1, te2, te3, sbox = Te0, Te1, Te2, Te3, Sbox
+    s0 = int.from_bytes(block[0:4], 'big') ^ round_words[0]
+    s1 = int.from_bytes(block[4:8], 'big') ^ round_words[1]
+    s2 = int.from_bytes(block[8:12], 'big') ^ round_words[2]
+    s3 = int.from_bytes(block[12:16], 'big') ^ round_words[3]
+
+    for k in range(4, len(round_words) - 4, 4):
+        t0 = te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF] ^ te3[s3 & 0xFF] ^ round_words[k]
+        t1 = te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te2[(s3 >> 8) & 0xFF] ^ te3[s0 & 0xFF] ^ round_words[k + 1]
+        t2 = te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xFF] ^ te2[(s0 >> 8) & 0xFF] ^ te3[s1 & 0xFF] ^ round_words[k + 2]
+        t3 = te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF] ^ te3[s2 & 0xFF] ^ round_words[k + 3]
+        s0, s1, s2, s3 = t0, t1, t2, t3
+
+    # Final round: SubBytes and ShiftRows only
+    k = len(round_words) - 4
+    return bytes((
+        sbox[s0 >> 24] ^ (round_words[k] >> 24),
+        sbox[(s1 >> 16) & 0xFF] ^ ((round_words[k] >> 16) & 0xFF),
+        sbox[(s2 >> 8) & 0xFF] ^ ((round_words[k] >> 8) & 0xFF),
+        sbox[s3 & 0xFF] ^ (round_words[k] & 0xFF),
+        sbox[s1 >> 24] ^ (round_words[k + 1] >> 24),
+        sbox[(s2 >> 16) & 0xFF] ^ ((round_words[k + 1] >> 16) & 0xFF),
+        sbox[(s3 >> 8) & 0xFF] ^ ((round_words[k + 1] >> 8) & 0xFF),
+        sbox[s0 & 0xFF] ^ (round_words[k + 1] & 0xFF),
+        sbox[s2 >> 24] ^ (round_words[k + 2] >> 24),
+        sbox[(s3 >> 16) & 0xFF] ^ ((round_words[k + 2] >> 16) & 0xFF),
+        sbox[(s0 >> 8) & 0xFF] ^ ((round_words[k + 2] >> 8) & 0xFF),
+        sbox[s1 & 0xFF] ^ (round_words[k + 2] & 0xFF),
+        sbox[s3 >> 24] ^ (round_words[k + 3] >> 24),
+        sbox[(s0 >> 16) & 0xFF] ^ ((round_words[k + 3] >> 16) & 0xFF),
+        sbox[(s1 >> 8) & 0xFF] ^ ((round_words[k + 3] >> 8) & 0xFF),
+        sbox[s2 & 0xFF] ^ (round_words[k + 3] & 0xFF),
+    ))
+
+def _build_td_tables():
+    """
+    Build the four decryption T-tables.
+    Td0[x] holds the InvMixColumns column (0E, 09, 0D, 0B) * InvS[x] as a
+    big-endian 32-bit word; Td1-Td3 are its byte rotations.
+    """
+    td0 = [(MUL14[s] << 24) | (MUL9[s] << 16) | (MUL13[s] << 8) | MUL11[s] for s in InvSbox]
+    td1 = [((w >> 8) | (w << 24)) & 0xFFFFFFFF for w in td0]
+    td2 = [((w >> 16) | (w << 16)) & 0xFFFFFFFF for w in td0]
+    td3 = [((w >> 24) | (w << 8)) & 0xFFFFFFFF for w in td0]
+    return td0, td1, td2, td3
+
+Td0, Td1, Td2, Td3 = _build_td_tables()
+
+def _inv_mix_column_word(w):
+    """
+    InvMixColumns on one column word, via Td[Sbox[b]] = InvMixColumns column of b.
+    """
+    return (Td0[Sbox[w >> 24]] ^ Td1[Sbox[(w >> 16) & 0xFF]] ^
+            Td2[Sbox[(w >> 8) & 0xFF]] ^ Td3[Sbox[w & 0xFF]])
+
+def expand_key_words_decrypt(key):
+    """
+    Round keys for the equivalent inverse cipher: the encryption schedule in
+    reverse round order, with InvMixColumns pre-applied to the inner rounds.
+    """
+    w = expand_key_words(key)
+    rounds = len(w) // 4 - 1
+    dw = list(w[4 * rounds:4 * rounds + 4])
+    for r in range(rounds - 1, 0, -1):
+        dw.extend(_inv_mix_column_word(x) for x in w[4 * r:4 * r + 4])
+    dw.extend(w[0:4])
+    return dw
+
+def decrypt_block_ttable(block, round_words):
+    """
+    Decrypt a single 16-byte block with the T-table engine (equivalent
+    inverse cipher); `round_words` comes from expand_key_words_decrypt().
+    """
+    td0, td1, td2, td3, inv_sbox = Td0, Td1, Td2, Td3, InvSbox
+    s0 = int.from_bytes(block[0:4], 'big') ^ round_words[0]
+    s1 = int.from_bytes(block[4:8], 'big') ^ round_words[1]
+    s2 = int.from_bytes(block[8:12], 'big') ^ round_words[2]
+    s3 = int.from_bytes(block[12:16], 'big') ^ round_words[3]
+
+    for k in range(4, len(round_words) - 4, 4):
+        t0 = td0[s0 >> 24] ^ td1[(s3 >> 16) & 0xFF] ^ td2[(s2 >> 8) & 0xFF] ^ td3[s1 & 0xFF] ^ round_words[k]
+        t1 = td0[s1 >> 24] ^ td1[(s0 >> 16) & 0xFF] ^ td2[(s3 >> 8) & 0xFF] ^ td3[s2 & 0xFF] ^ round_words[k + 1]
+        t2 = td0[s2 >> 24] ^ td1[(s1 >> 16) & 0xFF] ^ td2[(s0 >> 8) & 0xFF] ^ td3[s3 & 0xFF] ^ round_words[k + 2]
+        t3 = td0[s3 >> 24] ^ td1[(s2 >> 16) & 0xFF] ^ td2[(s1 >> 8) & 0xFF] ^ td3[s0 & 0xFF] ^ round_words[k + 3]
+        s0, s1, s2, s3 = t0, t1, t2, t3
+
+    # Final round: InvShiftRows and InvSubBytes only
+    k = len(round_words) - 4
+    return bytes((
+        inv_sbox[s0 >> 24] ^ (round_words[k] >> 24),
+        inv_sbox[(s3 >> 16) & 0xFF] ^ ((round_words[k] >> 16) & 0xFF),
+        inv_sbox[(s2 >> 8) & 0xFF] ^ ((round_words[k] >> 8) & 0xFF),
+        inv_sbox[s1 & 0xFF] ^ (round_words[k] & 0xFF),
+        inv_sbox[s1 >> 24] ^ (round_words[k + 1] >> 24),
+        inv_sbox[(s0 >> 16) & 0xFF] ^ ((round_words[k + 1] >> 16) & 0xFF),
+        inv_sbox[(s3 >> 8) & 0xFF] ^ ((round_words[k + 1] >> 8) & 0xFF),
+        inv_sbox[s2 & 0xFF] ^ (round_words[k + 1] & 0xFF),
+        inv_sbox[s2 >> 24] ^ (round_words[k + 2] >> 24),
+        inv_sbox[(s1 >> 16) & 0xFF] ^ ((round_words[k + 2] >> 16) & 0xFF),
+        inv_sbox[(s0 >> 8) & 0xFF] ^ ((round_words[k + 2] >> 8) & 0xFF),
+        inv_sbox[s3 & 0xFF] ^ (round_words[k + 2] & 0xFF),
+        inv_sbox[s3 >> 24] ^ (round_words[k + 3] >> 24),
+        inv_sbox[(s2 >> 16) & 0xFF] ^ ((round_words[k + 3] >> 16) & 0xFF),
+        inv_sbox[(s1 >> 8) & 0xFF] ^ ((round_words[k + 3] >> 8) & 0xFF),
+        inv_sbox[s0 & 0xFF] ^ (round_words[k + 3] & 0xFF),
+    ))
+
+class LRUCache:
+    """
+    Bounded, thread-safe LRU cache with hit/miss counters.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for `key` (marking it recently used) or `default`.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store `value` under `key`, evicting the least recently used entries.
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for `key`, calling `compute()` on a miss.
+        `compute` runs outside the lock, so concurrent misses may both compute.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def resize(self, maxsize):
+        """
+        Change the maximum number of entries, evicting as needed.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop all entries and reset the counters.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Return a snapshot of the cache counters.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+_MISSING = object()
+
+# Expanded round keys, keyed by (schedule form, key bytes)
+KEY_SCHEDULE_CACHE = LRUCache(int(os.environ.get('AES_KEY_CACHE_SIZE', 256)))
+
+# Rendered key-expansion log entries (HTML fragments), keyed by key bytes
+KEY_EXPANSION_HTML_CACHE = LRUCache(int(os.environ.get('AES_KEY_HTML_CACHE_SIZE', 64)))
+
+# Rendered matrix tables keyed by their rows; a state rendered as the
+# "After" of one step is reused as the "Before" of the next
+MATRIX_HTML_CACHE = LRUCache(int(os.environ.get('AES_MATRIX_HTML_CACHE_SIZE', 1024)))
+
+# Rendered MixColumns explanations keyed by (before, after, app context)
+MIX_COLUMNS_HTML_CACHE = LRUCache(int(os.environ.get('AES_MIX_COLUMNS_HTML_CACHE_SIZE', 256)))
+
+# Traced rounds as (records, output state): round 0 keyed by (plaintext,
+# key), later rounds by (input state, round key, final round?). Editing only
+# the key or only the plaintext then replays every round whose inputs are
+# unchanged instead of recomputing it
+ROUND0_CACHE = LRUCache(int(os.environ.get('AES_ROUND_CACHE_SIZE', 1024)))
+ROUND_CACHE = LRUCache(int(os.environ.get('AES_ROUND_CACHE_SIZE', 1024)))
+
+METRICS.register_cache('key_schedule', KEY_SCHEDULE_CACHE)
+METRICS.register_cache('key_expansion_html', KEY_EXPANSION_HTML_CACHE)
+METRICS.register_cache('matrix_html', MATRIX_HTML_CACHE)
+METRICS.register_cache('mix_columns_html', MIX_COLUMNS_HTML_CACHE)
+METRICS.register_cache('round0', ROUND0_CACHE)
+METRICS.register_cache('round', ROUND_CACHE)
+
+def cached_expand_key(key, log=None):
+    """
+    expand_key() backed by the round-key caches. The returned round keys are
+    shared between callers and must be treated as read-only. A Trace `log`
+    receives the cached 'KeyExpansion' records; a list `log` receives the
+    cached formatted rows and rendered HTML.
+    """
+    key = bytes(key)
+    if log is None:
+        return KEY_SCHEDULE_CACHE.get_or_compute(('matrix', key), lambda: expand_key(key))
+
+    if isinstance(log, Trace):
+        for record in cached_key_expansion_trace(key):
+            log.add(record.op, round=record.round, **record.fields)
+        return cached_expand_key(key)
+
+    # Rendered fragments differ inside and outside a Flask app context
+    html_key = ('log', key, has_app_context())
+    entries = KEY_EXPANSION_HTML_CACHE.get(html_key)
+    if entries is None:
+        entries = []
+        round_keys = expand_key(key, entries)
+        KEY_EXPANSION_HTML_CACHE.put(html_key, entries)
+        KEY_SCHEDULE_CACHE.put(('matrix', key), round_keys)
+    else:
+        round_keys = cached_expand_key(key)
+    log.extend(entries)
+    return round_keys
+
+def cached_key_expansion_trace(key):
+    """
+    The structured key-expansion Trace for `key`, cached per key.
+    """
+    key = bytes(key)
+
+    def build():
+        trace = Trace()
+        KEY_SCHEDULE_CACHE.put(('matrix', key), expand_key(key, trace))
+        return trace
+
+    return KEY_SCHEDULE_CACHE.get_or_compute(('trace', key), build)
+
+def cached_key_expansion_html(key, round_num):
+    """
+    Rendered key-expansion explanation for one round. Fragments are rendered
+    on first use and cached per key in KEY_EXPANSION_HTML_CACHE.
+    """
+    key = bytes(key)
+    fragments = KEY_EXPANSION_HTML_CACHE.get_or_compute(('html', key, has_app_context()), dict)
+    html = fragments.get(round_num)
+    if html is None:
+        record = cached_key_expansion_trace(key).get(round_num, 'KeyExpansion')
+        html = fragments[round_num] = key_expansion_html(record)
     return html
 
-def encrypt_aes(plaintext, key):
+def cached_expand_key_words(key):
+    """
+    expand_key_words() backed by KEY_SCHEDULE_CACHE.
+    """
+    key = bytes(key)
+    return KEY_SCHEDULE_CACHE.get_or_compute(('words', key), lambda: tuple(expand_key_words(key)))
+
+def cached_expand_key_words_decrypt(key):
+    """
+    expand_key_words_decrypt() backed by KEY_SCHEDULE_CACHE.
+    """
+    key = bytes(key)
+    return KEY_SCHEDULE_CACHE.get_or_compute(('words_decrypt', key), lambda: tuple(expand_key_words_decrypt(key)))
+
+def _cached_state_round_keys(key):
+    """
+    Round keys as 128-bit integers for the in-place State engine, cached per key.
+    """
+    key = bytes(key)
+    return KEY_SCHEDULE_CACHE.get_or_compute(('state', key), lambda: _state_round_keys(_cached_flat_round_keys(key)))
+
+def _cached_flat_round_keys(key):
+    """
+    Flat 16-byte round keys for the byte-oriented engine, cached per key.
+    """
+    key = bytes(key)
+
+    def build():
+        words = cached_expand_key_words(key)
+        return [list(b"".join(w.to_bytes(4, 'big') for w in words[i:i + 4]))
+                for i in range(0, len(words), 4)]
+
+    return KEY_SCHEDULE_CACHE.get_or_compute(('flat', key), build)
+
+def configure_key_cache(maxsize=None, html_maxsize=None):
     """
-    Perform full AES-128 encryption on the given plaintext using the given key.
+    Resize the round-key cache and/or the key-expansion HTML cache.
     """
+    if maxsize is not None:
+        KEY_SCHEDULE_CACHE.resize(maxsize)
+    if html_maxsize is not None:
+        KEY_EXPANSION_HTML_CACHE.resize(html_maxsize)
+
+# Compute-only engines selectable through encrypt_aes(..., engine=...)
+ENGINES = ('ttable', 'flat', 'state')
+
+def encrypt_aes(plaintext, key, log=None, engine='ttable'):
+    """
+    Perform full AES encryption on the given plaintext using a 16-, 24- or
+    32-byte key (10, 12 or 14 rounds).
+    Without a log this runs a compute-only engine ('ttable', 'flat' or the
+    in-place 'state'); pass a list or a Trace as `log` to trace every step
+    through the educational functions instead.
+    """
+    if log is None:
+        if engine == 'ttable':
+            return encrypt_block_ttable(plaintext, cached_expand_key_words(key))
+        if engine == 'flat':
+            return _encrypt_block(plaintext, _cached_flat_round_keys(key))
+        if engine == 'state':
+            return encrypt_block_state(plaintext, _cached_state_round_keys(key))
+        raise ValueError(f"Unknown AES engine: {engine!r}")
+
     # Convert plaintext to matrix
     state = bytes_to_matrix(plaintext)
 
     # Generate all round keys in advance
-    round_keys = expand_key(key)
+    round_keys = expand_key(key, log)
 
     # Round 0: AddRoundKey
-    state = add_round_key(state, round_keys[0], [])
+    state = add_round_key(state, round_keys[0], log)
 
-    # Rounds 1-9
-    for round_idx in range(1, 10):
-        state = sub_bytes(state, [])
-        state = shift_rows(state, [])
-        state = mix_columns(state, [])
-        state = add_round_key(state, round_keys[round_idx], [])
+    # Rounds 1 to Nr-1
+    last_round = len(round_keys) - 1
+    for round_idx in range(1, last_round):
+        if isinstance(log, Trace):
+            log.round = round_idx
+        state = sub_bytes(state, log)
+        state = shift_rows(state, log)
+        state = mix_columns(state, log)
+        state = add_round_key(state, round_keys[round_idx], log)
 
-    # Round 10 (Final)
-    state = sub_bytes(state, [])
-    state = shift_rows(state, [])
-    state = add_round_key(state, round_keys[10], [])
+    # Round Nr (Final)
+    if isinstance(log, Trace):
+        log.round = last_round
+    state = sub_bytes(state, log)
+    state = shift_rows(state, log)
+    state = add_round_key(state, round_keys[last_round], log)
 
     # Convert back to bytes
     return matrix_to_bytes(state)
+
+def iter_trace_aes(plaintext, key, trace):
+    """
+    Generator form of trace_aes(): encrypt one block round by round into
+    `trace`, yielding each round number once its records are complete. The
+    meta entries are set before round 0 is yielded, except the ciphertext,
+    which is set before the final round is yielded.
+    """
+    round_keys = cached_expand_key(key)
+    initial = bytes_to_matrix(plaintext)
+    trace.meta.update(plaintext=initial, key=bytes_to_matrix(key), round_keys=round_keys)
+
+    # Round 0: AddRoundKey
+    state = _replay_round(trace, ROUND0_CACHE, (bytes(plaintext), bytes(key)),
+                          lambda log: add_round_key(initial, round_keys[0], log))
+    yield 0
+
+    last_round = len(round_keys) - 1
+    for round_idx in range(1, last_round + 1):
+        trace.round = round_idx
+        final = round_idx == last_round
+        cache_key = (matrix_to_bytes(state), matrix_to_bytes(round_keys[round_idx]), final)
+        state = _replay_round(trace, ROUND_CACHE, cache_key,
+                              partial(_trace_round, state, round_keys[round_idx], final))
+        if final:
+            trace.meta['ciphertext'] = matrix_to_bytes(state)
+            METRICS.inc('trace_records', len(trace))
+        yield round_idx
+
+def _trace_round(state, round_key, final, log):
+    """
+    One encryption round (1 to Nr) traced into `log`; the final round skips
+    MixColumns.
+    """
+    state = sub_bytes(state, log)
+    state = shift_rows(state, log)
+    if not final:
+        state = mix_columns(state, log)
+    return add_round_key(state, round_key, log)
+
+def _replay_round(trace, cache, cache_key, run):
+    """
+    Add the records of one round to `trace` from `cache`, running
+    `run(log)` into a fresh Trace on a miss, and return the round's output
+    state. Cached matrices are shared between traces and must be treated as
+    read-only.
+    """
+    entry = cache.get(cache_key)
+    if entry is None:
+        log = Trace()
+        state = run(log)
+        entry = (tuple((record.op, record.fields) for record in log), state)
+        cache.put(cache_key, entry)
+    records, state = entry
+    for op, fields in records:
+        trace.add(op, **fields)
+    return state
+
+@timed('trace')
+def trace_aes(plaintext, key):
+    """
+    Encrypt one block and record every state transition in a Trace.
+    Each round holds one record per operation with its `before` and `after`
+    state as integer matrices; trace.meta carries the plaintext and key
+    matrices, the round keys and the ciphertext. Nothing is formatted or
+    rendered, so the same trace feeds the HTML page and the JSON API.
+    """
+    trace = Trace()
+    for _ in iter_trace_aes(plaintext, key, trace):
+        pass
+    return trace
+
+def decrypt_aes(ciphertext, key, log=None, engine='ttable'):
+    """
+    Perform full AES decryption of the given ciphertext using a 16-, 24- or
+    32-byte key.
+    Without a log this runs a compute-only engine ('ttable' uses the
+    equivalent inverse cipher with pre-transformed round keys, 'flat' and
+    'state' the byte-oriented engines); pass a Trace as `log` to record every
+    inverse step.
+    """
+    if log is None:
+        if engine == 'ttable':
+            return decrypt_block_ttable(ciphertext, cached_expand_key_words_decrypt(key))
+        if engine == 'flat':
+            return _decrypt_block(ciphertext, _cached_flat_round_keys(key))
+        if engine == 'state':
+            return decrypt_block_state(ciphertext, _cached_state_round_keys(key))
+        raise ValueError(f"Unknown AES engine: {engine!r}")
+
+    round_keys = cached_expand_key(key)
+    last_round = len(round_keys) - 1
+    state = bytes_to_matrix(ciphertext)
+    is_trace = isinstance(log, Trace)
+
+    # Round 0 of decryption: AddRoundKey with the last round key
+    state = add_round_key(state, round_keys[last_round], log)
+    if is_trace:
+        log.get(0, 'AddRoundKey').fields['key_index'] = last_round
+
+    for round_idx in range(1, last_round + 1):
+        key_index = last_round - round_idx
+        if is_trace:
+            log.round = round_idx
+        state = inv_shift_rows(state, log)
+        state = inv_sub_bytes(state, log)
+        state = add_round_key(state, round_keys[key_index], log)
+        if is_trace:
+            log.get(round_idx, 'AddRoundKey').fields['key_index'] = key_index
+        if key_index:
+            state = inv_mix_columns(state, log)
+
+    return matrix_to_bytes(state)
+
+@timed('trace_decrypt')
+def trace_aes_decrypt(ciphertext, key):
+    """
+    Decrypt one block and record every inverse step in a Trace, mirroring
+    trace_aes(). trace.meta carries the ciphertext and key matrices, the
+    round keys and the recovered plaintext.
+    """
+    round_keys = cached_expand_key(key)
+    trace = Trace()
+    trace.meta.update(ciphertext=bytes_to_matrix(ciphertext), key=bytes_to_matrix(key), round_keys=round_keys)
+    trace.meta['plaintext'] = decrypt_aes(ciphertext, key, trace)
+    METRICS.inc('trace_records', len(trace))
+    return trace
+
+def _load_numpy():
+    """
+    Import numpy on first use and return it, or None when it is not installed.
+    """
+    global np, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+        _numpy_loaded = True
+    return np
+
+def _to_block_array(data):
+    """
+    Convert a bytes-like buffer or an (N, 16) array into an (N, 16) uint8 array.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        if len(data) % 16:
+            raise ValueError("Data length must be a multiple of 16 bytes")
+        return np.frombuffer(data, dtype=np.uint8).reshape(-1, 16)
+    blocks = np.asarray(data, dtype=np.uint8)
+    if blocks.ndim != 2 or blocks.shape[1] != 16:
+        raise ValueError(f"Expected an (N, 16) array of blocks, got shape {blocks.shape}")
+    return blocks
+
+def encrypt_blocks(data, key, round_keys=None):
+    """
+    Encrypt many 16-byte blocks at once (ECB, no padding) with NumPy.
+    `data` is an (N, 16) uint8 array or a bytes buffer whose length is a
+    multiple of 16; the result has the same type. The key is expanded once
+    (or `round_keys` from expand_key() is reused) and every round runs as a
+    handful of vectorised gathers and XORs across the whole batch.
+    """
+    if _load_numpy() is None:
+        raise ImportError("encrypt_blocks requires numpy")
+
+    as_bytes = isinstance(data, (bytes, bytearray, memoryview))
+    blocks = _to_block_array(data)
+    if round_keys is None:
+        round_keys = cached_expand_key(key)
+    rk = np.array(_round_keys_to_bytes(round_keys), dtype=np.uint8)
+    sbox = np.array(Sbox, dtype=np.uint8)
+    mul2 = np.array(MUL2, dtype=np.uint8)
+    mul3 = np.array(MUL3, dtype=np.uint8)
+    shift = np.array(SHIFT_ROWS_INDEX, dtype=np.intp)
+
+    state = blocks ^ rk[0]
+    for round_idx in range(1, len(rk)):
+        # SubBytes and ShiftRows as two gathers
+        state = sbox[state[:, shift]]
+        if round_idx < len(rk) - 1:
+            # MixColumns on a (N, column, row) view
+            cols = state.reshape(-1, 4, 4)
+            a0, a1, a2, a3 = cols[:, :, 0], cols[:, :, 1], cols[:, :, 2], cols[:, :, 3]
+            mixed = np.empty_like(cols)
+            mixed[:, :, 0] = mul2[a0] ^ mul3[a1] ^ a2 ^ a3
+            mixed[:, :, 1] = a0 ^ mul2[a1] ^ mul3[a2] ^ a3
+            mixed[:, :, 2] = a0 ^ a1 ^ mul2[a2] ^ mul3[a3]
+            mixed[:, :, 3] = mul3[a0] ^ a1 ^ a2 ^ mul2[a3]
+            state = mixed.reshape(-1, 16)
+        state ^= rk[round_idx]
+
+    if as_bytes:
+        return state.tobytes()
+    return state
+
+def decrypt_blocks(data, key, round_keys=None):
+    """
+    Decrypt many 16-byte blocks at once (ECB, no padding) with NumPy.
+    Accepts the same inputs as encrypt_blocks() and mirrors its structure
+    with the inverse S-box, InvShiftRows permutation and MUL9-MUL14 tables.
+    """
+    if _load_numpy() is None:
+        raise ImportError("decrypt_blocks requires numpy")
+
+    as_bytes = isinstance(data, (bytes, bytearray, memoryview))
+    blocks = _to_block_array(data)
+    if round_keys is None:
+        round_keys = cached_expand_key(key)
+    rk = np.array(_round_keys_to_bytes(round_keys), dtype=np.uint8)
+    inv_sbox = np.array(InvSbox, dtype=np.uint8)
+    mul9, mul11 = np.array(MUL9, dtype=np.uint8), np.array(MUL11, dtype=np.uint8)
+    mul13, mul14 = np.array(MUL13, dtype=np.uint8), np.array(MUL14, dtype=np.uint8)
+    inv_shift = np.array(INV_SHIFT_ROWS_INDEX, dtype=np.intp)
+
+    state = blocks ^ rk[-1]
+    for round_idx in range(len(rk) - 2, -1, -1):
+        # InvShiftRows and InvSubBytes as two gathers
+        state = inv_sbox[state[:, inv_shift]]
+        state ^= rk[round_idx]
+        if round_idx:
+            # InvMixColumns on a (N, column, row) view
+            cols = state.reshape(-1, 4, 4)
+            a0, a1, a2, a3 = cols[:, :, 0], cols[:, :, 1], cols[:, :, 2], cols[:, :, 3]
+            mixed = np.empty_like(cols)
+            mixed[:, :, 0] = mul14[a0] ^ mul11[a1] ^ mul13[a2] ^ mul9[a3]
+            mixed[:, :, 1] = mul9[a0] ^ mul14[a1] ^ mul11[a2] ^ mul13[a3]
+            mixed[:, :, 2] = mul13[a0] ^ mul9[a1] ^ mul14[a2] ^ mul11[a3]
+            mixed[:, :, 3] = mul11[a0] ^ mul13[a1] ^ mul9[a2] ^ mul14[a3]
+            state = mixed.reshape(-1, 16)
+
+    if as_bytes:
+        return state.tobytes()
+    return state
+
+# Streaming modes of operation
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def _iter_chunks(source, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yield byte chunks from a file-like object (anything with .read()),
+    a single bytes-like object, or an iterable of bytes-like chunks.
+    """
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        for i in range(0, len(source), chunk_size):
+            yield source[i:i + chunk_size]
+    else:
+        for chunk in source:
+            if chunk:
+                yield chunk
+
+def _iter_aligned(source, hold_back=False):
+    """
+    Re-chunk a byte stream into pieces whose length is a multiple of 16.
+    Yields (piece, is_tail) pairs; the final pair carries the trailing
+    remainder (and, with `hold_back`, the last full block as well) so that
+    modes can pad or unpad at the end of the stream.
+    """
+    buf = bytearray()
+    for chunk in _iter_chunks(source):
+        buf += chunk
+        keep = len(buf) % 16
+        if hold_back and keep == 0:
+            keep = 16
+        n = len(buf) - keep
+        if n > 0:
+            yield bytes(buf[:n]), False
+            del buf[:n]
+    yield bytes(buf), True
+
+def _xor_block(a, b):
+    """
+    XOR two 16-byte blocks.
+    """
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(16, 'big')
+
+def _check_iv(iv):
+    """
+    Validate a 16-byte IV or initial counter block.
+    """
+    if len(iv) != 16:
+        raise ValueError("IV / nonce must be exactly 16 bytes")
+
+def ecb_encrypt_stream(source, key, padding=True):
+    """
+    Encrypt a stream in ECB mode, yielding ciphertext chunks as input arrives.
+    The final block is padded with pad() unless `padding` is False, in which
+    case the input length must be a multiple of 16.
+    """
+    round_words = cached_expand_key_words(key)
+    for piece, is_tail in _iter_aligned(source):
+        if is_tail:
+            tail = piece
+            break
+        yield b"".join(encrypt_block_ttable(piece[i:i + 16], round_words) for i in range(0, len(piece), 16))
+
+    if padding:
+        tail = pad(tail)
+    elif tail:
+        raise ValueError("Data length must be a multiple of 16 bytes when padding is disabled")
+    if tail:
+        yield b"".join(encrypt_block_ttable(tail[i:i + 16], round_words) for i in range(0, len(tail), 16))
+
+def ecb_decrypt_stream(source, key, padding=True):
+    """
+    Decrypt an ECB stream, yielding plaintext chunks. With `padding` the last
+    block is held back until the end of the stream and unpadded.
+    """
+    round_words = cached_expand_key_words_decrypt(key)
+    for piece, is_tail in _iter_aligned(source, hold_back=padding):
+        if is_tail:
+            tail = piece
+            break
+        yield b"".join(decrypt_block_ttable(piece[i:i + 16], round_words) for i in range(0, len(piece), 16))
+
+    if padding:
+        if len(tail) != 16:
+            raise ValueError("Ciphertext length must be a non-empty multiple of 16 bytes")
+        yield unpad(decrypt_block_ttable(tail, round_words))
+    elif tail:
+        raise ValueError("Ciphertext length must be a multiple of 16 bytes")
+
+def cbc_encrypt_stream(source, key, iv, padding=True):
+    """
+    Encrypt a stream in CBC mode with the given 16-byte IV, yielding
+    ciphertext chunks as input arrives.
+    """
+    _check_iv(iv)
+    round_words = cached_expand_key_words(key)
+    prev = bytes(iv)
+
+    def encrypt_piece(piece):
+        nonlocal prev
+        out = []
+        for i in range(0, len(piece), 16):
+            prev = encrypt_block_ttable(_xor_block(piece[i:i + 16], prev), round_words)
+            out.append(prev)
+        return b"".join(out)
+
+    for piece, is_tail in _iter_aligned(source):
+        if is_tail:
+            tail = piece
+            break
+        yield encrypt_piece(piece)
+
+    if padding:
+        tail = pad(tail)
+    elif tail:
+        raise ValueError("Data length must be a multiple of 16 bytes when padding is disabled")
+    if tail:
+        yield encrypt_piece(tail)
+
+def cbc_decrypt_stream(source, key, iv, padding=True):
+    """
+    Decrypt a CBC stream with the given 16-byte IV, yielding plaintext chunks.
+    """
+    _check_iv(iv)
+    round_words = cached_expand_key_words_decrypt(key)
+    prev = bytes(iv)
+
+    def decrypt_piece(piece):
+        nonlocal prev
+        out = []
+        for i in range(0, len(piece), 16):
+            block = piece[i:i + 16]
+            out.append(_xor_block(decrypt_block_ttable(block, round_words), prev))
+            prev = block
+        return b"".join(out)
+
+    for piece, is_tail in _iter_aligned(source, hold_back=padding):
+        if is_tail:
+            tail = piece
+            break
+        yield decrypt_piece(piece)
+
+    if padding:
+        if len(tail) != 16:
+            raise ValueError("Ciphertext length must be a non-empty multiple of 16 bytes")
+        yield unpad(decrypt_piece(tail))
+    elif tail:
+        raise ValueError("Ciphertext length must be a multiple of 16 bytes")
+
+def ctr_keystream_block(round_words, nonce, block_index):
+    """
+    Return the keystream block for `block_index`: the 16-byte `nonce` is
+    treated as a 128-bit big-endian counter that is incremented per block.
+    """
+    counter = (int.from_bytes(nonce, 'big') + block_index) & ((1 << 128) - 1)
+    return encrypt_block_ttable(counter.to_bytes(16, 'big'), round_words)
+
+def ctr_stream(source, key, nonce, start_block=0):
+    """
+    Encrypt or decrypt a stream in CTR mode (the operation is symmetric).
+    No padding is used; the last partial block is XORed with a truncated
+    keystream block. `start_block` seeks the counter so a file can be
+    processed in independent slices: the slice starting at byte offset
+    16 * n is handled with start_block=n.
+    """
+    _check_iv(nonce)
+    round_words = cached_expand_key_words(key)
+    block_index = start_block
+
+    def crypt_piece(piece):
+        nonlocal block_index
+        keystream = b"".join(ctr_keystream_block(round_words, nonce, block_index + i)
+                             for i in range((len(piece) + 15) // 16))
+        block_index += len(keystream) // 16
+        n = len(piece)
+        return (int.from_bytes(piece, 'big') ^ int.from_bytes(keystream[:n], 'big')).to_bytes(n, 'big')
+
+    for piece, is_tail in _iter_aligned(source):
+        if is_tail:
+            tail = piece
+            break
+        yield crypt_piece(piece)
+    if tail:
+        yield crypt_piece(tail)
+
+# Parallel ECB / CTR over a process pool
+
+PARALLEL_CHUNK_SIZE = 1024 * 1024
+
+# Per-process state set once by _init_parallel_worker
+_worker = {}
+
+def _init_parallel_worker(round_keys, round_words, in_name, out_name):
+    """
+    Pool initializer: receive the expanded key once per worker and attach to
+    the shared input/output buffers.
+    """
+    from multiprocessing import shared_memory
+
+    _worker['round_keys'] = round_keys
+    _worker['round_words'] = round_words
+    _worker['in'] = shared_memory.SharedMemory(name=in_name)
+    _worker['out'] = shared_memory.SharedMemory(name=out_name)
+
+def _crypt_range(mode, src, dst, offset, length, round_keys, round_words, nonce):
+    """
+    Encrypt src[offset:offset + length] into dst at the same offset.
+    `offset` is always block aligned; only the last CTR range may end on a
+    partial block.
+    """
+    data = bytes(src[offset:offset + length])
+    if mode == 'ecb':
+        if _load_numpy() is not None:
+            out = encrypt_blocks(data, None, round_keys=round_keys)
+        else:
+            out = b"".join(encrypt_block_ttable(data[i:i + 16], round_words) for i in range(0, length, 16))
+    else:
+        first_block = offset // 16
+        n_blocks = (length + 15) // 16
+        base = int.from_bytes(nonce, 'big')
+        counters = b"".join(((base + first_block + i) & ((1 << 128) - 1)).to_bytes(16, 'big')
+                            for i in range(n_blocks))
+        if _load_numpy() is not None:
+            keystream = encrypt_blocks(counters, None, round_keys=round_keys)
+        else:
+            keystream = b"".join(encrypt_block_ttable(counters[i:i + 16], round_words)
+                                 for i in range(0, len(counters), 16))
+        out = (int.from_bytes(data, 'big') ^ int.from_bytes(keystream[:length], 'big')).to_bytes(length, 'big')
+    dst[offset:offset + length] = out
+
+def _parallel_worker_task(mode, offset, length, nonce):
+    """
+    Process one chunk inside a pool worker, writing into shared memory.
+    """
+    _crypt_range(mode, _worker['in'].buf, _worker['out'].buf, offset, length,
+                 _worker['round_keys'], _worker['round_words'], nonce)
+    return offset
+
+def _parallel_crypt(mode, data, key, nonce=None, workers=None, chunk_size=PARALLEL_CHUNK_SIZE):
+    """
+    Run ECB encryption or CTR over `data` split into chunks across a process
+    pool. Input and output live in shared memory, so only chunk offsets cross
+    the process boundary; the output is assembled in order.
+    """
+    if chunk_size <= 0 or chunk_size % 16:
+        raise ValueError("chunk_size must be a positive multiple of 16")
+    workers = workers or os.cpu_count() or 1
+    round_keys = cached_expand_key(key)
+    round_words = cached_expand_key_words(key)
+    length = len(data)
+
+    # Small inputs are not worth starting a pool for
+    if workers == 1 or length <= chunk_size:
+        out = bytearray(length)
+        _crypt_range(mode, memoryview(data), out, 0, length, round_keys, round_words, nonce)
+        return bytes(out)
+
+    # Imported here so the process pool machinery stays off the import path
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    src = shared_memory.SharedMemory(create=True, size=length)
+    dst = shared_memory.SharedMemory(create=True, size=length)
+    try:
+        src.buf[:length] = data
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_parallel_worker,
+            initargs=(round_keys, round_words, src.name, dst.name),
+        ) as pool:
+            futures = [
+                pool.submit(_parallel_worker_task, mode, offset, min(chunk_size, length - offset), nonce)
+                for offset in range(0, length, chunk_size)
+            ]
+            for future in futures:
+                future.result()
+        return bytes(dst.buf[:length])
+    finally:
+        src.close()
+        src.unlink()
+        dst.close()
+        dst.unlink()
+
+def parallel_ecb_encrypt(data, key, padding=True, workers=None, chunk_size=PARALLEL_CHUNK_SIZE):
+    """
+    Encrypt `data` in ECB mode using `workers` processes (default: all
+    cores), each handling `chunk_size` bytes at a time.
+    """
+    if padding:
+        data = pad(bytes(data))
+    elif len(data) % 16:
+        raise ValueError("Data length must be a multiple of 16 bytes when padding is disabled")
+    return _parallel_crypt('ecb', data, key, workers=workers, chunk_size=chunk_size)
+
+def parallel_ctr(data, key, nonce, workers=None, chunk_size=PARALLEL_CHUNK_SIZE):
+    """
+    Encrypt or decrypt `data` in CTR mode using `workers` processes. The
+    output matches ctr_stream() with the same key and nonce.
+    """
+    _check_iv(nonce)
+    return _parallel_crypt('ctr', data, key, nonce=bytes(nonce), workers=workers, chunk_size=chunk_size)
@@ -0,0 +1,258 @@
+"""
+Verify the aes_lib engines against NIST AESAVS (CAVS) response files.
+
+Known-answer (GFSbox, KeySbox, VarKey, VarTxt), multi-block message (MMT)
+and Monte Carlo (MCT) files are streamed record by record and checked in
+both directions with every engine, in parallel batches. The Monte Carlo
+records of each direction are run as one chain, as in the AESAVS
+procedure: 1000 chained encryptions or decryptions per record, with each
+record's KEY, IV and input derived from the previous record's outputs.
+The bundled files live in vectors/aesavs/.
+
+    python aesavs.py [--engine ENGINE] [--workers N] [--skip-mct] [FILE.rsp ...]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice
+from operator import itemgetter
+
+from aes_lib import ENGINES, decrypt_aes, encrypt_aes
+
+VECTORS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vectors', 'aesavs')
+
+# Inner iterations per Monte Carlo record (AESAVS section 6.4)
+MCT_ITERATIONS = 1000
+
+# Known-answer records per parallel task; each direction of an MCT file is
+# one task, since its records form a single chain
+KAT_BATCH_SIZE = 256
+
+
+def parse_rsp(lines):
+    """
+    Yield (direction, record) for each record of an AESAVS response file,
+    where direction is 'ENCRYPT' or 'DECRYPT' and record maps the field
+    names (COUNT, KEY, IV, PLAINTEXT, CIPHERTEXT) to their values.
+    """
+    direction, record = None, {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#') or line.startswith('['):
+            if record:
+                yield direction, record
+                record = {}
+            if line.startswith('['):
+                direction = line.strip('[]')
+            continue
+        name, _, value = line.partition('=')
+        record[name.strip()] = value.strip()
+    if record:
+        yield direction, record
+
+
+def file_kind(path):
+    """(mode, kind) of a response file from its name, e.g. ('CBC', 'MCT')."""
+    name = os.path.basename(path).upper()
+    mode = 'CBC' if name.startswith('CBC') else 'ECB'
+    return mode, 'MCT' if 'MCT' in name else 'KAT'
+
+
+def _xor(a, b):
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(16, 'big')
+
+
+def _blocks(data):
+    return [data[i:i + 16] for i in range(0, len(data), 16)]
+
+
+def check_kat(mode, direction, record, engine):
+    """Check one known-answer or MMT record; returns (passed, blocks processed)."""
+    key = bytes.fromhex(record['KEY'])
+    plaintext = bytes.fromhex(record['PLAINTEXT'])
+    ciphertext = bytes.fromhex(record['CIPHERTEXT'])
+    chain = bytes.fromhex(record['IV']) if mode == 'CBC' else None
+
+    output = []
+    if direction == 'ENCRYPT':
+        for block in _blocks(plaintext):
+            if chain is not None:
+                block = chain = encrypt_aes(_xor(block, chain), key, engine=engine)
+            else:
+                block = encrypt_aes(block, key, engine=engine)
+            output.append(block)
+        expected = ciphertext
+    else:
+        for block in _blocks(ciphertext):
+            decrypted = decrypt_aes(block, key, engine=engine)
+            if chain is not None:
+                decrypted, chain = _xor(decrypted, chain), block
+            output.append(decrypted)
+        expected = plaintext
+    return b''.join(output) == expected, len(output)
+
+
+def mct_inner(mode, direction, key, iv, block, engine):
+    """
+    Run the 1000 inner iterations of one Monte Carlo record; returns the
+    last output and the one before it.
+    """
+    if mode == 'ECB':
+        crypt = encrypt_aes if direction == 'ENCRYPT' else decrypt_aes
+        output = block
+        for _ in range(MCT_ITERATIONS):
+            block, output = output, crypt(output, key, engine=engine)
+        return output, block
+
+    # CBC: the chaining value is the previous ciphertext; the next input is
+    # the IV on the first iteration, then the output from two iterations
+    # back (AESAVS 6.4.2)
+    chain = previous = iv
+    if direction == 'ENCRYPT':
+        for _ in range(MCT_ITERATIONS):
+            output = encrypt_aes(_xor(block, chain), key, engine=engine)
+            block, chain = chain, output
+    else:
+        for _ in range(MCT_ITERATIONS):
+            output = _xor(decrypt_aes(block, key, engine=engine), chain)
+            chain, block, previous = block, previous, output
+    return output, block
+
+
+def mct_next(mode, key, output, previous):
+    """
+    (KEY, IV, input) of the next Monte Carlo record from this record's key
+    and its last two outputs: the key is XORed with the trailing key-size
+    bytes of previous || output, the IV is the last output and the input is
+    the output before it (the last output for ECB, which has no IV).
+    """
+    tail = (previous + output)[-len(key):]
+    key = bytes(a ^ b for a, b in zip(key, tail))
+    if mode == 'ECB':
+        return key, None, output
+    return key, output, previous
+
+
+def check_mct(mode, records, engine):
+    """
+    Check Monte Carlo records, a list of (direction, record); returns
+    (passed, blocks processed) per record. Consecutive records of one
+    direction are run as a chain from the first one's KEY/IV/input, so a
+    record passes only if its own KEY, IV and input match the values
+    derived from the previous record and its output matches.
+    """
+    results = []
+    derived = last = None
+    for direction, record in records:
+        inputs = (bytes.fromhex(record['KEY']), bytes.fromhex(record['IV']) if 'IV' in record else None,
+                  bytes.fromhex(record['PLAINTEXT' if direction == 'ENCRYPT' else 'CIPHERTEXT']))
+        expected = bytes.fromhex(record['CIPHERTEXT' if direction == 'ENCRYPT' else 'PLAINTEXT'])
+        chained = last == (direction, int(record['COUNT']) - 1)
+        key, iv, block = derived if chained else inputs
+
+        output, previous = mct_inner(mode, direction, key, iv, block, engine)
+        results.append(((key, iv, block) == inputs and output == expected, MCT_ITERATIONS))
+        derived = mct_next(mode, key, output, previous)
+        last = (direction, int(record['COUNT']))
+    return results
+
+
+def run_batch(task):
+    """
+    Check one batch of records from a file with one engine. Returns
+    (file name, engine, passed, failed COUNTs, blocks, CPU seconds).
+    """
+    name, mode, kind, engine, records = task
+    start = time.process_time()
+    if kind == 'MCT':
+        results = check_mct(mode, records, engine)
+    else:
+        results = (check_kat(mode, direction, record, engine) for direction, record in records)
+    passed, failed, blocks = 0, [], 0
+    for (direction, record), (ok, count) in zip(records, results):
+        blocks += count
+        if ok:
+            passed += 1
+        else:
+            failed.append(f"{direction} COUNT={record.get('COUNT')}")
+    return name, engine, passed, failed, blocks, time.process_time() - start
+
+
+def iter_tasks(paths, engines, skip_mct=False):
+    """Stream the response files into run_batch() tasks."""
+    for path in paths:
+        mode, kind = file_kind(path)
+        if kind == 'MCT' and skip_mct:
+            continue
+        name = os.path.basename(path)
+        with open(path) as f:
+            items = parse_rsp(f)
+            if kind == 'MCT':
+                batches = (list(group) for _, group in groupby(items, key=itemgetter(0)))
+            else:
+                batches = iter(lambda: list(islice(items, KAT_BATCH_SIZE)), [])
+            for batch in batches:
+                for engine in engines:
+                    yield name, mode, kind, engine, batch
+
+
+def verify(paths, engines=ENGINES, workers=None, skip_mct=False):
+    """
+    Check every record of `paths` with each engine using `workers` processes
+    (1 runs in this process). Returns {(file name, engine): [passed, failed
+    COUNTs, blocks, CPU seconds]} in file order.
+    """
+    tasks = iter_tasks(paths, engines, skip_mct)
+    if workers == 1:
+        results = map(run_batch, tasks)
+        return _collect(results)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return _collect(executor.map(run_batch, tasks))
+
+
+def _collect(results):
+    report = {}
+    for name, engine, passed, failed, blocks, cpu in results:
+        entry = report.setdefault((name, engine), [0, [], 0, 0.0])
+        entry[0] += passed
+        entry[1].extend(failed)
+        entry[2] += blocks
+        entry[3] += cpu
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='*', help='AESAVS .rsp files (default: vectors/aesavs/*.rsp)')
+    parser.add_argument('--engine', choices=ENGINES + ('all',), default='all')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--skip-mct', action='store_true', help='skip the Monte Carlo files')
+    args = parser.parse_args()
+
+    paths = args.files or sorted(glob.glob(os.path.join(VECTORS_DIR, '*.rsp')))
+    engines = ENGINES if args.engine == 'all' else (args.engine,)
+    start = time.perf_counter()
+    report = verify(paths, engines, args.workers, args.skip_mct)
+    wall = time.perf_counter() - start
+
+    width = max(len(name) for name, _ in report)
+    total_passed = total_failed = total_blocks = 0
+    for (name, engine), (passed, failed, blocks, cpu) in report.items():
+        status = 'ok' if not failed else f"FAILED: {', '.join(failed[:5])}{' ...' if len(failed) > 5 else ''}"
+        print(f"{name:<{width}}  {engine:<6}  {passed:>5}/{passed + len(failed):<5}  "
+              f"{blocks / cpu if cpu else 0:>10,.0f} blocks/s  {status}")
+        total_passed += passed
+        total_failed += len(failed)
+        total_blocks += blocks
+
+    print(f"\n{total_passed} passed, {total_failed} failed; {total_blocks:,} blocks in {wall:.2f} s "
+          f"({total_blocks / wall:,.0f} blocks/s, {total_blocks * 16 / wall / 1e6:.2f} MB/s "
+          f"with {args.workers} workers)")
+    return 1 if total_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
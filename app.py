@@ -1,13 +1,116 @@
-from flask import Flask, request, render_template
+from flask import Flask, Response, g, request, render_template, stream_with_context, template_rendered, url_for
 import binascii
+import click
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
 from datetime import datetime
+from functools import partial
+from urllib.parse import urlencode
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_accept_header
+try:
+    import brotli
+except ImportError:
+    brotli = None
 from aes_lib import (
-    Sbox, pad, bytes_to_matrix, matrix_to_bytes, sub_bytes, shift_rows, mix_columns,
-    add_round_key, rotate_word, expand_key, matrix_to_html, matrices_to_process_html
+    cached_expand_key, cached_key_expansion_html, matrix_to_bytes, matrix_to_html, matrices_to_process_html,
+    mix_columns_html, trace_aes, trace_aes_decrypt, iter_trace_aes, LRUCache, Trace,
+    KEY_ROUNDS, METRICS, timed
 )
 
+
+
+class PackagedBytecodeCache(FileSystemBytecodeCache):
+    """
+    Jinja bytecode cache that can be built at packaging time and shipped
+    read-only (e.g. in Lambda's /var/task). Entries are keyed by template
+    name only, so they survive a different install path; stale or foreign
+    entries fail Jinja's source checksum and are recompiled in memory.
+    """
+
+    def get_cache_key(self, name, filename=None):
+        return super().get_cache_key(name)
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            # Read-only cache directory: keep the compiled template in memory only
+            pass
+
+
 app = Flask(__name__)
 
+# Optional directory of precompiled template bytecode (see precompile-templates)
+if os.environ.get('AES_JINJA_CACHE_DIR'):
+    app.jinja_options = {
+        **app.jinja_options,
+        'bytecode_cache': PackagedBytecodeCache(os.environ['AES_JINJA_CACHE_DIR']),
+    }
+
+# Opt-in cache for rendered visualisation pages: '' (disabled), 'memory',
+# 'disk', or any object with get(key) / put(key, body) methods
+app.config['RENDER_CACHE'] = os.environ.get('AES_RENDER_CACHE', '')
+app.config['RENDER_CACHE_SIZE'] = int(os.environ.get('AES_RENDER_CACHE_SIZE', 128))
+app.config['RENDER_CACHE_DIR'] = os.environ.get(
+    'AES_RENDER_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'aes-visualiser-cache')
+)
+
+# Stream the visualisation page round by round instead of rendering it in
+# one piece; only used while the render cache is disabled
+app.config['STREAM_HTML'] = os.environ.get('AES_STREAM_HTML', '').lower() in ('1', 'true', 'yes')
+app.config['STREAM_CHUNK_SIZE'] = int(os.environ.get('AES_STREAM_CHUNK_SIZE', 16 * 1024))
+
+# Serve pages built by `flask prerender` from static/prerendered when the
+# input matches one of the pre-rendered vectors
+app.config['PRERENDERED'] = os.environ.get('AES_PRERENDERED', '1').lower() not in ('0', 'false', 'no')
+app.config['PRERENDER_DIR'] = os.path.join(app.static_folder, 'prerendered')
+
+# Response pipeline: minify HTML and compress text bodies with the best
+# encoding the client accepts (brotli only if the package is installed)
+app.config['MINIFY_HTML'] = os.environ.get('AES_MINIFY_HTML', '1').lower() not in ('0', 'false', 'no')
+app.config['COMPRESS'] = os.environ.get('AES_COMPRESS', '1').lower() not in ('0', 'false', 'no')
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('AES_COMPRESS_LEVEL', 6))
+app.config['BROTLI_LEVEL'] = int(os.environ.get('AES_BROTLI_LEVEL', 5))
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('AES_COMPRESS_MIN_SIZE', 1024))
+
+# Batch endpoint limits: pairs and body bytes per request, and the threads
+# shared by all batches
+app.config['BATCH_MAX_PAIRS'] = int(os.environ.get('AES_BATCH_MAX_PAIRS', 100))
+app.config['BATCH_MAX_BYTES'] = int(os.environ.get('AES_BATCH_MAX_BYTES', 64 * 1024))
+
+# Ship only the summary matrices and fetch each step's detailed explanation
+# from /api/fragment when it is expanded
+app.config['LAZY_DETAILS'] = os.environ.get('AES_LAZY_DETAILS', '1').lower() not in ('0', 'false', 'no')
+
+try:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'VERSION')) as f:
+        APP_VERSION = f.read().strip()
+except OSError:
+    APP_VERSION = 'dev'
+
+
+@app.cli.command('precompile-templates')
+@click.argument('directory')
+def precompile_templates(directory):
+    """Compile every template into a Jinja bytecode cache in DIRECTORY."""
+    os.makedirs(directory, exist_ok=True)
+    # Uncached overlay, so every template is compiled and dumped
+    env = app.jinja_env.overlay(bytecode_cache=PackagedBytecodeCache(directory), cache_size=0)
+    names = env.list_templates(extensions=['html'])
+    for name in names:
+        env.get_template(name)
+    click.echo(f"Compiled {len(names)} templates into {directory}")
+
 
 # Add a custom filter for hex formatting
 @app.template_filter('hex')
@@ -18,325 +121,869 @@ def hex_filter(value):
     return value
 
 
-@app.route('/', methods=['GET', 'POST'])
-def index():
-    if request.method == 'POST':
-        key = request.form['key']
-        word = request.form['word']
-        error = None
-
-        if not key or not word:
-            error = "Key and word cannot be empty"
-        elif len(key) != 16 or len(word) != 16:
-            error = "Key and word must be exactly 16 characters (16 bytes)"
-
-        if error:
-            return render_template('landing.html', error=error)
-
-        key = key.encode('utf-8')
-        word = word.encode('utf-8')
-
-        steps = []
-        explanation_rows = []
-
-        # Step 1: Convert Plaintext to 4×4 Hex Matrix
-        state = bytes_to_matrix(word)
-        explanation_rows = []
-        for i in range(4):
-            for j in range(4):
-                explanation_rows.append((
-                    f"Character '{chr(word[i + 4 * j])}' to Hex",
-                    f"0x{word[i + 4 * j]:02X}"
-                ))
-        steps.append({
-            'title': 'Step 1: Convert Plaintext to 4×4 Hex Matrix',
-            'matrix_html': matrix_to_html(state),
-            'description': 'Transform each ASCII character of the input word into hex and populate a 4×4 matrix column-wise.',
-            'explanation_rows': explanation_rows,
-            'id_suffix': 'step1_explanation'
-        })
-
-        # Step 2: Convert Key to 4×4 Hex Matrix
-        key_matrix = bytes_to_matrix(key)
-        explanation_rows = []
-        for i in range(4):
-            for j in range(4):
-                explanation_rows.append((
-                    f"Character '{chr(key[i + 4 * j])}' to Hex",
-                    f"0x{key[i + 4 * j]:02X}"
-                ))
-        steps.append({
-            'title': 'Step 2: Convert Key to 4×4 Hex Matrix',
-            'matrix_html': matrix_to_html(key_matrix),
-            'description': 'Transform each ASCII character of the key into hex and populate a 4×4 matrix column-wise.',
-            'explanation_rows': explanation_rows,
-            'id_suffix': 'step2_explanation'
-        })
-
-        # Round 0 — Initial Round (Pre-Whitening)
-        # Step 3: AddRoundKey
-        explanation_rows = []
-        for i in range(4):
-            for j in range(4):
-                explanation_rows.append((
-                    f"State[{i}][{j}] ⊕ Key[{i}][{j}]",
-                    f"0x{state[i][j]:02X} ⊕ 0x{key_matrix[i][j]:02X} = 0x{state[i][j] ^ key_matrix[i][j]:02X}"
-                ))
-
-        state = add_round_key(state, key_matrix, [])
-        steps.append({
-            'title': 'Round 0 — Initial Round (Pre-Whitening): AddRoundKey',
-            'matrix_html': matrix_to_html(state),
-            'description': 'XOR each byte of the plaintext matrix with the corresponding byte of the key matrix.',
-            'explanation_rows': explanation_rows,
-            'id_suffix': 'step3_explanation'
-        })
-
-        # Generate all round keys in advance using the correct key expansion
-        key_expansion_logs = []
-        round_keys = expand_key(key, key_expansion_logs)
-
-        # Rounds 1 to 9 — Main AES Rounds
-        for round_idx in range(1, 10):
-            round_title = f"Round {round_idx}"
-
-            # SubBytes
-            explanation_rows = []
-            for i in range(4):
-                for j in range(4):
-                    explanation_rows.append((
-                        f"S-box[0x{state[i][j]:02X}]",
-                        f"0x{Sbox[state[i][j]]:02X}"
-                    ))
-
-            before_state = [row[:] for row in state]
-            state = sub_bytes(state, [])
+# Content types worth minifying/compressing, and the encodings we can produce
+# in order of preference
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript')
+COMPRESS_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def minify_html(html):
+    """Drop comments, indentation and blank lines (no template uses <pre>/<textarea>)."""
+    html = re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL)
+    return '\n'.join(line.strip() for line in html.splitlines() if line.strip())
+
+
+def negotiate_encoding(accept_encoding):
+    """Best content encoding allowed by an Accept-Encoding header, or None for identity."""
+    if not app.config['COMPRESS']:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    for encoding in COMPRESS_ENCODINGS:
+        if accepted[encoding]:
+            return encoding
+    return None
+
+
+def compress_body(body, encoding, level=None):
+    """Compress `body` with 'br' or 'gzip' at `level` (default: the configured level)."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=app.config['BROTLI_LEVEL'] if level is None else level)
+    return gzip.compress(body, app.config['COMPRESS_LEVEL'] if level is None else level, mtime=0)
+
+
+@template_rendered.connect_via(app)
+def count_template_render(sender, template, context, **extra):
+    """Count render_template() calls per template (metrics enabled only)."""
+    METRICS.inc('template_renders', template=template.name)
+
+
+@app.before_request
+def start_request_metrics():
+    """Time the request and collect its stage timings while metrics are enabled."""
+    if METRICS.enabled:
+        METRICS.start_request()
+        g.request_started = (time.perf_counter(), time.thread_time(), threading.get_ident())
+
+
+def finish_request_metrics(status):
+    """Record the request as the 'request' stage; returns its stage timings, or None if it was not timed."""
+    started = g.pop('request_started', None)
+    if started is None:
+        return None
+    wall_start, cpu_start, thread = started
+    # A streamed response may finish on another thread, whose CPU clock is unrelated
+    cpu = time.thread_time() - cpu_start if threading.get_ident() == thread else 0.0
+    METRICS.observe('request', time.perf_counter() - wall_start, cpu)
+    METRICS.inc('requests', endpoint=request.endpoint or 'none', status=status)
+    return METRICS.finish_request()
+
+
+# Registered before compress_response so it runs after it and includes its time
+@app.after_request
+def add_server_timing(response):
+    """
+    Report the request's stage timings in a Server-Timing header. Streamed
+    bodies render after the headers are sent, so they get no header and are
+    recorded when the request is torn down.
+    """
+    if response.is_streamed:
+        g.response_status = response.status_code
+        return response
+    timings = finish_request_metrics(response.status_code)
+    if timings is not None:
+        response.headers['Server-Timing'] = ', '.join(
+            f"{name};dur={wall * 1000:.3f}" + (f';desc="{calls} calls"' if calls > 1 else '')
+            for name, (wall, calls) in timings.items()
+        )
+    return response
+
+
+@app.teardown_request
+def teardown_request_metrics(error=None):
+    """Record requests add_server_timing did not finish: streamed responses and errors."""
+    finish_request_metrics(500 if error is not None else g.pop('response_status', 500))
+
+
+@app.after_request
+def compress_response(response):
+    """
+    Minify and compress buffered text responses. Responses that already vary
+    on Accept-Encoding (cached and pre-rendered pages) were encoded by their
+    route; streamed responses and static files are passed through.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_TYPES or 'Accept-Encoding' in response.vary):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if app.config['MINIFY_HTML'] and response.mimetype == 'text/html':
+        with METRICS.stage('minify'):
+            body = minify_html(body.decode('utf-8')).encode('utf-8')
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding and len(body) >= app.config['COMPRESS_MIN_SIZE']:
+        with METRICS.stage('compress'):
+            body = compress_body(body, encoding)
+        response.content_encoding = encoding
+        # The compressed body is a different representation of the same page
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+    response.set_data(body)
+    return response
+
+
+class DiskRenderCache:
+    """On-disk render cache backend storing one file per cache key."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, cache_key):
+        return os.path.join(self.directory, f"{cache_key}.html")
+
+    def get(self, cache_key):
+        try:
+            with open(self._path(cache_key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, cache_key, body):
+        # Write to a temporary file first so readers never see partial pages
+        path = self._path(cache_key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    """Return the configured render cache backend, or None when caching is off."""
+    backend = app.config.get('RENDER_CACHE')
+    if backend is None or backend == '':
+        return None
+    if not isinstance(backend, str):
+        return backend
+
+    caches = app.extensions.setdefault('render_cache', {})
+    with _render_cache_lock:
+        if backend not in caches:
+            if backend == 'memory':
+                caches[backend] = LRUCache(app.config['RENDER_CACHE_SIZE'])
+                METRICS.register_cache('render', caches[backend])
+            elif backend == 'disk':
+                caches[backend] = DiskRenderCache(app.config['RENDER_CACHE_DIR'])
+            else:
+                raise ValueError(f"Unknown RENDER_CACHE backend: {backend!r}")
+        return caches[backend]
+
+
+def render_cache_key(key, word, year):
+    """Cache key and ETag for a rendered page; the page is deterministic in these inputs."""
+    digest = hashlib.sha256()
+    lazy = b'lazy' if app.config['LAZY_DETAILS'] else b'full'
+    for part in (APP_VERSION.encode('utf-8'), lazy, str(year).encode('utf-8'), key, word):
+        digest.update(len(part).to_bytes(4, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _character_rows(data):
+    """Explanation rows for converting characters into a column-wise hex matrix."""
+    return [
+        (f"Character '{chr(data[i + 4 * j])}' to Hex", f"0x{data[i + 4 * j]:02X}")
+        for i in range(4) for j in range(len(data) // 4)
+    ]
+
+
+def _mix_columns_rows(before, after):
+    """Explanation rows for a MixColumns step: the rendered partial."""
+    return [("MixColumns Detailed", mix_columns_html(before, after))]
+
+
+def _key_generation_rows(key, round_idx):
+    """Explanation rows for a round key generation step: the rendered partial."""
+    return [(f"Round {round_idx} Key Generation Detailed", cached_key_expansion_html(key, round_idx))]
+
+
+def _steps_for_round(trace, key, word, round_idx):
+    """Steps of one round; round 0 includes the plaintext and key matrices."""
+    if round_idx == 0:
+        return _initial_steps(trace, key, word)
+    return _round_steps(trace, key, round_idx)
+
+
+def _fragment_url(key, word):
+    """/api/fragment URL for (key, word), to be completed with round and op."""
+    return f"{url_for('api_fragment')}?{urlencode({'key': key, 'word': word})}"
+
+
+def _collapsed_round_numbers(key):
+    """Rounds the page shows only on request: 2 to Nr-1."""
+    return range(2, KEY_ROUNDS[len(key)])
+
+
+def _deferred_steps(trace, key, word, round_idx, fragment_url):
+    """Steps of one round without explanation rows; each links its /api/fragment details instead."""
+    for step in _steps_for_round(trace, key, word, round_idx):
+        del step['explain']
+        step['detail_url'] = f"{fragment_url}&round={step['round']}&op={step['op']}"
+        yield step
+
+
+def iter_steps(trace, key, word, rounds=None, details=True):
+    """
+    Yield the visualisation steps for an encryption Trace round by round.
+    `rounds` yields round numbers as they complete (see iter_trace_aes());
+    it defaults to the rounds already in a finished trace. With
+    `details=False` the explanation rows are not built; each step gets a
+    `detail_url` pointing at /api/fragment instead, and the collapsed rounds
+    are left out (the page fetches them from /api/fragment with op=Rounds).
+    """
+    if rounds is None:
+        rounds = trace.rounds()
+    if not details:
+        fragment_url = _fragment_url(key, word)
+        collapsed = _collapsed_round_numbers(key)
+    for round_idx in rounds:
+        if details:
+            for step in _steps_for_round(trace, key, word, round_idx):
+                step['explanation_rows'] = step.pop('explain')()
+                yield step
+        elif round_idx not in collapsed:
+            yield from _deferred_steps(trace, key, word, round_idx, fragment_url)
+    yield _final_step(trace, key, word)
+
+
+@timed('build_steps')
+def build_steps(trace, key, word, details=True):
+    """Turn an encryption Trace from trace_aes() into the visualisation steps."""
+    return list(iter_steps(trace, key, word, details=details))
+
+
+def _initial_steps(trace, key, word):
+    """Plaintext and key matrices, then round 0."""
+    steps = []
+
+    # Step 1: Convert Plaintext to 4×4 Hex Matrix
+    steps.append({
+        'title': 'Step 1: Convert Plaintext to 4×4 Hex Matrix',
+        'matrix_html': matrix_to_html(trace.meta['plaintext']),
+        'description': 'Transform each ASCII character of the input word into hex and populate a 4×4 matrix column-wise.',
+        'explain': partial(_character_rows, word),
+        'round': 0, 'op': 'Plaintext',
+        'id_suffix': 'step1_explanation'
+    })
+
+    # Step 2: Convert Key to 4×Nk Hex Matrix (4×4, 4×6 or 4×8)
+    key_shape = f"4×{len(key) // 4}"
+    steps.append({
+        'title': f'Step 2: Convert Key to {key_shape} Hex Matrix',
+        'matrix_html': matrix_to_html(trace.meta['key']),
+        'description': f'Transform each ASCII character of the key into hex and populate a {key_shape} matrix column-wise.',
+        'explain': partial(_character_rows, key),
+        'round': 0, 'op': 'Key',
+        'id_suffix': 'step2_explanation'
+    })
+
+    # Round 0 — Initial Round (Pre-Whitening)
+    # Step 3: AddRoundKey
+    record = trace.get(0, 'AddRoundKey')
+    steps.append({
+        'title': 'Round 0 — Initial Round (Pre-Whitening): AddRoundKey',
+        'matrix_html': matrix_to_html(record['after']),
+        'description': 'XOR each byte of the plaintext matrix with the corresponding byte of the key matrix.',
+        'explain': record.rows,
+        'round': 0, 'op': 'AddRoundKey',
+        'id_suffix': 'step3_explanation'
+    })
+    return steps
+
+
+def _round_steps(trace, key, round_idx):
+    """Steps of one main round (1 to Nr-1) or of the final round."""
+    steps = []
+    round_keys = trace.meta['round_keys']
+    is_final = round_idx == len(round_keys) - 1
+    round_title = f"Round {round_idx} (Final)" if is_final else f"Round {round_idx}"
+
+    for record in trace.round_records(round_idx):
+        op = record.op
+        before, after = record['before'], record['after']
+
+        if op == 'SubBytes':
             steps.append({
                 'title': f"{round_title}: SubBytes",
-                'matrix_html': matrices_to_process_html(before_state, state, 'SubBytes Transformation'),
+                'matrix_html': matrices_to_process_html(before, after, 'SubBytes Transformation'),
                 'description': 'Substitute each byte in the matrix using the AES S-box.',
-                'explanation_rows': explanation_rows,
+                'explain': record.rows,
+                'round': round_idx, 'op': 'SubBytes',
                 'id_suffix': f'round{round_idx}_subbytes_explanation'
             })
-
-            # ShiftRows
-            explanation_rows = []
-            explanation_rows.append(("Row 0", "Unchanged"))
-            explanation_rows.append(("Row 1", "Left-rotate by 1"))
-            explanation_rows.append(("Row 2", "Left-rotate by 2"))
-            explanation_rows.append(("Row 3", "Left-rotate by 3"))
-
-            before_state = [row[:] for row in state]
-            state = shift_rows(state, [])
+        elif op == 'ShiftRows':
             steps.append({
                 'title': f"{round_title}: ShiftRows",
-                'matrix_html': matrices_to_process_html(before_state, state, 'ShiftRows Transformation'),
+                'matrix_html': matrices_to_process_html(before, after, 'ShiftRows Transformation'),
                 'description': 'Row 0: unchanged, Row 1: left-rotate by 1, Row 2: left-rotate by 2, Row 3: left-rotate by 3.',
-                'explanation_rows': explanation_rows,
+                'explain': record.rows,
+                'round': round_idx, 'op': 'ShiftRows',
                 'id_suffix': f'round{round_idx}_shiftrows_explanation'
             })
-
-            # MixColumns
-            log = []
-            before_state = [row[:] for row in state]
-            state = mix_columns(state, log)
-
-            # Check for detailed MixColumns explanation
-            mix_columns_explanation_rows = []
-            detailed_html = None
-
-            # First, look for the detailed HTML explanation
-            for log_entry in log:
-                if log_entry[0] == "MixColumns Detailed":
-                    detailed_html = log_entry[1]
-                    break
-
-            # If we found a detailed explanation, use it as the only explanation row
-            if detailed_html:
-                mix_columns_explanation_rows = [("MixColumns Detailed", detailed_html)]
-            else:
-                # Otherwise, fall back to the original log entries
-                mix_columns_explanation_rows = log
-
+        elif op == 'MixColumns':
             steps.append({
                 'title': f"{round_title}: MixColumns",
-                'matrix_html': matrices_to_process_html(before_state, state, 'MixColumns Transformation'),
+                'matrix_html': matrices_to_process_html(before, after, 'MixColumns Transformation'),
                 'description': 'This step enhances diffusion — every output byte depends on all 4 bytes of the column.',
-                'explanation_rows': mix_columns_explanation_rows,
+                'explain': partial(_mix_columns_rows, before, after),
+                'round': round_idx, 'op': 'MixColumns',
                 'id_suffix': f'round{round_idx}_mixcolumns_explanation'
             })
-
+        elif op == 'AddRoundKey':
             # Round Key Generation Explanation
-            key_gen_explanation_rows = []
-            detailed_html = None
-
-            # First, look for the detailed HTML explanation
-            for log_entry in key_expansion_logs:
-                if log_entry[0] == f"Round {round_idx} Key Generation Detailed":
-                    detailed_html = log_entry[1]
-                    break
-
-            # If we found a detailed explanation, use it as the only explanation row
-            if detailed_html:
-                key_gen_explanation_rows = [(f"Round {round_idx} Key Generation Detailed", detailed_html)]
+            if is_final:
+                description = f'Generation of the final Round Key ({round_idx}) using the AES key schedule algorithm.'
             else:
-                # Otherwise, fall back to the original log entries
-                for log_entry in key_expansion_logs:
-                    # Use exact match to avoid confusion between rounds (e.g., Round 1 vs Round 10)
-                    if (log_entry[0].startswith(f"Round {round_idx} ") or
-                            log_entry[0].startswith(f"Generate first column of round key {round_idx}") and (
-                                    len(log_entry[0]) == len(f"Generate first column of round key {round_idx}") or not
-                            log_entry[0][len(f"Generate first column of round key {round_idx}")].isdigit()) or
-                            log_entry[0].startswith(f"Generate remaining columns of round key {round_idx}") and (
-                                    len(log_entry[0]) == len(
-                                f"Generate remaining columns of round key {round_idx}") or not log_entry[0][
-                                len(f"Generate remaining columns of round key {round_idx}")].isdigit())):
-                        key_gen_explanation_rows.append(log_entry)
-
+                description = f'Generation of Round Key {round_idx} using the AES key schedule algorithm.'
             steps.append({
                 'title': f"{round_title}: Round Key Generation",
                 'matrix_html': matrix_to_html(round_keys[round_idx]),
-                'description': f'Generation of Round Key {round_idx} using the AES key schedule algorithm.',
-                'explanation_rows': key_gen_explanation_rows,
+                'description': description,
+                'explain': partial(_key_generation_rows, key, round_idx),
+                'round': round_idx, 'op': 'KeyGeneration',
                 'id_suffix': f'round{round_idx}_key_generation_explanation'
             })
 
-            # AddRoundKey
-            explanation_rows = []
-            for i in range(4):
-                for j in range(4):
-                    explanation_rows.append((
-                        f"State[{i}][{j}] ⊕ RoundKey{round_idx}[{i}][{j}]",
-                        f"0x{state[i][j]:02X} ⊕ 0x{round_keys[round_idx][i][j]:02X} = 0x{state[i][j] ^ round_keys[round_idx][i][j]:02X}"
-                    ))
-
-            before_state = [row[:] for row in state]
-            state = add_round_key(state, round_keys[round_idx], [])
             steps.append({
                 'title': f"{round_title}: AddRoundKey",
-                'matrix_html': matrices_to_process_html(before_state, state, 'AddRoundKey Transformation'),
-                'description': 'XOR current state with round key.',
-                'explanation_rows': explanation_rows,
+                'matrix_html': matrices_to_process_html(before, after, 'AddRoundKey Transformation'),
+                'description': 'XOR current state with the final round key.' if is_final else 'XOR current state with round key.',
+                'explain': record.rows,
+                'round': round_idx, 'op': 'AddRoundKey',
                 'id_suffix': f'round{round_idx}_addroundkey_explanation'
             })
-
-        # Round 10 — Final Round
-        # SubBytes
-        explanation_rows = []
-        for i in range(4):
-            for j in range(4):
-                explanation_rows.append((
-                    f"S-box[0x{state[i][j]:02X}]",
-                    f"0x{Sbox[state[i][j]]:02X}"
-                ))
-
-        before_state = [row[:] for row in state]
-        state = sub_bytes(state, [])
-        steps.append({
-            'title': "Round 10 (Final): SubBytes",
-            'matrix_html': matrices_to_process_html(before_state, state, 'SubBytes Transformation'),
-            'description': 'Substitute each byte in the matrix using the AES S-box.',
-            'explanation_rows': explanation_rows,
-            'id_suffix': 'round10_subbytes_explanation'
-        })
-
-        # ShiftRows
-        explanation_rows = []
-        explanation_rows.append(("Row 0", "Unchanged"))
-        explanation_rows.append(("Row 1", "Left-rotate by 1"))
-        explanation_rows.append(("Row 2", "Left-rotate by 2"))
-        explanation_rows.append(("Row 3", "Left-rotate by 3"))
-
-        before_state = [row[:] for row in state]
-        state = shift_rows(state, [])
-        steps.append({
-            'title': "Round 10 (Final): ShiftRows",
-            'matrix_html': matrices_to_process_html(before_state, state, 'ShiftRows Transformation'),
-            'description': 'Row 0: unchanged, Row 1: left-rotate by 1, Row 2: left-rotate by 2, Row 3: left-rotate by 3.',
-            'explanation_rows': explanation_rows,
-            'id_suffix': 'round10_shiftrows_explanation'
-        })
-
-        # Round Key Generation Explanation (Final)
-        key_gen_explanation_rows = []
-        detailed_html = None
-
-        # First, look for the detailed HTML explanation
-        for log_entry in key_expansion_logs:
-            if log_entry[0] == "Round 10 Key Generation Detailed":
-                detailed_html = log_entry[1]
-                break
-
-        # If we found a detailed explanation, use it as the only explanation row
-        if detailed_html:
-            key_gen_explanation_rows = [("Round 10 Key Generation Detailed", detailed_html)]
+    return steps
+
+
+def _final_step(trace, key, word):
+    """The ciphertext summary closing the page."""
+    final_hex = binascii.hexlify(trace.meta['ciphertext']).decode('utf-8').upper()
+    return {
+        'title': "Final Encrypted Result",
+        'matrix_html': None,
+        'description': f'The final AES-{len(key) * 8} encrypted output in hexadecimal format.',
+        'explanation_rows': [
+            (
+                "Final Encrypted Output (Hex)",
+                f"<div style='font-size: 1.2em; font-weight: bold; margin: 15px 0;'>{final_hex}</div>"
+            ),
+            ("Original Plaintext", f"<div style='margin: 5px 0;'>{word.decode('utf-8')}</div>"),
+            ("Encryption Key", f"<div style='margin: 5px 0;'>{key.decode('utf-8')}</div>"),
+        ],
+        'id_suffix': 'final_result'
+    }
+
+
+def _visualization_context(key, word, year, steps, details):
+    """
+    Template context for visualize.html; `steps` may be a list or a
+    generator. Without `details`, the collapsed rounds are fetched from
+    `rounds_url` when first shown.
+    """
+    return {
+        'steps': steps,
+        'year': year,
+        'aes_bits': len(key) * 8,
+        'rounds': KEY_ROUNDS[len(key)],
+        'collapsed_rounds': [f'Round {r}' for r in _collapsed_round_numbers(key)],
+        'rounds_url': None if details else f"{_fragment_url(key, word)}&op=Rounds",
+    }
+
+
+def render_visualization(key, word, year, details=None):
+    """Run the full visualisation pipeline and return the rendered page."""
+    trace = trace_aes(word, key)
+    if details is None:
+        details = not app.config['LAZY_DETAILS']
+    steps = build_steps(trace, key, word, details=details)
+    with METRICS.stage('render_template'):
+        return render_template('visualize.html', **_visualization_context(key, word, year, steps, details))
+
+
+def _buffered(chunks, size):
+    """Join small template output pieces into chunks of at least `size` characters."""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_visualization(key, word, year):
+    """
+    Stream the visualisation page while it is computed: the header and the
+    round 0 steps go out first, then each round as soon as it is encrypted.
+    Only the current round's steps are held in memory.
+    """
+    trace = Trace()
+    details = not app.config['LAZY_DETAILS']
+    steps = iter_steps(trace, key, word, iter_trace_aes(word, key, trace), details=details)
+    context = _visualization_context(key, word, year, steps, details)
+    app.update_template_context(context)
+    template = app.jinja_env.get_template('visualize.html')
+    chunks = _buffered(template.generate(context), app.config['STREAM_CHUNK_SIZE'])
+    return Response(stream_with_context(chunks), mimetype='text/html')
+
+
+def validate_input(key, word):
+    """Return an error message for an invalid key/plaintext pair, or None."""
+    if not key or not word:
+        return "Key and word cannot be empty"
+    # Lengths count UTF-8 bytes, which is what gets encrypted
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    if isinstance(word, str):
+        word = word.encode('utf-8')
+    if len(key) not in KEY_ROUNDS:
+        return "Key must be 16, 24 or 32 characters (AES-128, AES-192 or AES-256); non-ASCII characters count as 2–4"
+    if len(word) != 16:
+        return "Word must be exactly 16 characters (16 bytes); non-ASCII characters count as 2–4"
+    return None
+
+
+def trace_to_json(trace):
+    """
+    Compact JSON document for an encryption or decryption Trace. Both
+    directions share one shape: `plaintext` and `ciphertext` as hex, the
+    block the rounds start from as the `input` matrix, `direction`, the
+    `key` matrix, the `round_keys` and the `rounds`.
+    """
+    doc = {}
+    for name, value in trace.meta.items():
+        if name in ('plaintext', 'ciphertext') and isinstance(value, list):
+            doc['direction'] = 'encrypt' if name == 'plaintext' else 'decrypt'
+            doc['input'] = value
+            value = matrix_to_bytes(value)
+        doc[name] = value.hex() if isinstance(value, bytes) else value
+    doc['rounds'] = [
+        {
+            'round': round_idx,
+            'steps': [
+                {'op': record.op, 'before': record['before'], 'after': record['after']}
+                for record in trace.round_records(round_idx)
+            ],
+        }
+        for round_idx in trace.rounds()
+    ]
+    return doc
+
+
+def _json_error(error, status=400):
+    """Error response (400 by default) with a JSON error body."""
+    return Response(json.dumps({'error': error}), status=status, mimetype='application/json')
+
+
+@app.route('/api/trace', methods=['GET', 'POST'])
+def api_trace():
+    """
+    Return the per-round state trace as compact JSON (no HTML). Pass `key`
+    and `word` to trace encryption, or `key` and a hex `ciphertext` to trace
+    decryption through the inverse rounds.
+    """
+    params = request.get_json(silent=True) if request.is_json else None
+    if params is None:
+        params = request.values
+    if not isinstance(params, dict):
+        return _json_error("Expected a JSON object with key and word or ciphertext")
+    key = params.get('key', '')
+    word = params.get('word', '')
+    ciphertext = params.get('ciphertext')
+    if not all(isinstance(value, str) for value in (key, word)) \
+            or not isinstance(ciphertext, (str, type(None))):
+        return _json_error("key, word and ciphertext must be strings")
+
+    if ciphertext is not None:
+        try:
+            block = bytes.fromhex(ciphertext)
+        except ValueError:
+            block = b''
+        if len(block) != 16:
+            return _json_error("Ciphertext must be exactly 32 hex digits (16 bytes)")
+        error = validate_input(key, block)
+        if error:
+            return _json_error(error)
+        trace = trace_aes_decrypt(block, key.encode('utf-8'))
+    else:
+        error = validate_input(key, word)
+        if error:
+            return _json_error(error)
+        trace = trace_aes(word.encode('utf-8'), key.encode('utf-8'))
+
+    body = json.dumps(trace_to_json(trace), separators=(',', ':'))
+    return Response(body, mimetype='application/json')
+
+
+# Rendered detail fragments keyed by (key, word, round, op)
+FRAGMENT_CACHE = LRUCache(int(os.environ.get('AES_FRAGMENT_CACHE_SIZE', 512)))
+METRICS.register_cache('fragment', FRAGMENT_CACHE)
+
+
+@timed('render_fragment')
+def render_rounds_fragment(key, word):
+    """Step blocks of the collapsed rounds, fetched when they are first shown."""
+    trace = trace_aes(word, key)
+    fragment_url = _fragment_url(key, word)
+    steps = [step for round_idx in _collapsed_round_numbers(key)
+             for step in _deferred_steps(trace, key, word, round_idx, fragment_url)]
+    return render_template('partials/collapsed_rounds.html', steps=steps,
+                           collapsed_rounds=[f'Round {r}' for r in _collapsed_round_numbers(key)])
+
+
+def render_fragment(key, word, round_idx, op):
+    """Detailed explanation HTML of one step, or None for an unknown step."""
+    trace = Trace()
+    for completed in iter_trace_aes(word, key, trace):
+        if completed == round_idx:
+            break
+    for step in _steps_for_round(trace, key, word, round_idx):
+        if step['op'] == op:
+            step['explanation_rows'] = step.pop('explain')()
+            return render_template('partials/step_details.html', step=step)
+    return None
+
+
+@app.route('/api/fragment')
+def api_fragment():
+    """
+    Detailed explanation of one visualisation step as an HTML fragment,
+    fetched when the step is expanded. The page links each step here with
+    its `key`, `word`, `round` and `op`; `op=Rounds` (no round) returns the
+    steps of the collapsed rounds instead.
+    """
+    key = request.args.get('key', '')
+    word = request.args.get('word', '')
+    op = request.args.get('op', '')
+    error = validate_input(key, word)
+    if error:
+        return _json_error(error)
+    key, word = key.encode('utf-8'), word.encode('utf-8')
+    if op == 'Rounds':
+        round_idx = None
+    else:
+        try:
+            round_idx = int(request.args.get('round', ''))
+        except ValueError:
+            round_idx = -1
+        if not 0 <= round_idx <= KEY_ROUNDS[len(key)]:
+            return _json_error("Unknown round")
+
+    cache_key = (key, word, round_idx, op)
+    html = FRAGMENT_CACHE.get(cache_key)
+    if html is None:
+        if round_idx is None:
+            html = render_rounds_fragment(key, word)
         else:
-            # Otherwise, fall back to the original log entries
-            for log_entry in key_expansion_logs:
-                # Use exact match to avoid confusion between rounds
-                if (log_entry[0].startswith("Round 10 ") or
-                        log_entry[0].startswith("Generate first column of round key 10") and (
-                                len(log_entry[0]) == len("Generate first column of round key 10") or not log_entry[0][
-                            len("Generate first column of round key 10")].isdigit()) or
-                        log_entry[0].startswith("Generate remaining columns of round key 10") and (
-                                len(log_entry[0]) == len("Generate remaining columns of round key 10") or not
-                        log_entry[0][len("Generate remaining columns of round key 10")].isdigit())):
-                    key_gen_explanation_rows.append(log_entry)
-
-        steps.append({
-            'title': "Round 10 (Final): Round Key Generation",
-            'matrix_html': matrix_to_html(round_keys[10]),
-            'description': 'Generation of the final Round Key (10) using the AES key schedule algorithm.',
-            'explanation_rows': key_gen_explanation_rows,
-            'id_suffix': 'round10_key_generation_explanation'
-        })
-
-        # AddRoundKey (Final)
-        explanation_rows = []
-        for i in range(4):
-            for j in range(4):
-                explanation_rows.append((
-                    f"State[{i}][{j}] ⊕ RoundKey10[{i}][{j}]",
-                    f"0x{state[i][j]:02X} ⊕ 0x{round_keys[10][i][j]:02X} = 0x{state[i][j] ^ round_keys[10][i][j]:02X}"
-                ))
-
-        before_state = [row[:] for row in state]
-        state = add_round_key(state, round_keys[10], [])
-        steps.append({
-            'title': "Round 10 (Final): AddRoundKey",
-            'matrix_html': matrices_to_process_html(before_state, state, 'AddRoundKey Transformation'),
-            'description': 'XOR current state with the final round key.',
-            'explanation_rows': explanation_rows,
-            'id_suffix': 'round10_addroundkey_explanation'
-        })
-
-        # Final Output
-        final_bytes = matrix_to_bytes(state)
-        final_hex = binascii.hexlify(final_bytes).decode('utf-8').upper()
-
-        explanation_rows = []
-        explanation_rows.append((
-            "Final Encrypted Output (Hex)",
-            f"<div style='font-size: 1.2em; font-weight: bold; margin: 15px 0;'>{final_hex}</div>"
-        ))
-        explanation_rows.append((
-            "Original Plaintext",
-            f"<div style='margin: 5px 0;'>{word.decode('utf-8')}</div>"
-        ))
-        explanation_rows.append((
-            "Encryption Key",
-            f"<div style='margin: 5px 0;'>{key.decode('utf-8')}</div>"
-        ))
-
-        steps.append({
-            'title': "Final Encrypted Result",
-            'matrix_html': None,
-            'description': 'The final AES-128 encrypted output in hexadecimal format.',
-            'explanation_rows': explanation_rows,
-            'id_suffix': 'final_result'
-        })
-
-        return render_template('visualize.html', steps=steps, year=datetime.now().year)
+            html = render_fragment(key, word, round_idx, op)
+        if html is None:
+            return _json_error("Unknown operation")
+        FRAGMENT_CACHE.put(cache_key, html)
+    response = Response(html, mimetype='text/html')
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response
+
+
+# (key, word) pairs pre-rendered by `flask prerender`: the example used
+# throughout the docs and the classic "Kung Fu" textbook vector
+PRERENDER_VECTORS = [
+    ('electricallycond', 'telecommunicatio'),
+    ('Thats my Kung Fu', 'Two One Nine Two'),
+]
+
+# Content-Encoding -> file suffix of the pre-compressed copies, in order of preference
+PRERENDER_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_prerendered_lock = threading.Lock()
+
+
+@app.cli.command('prerender')
+@click.option('--vectors', type=click.File(), help='JSON list of {"key": ..., "word": ...} (default: PRERENDER_VECTORS)')
+@click.option('--output', help='Output directory (default: static/prerendered)')
+def prerender(vectors, output):
+    """Pre-render, minify and pre-compress the page for each test vector."""
+    if brotli is None:
+        click.echo("brotli not installed; writing gzip copies only")
+
+    pairs = [(v['key'], v['word']) for v in json.load(vectors)] if vectors else PRERENDER_VECTORS
+    output = output or app.config['PRERENDER_DIR']
+    os.makedirs(output, exist_ok=True)
+    # Only remove what an earlier run wrote; the directory may hold other files
+    for name in os.listdir(output):
+        if name == 'manifest.json' or re.fullmatch(r'[0-9a-f]{64}\.html(\.gz|\.br)?', name):
+            os.remove(os.path.join(output, name))
+
+    year = datetime.now().year
+    pages = {}
+    for key, word in pairs:
+        error = validate_input(key, word)
+        if error:
+            raise click.BadParameter(f"{key!r}/{word!r}: {error}")
+        key, word = key.encode('utf-8'), word.encode('utf-8')
+        cache_key = render_cache_key(key, word, year)
+        with app.test_request_context('/', method='POST'):
+            body = minify_html(render_visualization(key, word, year)).encode('utf-8')
+
+        encoded = {encoding: compress_body(body, encoding, level=9 if encoding == 'gzip' else 11)
+                   for encoding in COMPRESS_ENCODINGS}
+        with open(os.path.join(output, f"{cache_key}.html"), 'wb') as f:
+            f.write(body)
+        for encoding, suffix in PRERENDER_ENCODINGS:
+            if encoding in encoded:
+                with open(os.path.join(output, f"{cache_key}.html{suffix}"), 'wb') as f:
+                    f.write(encoded[encoding])
+        pages[cache_key] = sorted(encoded)
+        click.echo(f"{key.decode('utf-8')!r}/{word.decode('utf-8')!r}: {len(body)} bytes, "
+                   + ", ".join(f"{enc} {len(data)}" for enc, data in sorted(encoded.items())))
+
+    # Pages are keyed by render_cache_key, which covers the app version, the
+    # details mode and the copyright year; other inputs are rendered as usual
+    with open(os.path.join(output, 'manifest.json'), 'w') as f:
+        json.dump({'version': APP_VERSION, 'year': year, 'pages': pages}, f, indent=2)
+    click.echo(f"Pre-rendered {len(pages)} pages into {output}")
+
+
+def get_prerendered():
+    """Manifest pages {cache key: [encodings]} of the pre-rendered pages, loaded once."""
+    directory = app.config['PRERENDER_DIR']
+    manifests = app.extensions.setdefault('prerendered', {})
+    pages = manifests.get(directory)
+    if pages is None:
+        with _prerendered_lock:
+            try:
+                with open(os.path.join(directory, 'manifest.json')) as f:
+                    pages = json.load(f)['pages']
+            except (OSError, ValueError, KeyError):
+                pages = {}
+            manifests[directory] = pages
+    return pages
+
+
+def prerendered_page(cache_key, accept_encoding=''):
+    """
+    Pre-rendered page for `cache_key` as (body, content encoding or None),
+    picking the best pre-compressed copy the Accept-Encoding header allows,
+    or None when these inputs were not pre-rendered.
+    """
+    if not app.config['PRERENDERED']:
+        return None
+    encodings = get_prerendered().get(cache_key)
+    if encodings is None:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    path = os.path.join(app.config['PRERENDER_DIR'], f"{cache_key}.html")
+    for encoding, suffix in PRERENDER_ENCODINGS:
+        if encoding in encodings and accepted[encoding]:
+            path, content_encoding = path + suffix, encoding
+            break
+    else:
+        content_encoding = None
+    try:
+        with open(path, 'rb') as f:
+            return f.read(), content_encoding
+    except OSError:
+        return None
+
+
+def parse_batch_pairs():
+    """
+    (key, word) pairs of a batch request: a JSON list of {"key", "word"}
+    objects or [key, word] lists (optionally as {"pairs": [...]}), or CSV
+    with a key,word row per pair (as the body or an uploaded `file`) and an
+    optional header row. Raises ValueError for malformed input.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('pairs')
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON list of pairs")
+        pairs = []
+        for item in data:
+            if isinstance(item, dict):
+                item = (item.get('key'), item.get('word'))
+            if not isinstance(item, (list, tuple)) or len(item) != 2 \
+                    or not all(isinstance(value, str) for value in item):
+                raise ValueError("Each pair must have a string key and word")
+            pairs.append(tuple(item))
+        return pairs
+
+    upload = request.files.get('file')
+    text = upload.read().decode('utf-8-sig') if upload else request.get_data(as_text=True)
+    rows = [row for row in csv.reader(io.StringIO(text)) if row]
+    if rows and [cell.strip().lower() for cell in rows[0]] == ['key', 'word']:
+        rows = rows[1:]
+    if any(len(row) != 2 for row in rows):
+        raise ValueError("Each CSV row must have exactly two columns: key,word")
+    return [tuple(row) for row in rows]
+
+
+def _batch_trace(key, word):
+    """JSON trace document for one batch pair."""
+    return trace_to_json(trace_aes(word.encode('utf-8'), key.encode('utf-8')))
+
+
+def _batch_page(key, word, year):
+    """Rendered page for one batch pair, with every explanation inline."""
+    page = render_visualization(key.encode('utf-8'), word.encode('utf-8'), year, details=True)
+    return minify_html(page) if app.config['MINIFY_HTML'] else page
+
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """
+    Visualise many (key, word) pairs in one request: `format=json` (default)
+    returns the traces as JSON in request order, `format=zip` a ZIP of
+    rendered pages plus an index.json. Identical pairs are computed once and
+    each distinct key is expanded once. The pairs run one after another in
+    the request: tracing is pure Python, so threads would only queue on the
+    GIL.
+    """
+    # Read at most one byte past the cap, so chunked bodies (which have no
+    # Content-Length) are capped too; the cached body then feeds the JSON,
+    # CSV and multipart parsing below
+    limit = app.config['BATCH_MAX_BYTES']
+    request.max_content_length = limit + 1
+    try:
+        too_large = len(request.get_data(cache=True, parse_form_data=False)) > limit
+    except RequestEntityTooLarge:
+        too_large = True
+    if too_large:
+        return _json_error(f"Batch body exceeds {limit} bytes", status=413)
+    try:
+        pairs = parse_batch_pairs()
+    except (ValueError, UnicodeDecodeError) as e:
+        return _json_error(str(e))
+    if not pairs:
+        return _json_error("No pairs given")
+    if len(pairs) > app.config['BATCH_MAX_PAIRS']:
+        return _json_error(f"At most {app.config['BATCH_MAX_PAIRS']} pairs per batch", status=413)
+    for number, (key, word) in enumerate(pairs, 1):
+        error = validate_input(key, word)
+        if error:
+            return _json_error(f"Pair {number}: {error}")
+
+    output = request.args.get('format', 'json')
+    if output not in ('json', 'zip'):
+        return _json_error("format must be 'json' or 'zip'")
+
+    unique = list(dict.fromkeys(pairs))
+    for key in dict.fromkeys(key for key, _ in unique):
+        cached_expand_key(key.encode('utf-8'))
+
+    if output == 'json':
+        results = {pair: _batch_trace(*pair) for pair in unique}
+        body = {'count': len(pairs), 'unique': len(unique), 'results': [results[pair] for pair in pairs]}
+        return Response(json.dumps(body, separators=(',', ':')), mimetype='application/json')
+
+    # Only ZIP batches need zipfile; keep it off the import path of the app
+    import zipfile
+    year = datetime.now().year
+    pages = {(key, word): _batch_page(key, word, year) for key, word in unique}
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        index = []
+        for number, pair in enumerate(pairs, 1):
+            name = f"{number:03d}.html"
+            archive.writestr(name, pages[pair])
+            index.append({'file': name, 'key': pair[0], 'word': pair[1]})
+        archive.writestr('index.json', json.dumps(index, indent=2))
+    response = Response(buffer.getvalue(), mimetype='application/zip')
+    response.headers['Content-Disposition'] = 'attachment; filename="aes-visualisations.zip"'
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of the stage timings and counters (404 while disabled)."""
+    if not METRICS.enabled:
+        return Response("Metrics are disabled (set AES_METRICS=1)\n", status=404, mimetype='text/plain')
+    return Response(METRICS.to_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/', methods=['GET', 'POST'])
+def index():
+    if request.method == 'POST':
+        key = request.form['key']
+        word = request.form['word']
+
+        error = validate_input(key, word)
+        if error:
+            return render_template('landing.html', error=error)
+
+        key = key.encode('utf-8')
+        word = word.encode('utf-8')
+        year = datetime.now().year
+        cache_key = render_cache_key(key, word, year)
+
+        page = prerendered_page(cache_key, request.headers.get('Accept-Encoding', ''))
+        if page is not None:
+            body, encoding = page
+            if request.if_none_match.contains_weak(cache_key):
+                response = Response(status=304)
+            else:
+                response = Response(body, mimetype='text/html')
+                if encoding:
+                    response.content_encoding = encoding
+            response.set_etag(cache_key, weak=encoding is not None)
+            response.vary.add('Accept-Encoding')
+            return response
+
+        cache = get_render_cache()
+        if cache is None:
+            if app.config['STREAM_HTML']:
+                return stream_visualization(key, word, year)
+            return render_visualization(key, word, year)
+
+        # The cache key doubles as the ETag, so a matching If-None-Match
+        # short-circuits before any lookup or rendering
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        if request.if_none_match.contains_weak(cache_key):
+            response = Response(status=304)
+            response.set_etag(cache_key, weak=encoding is not None)
+            response.vary.add('Accept-Encoding')
+            return response
+
+        body = cache.get(cache_key)
+        if body is None:
+            body = render_visualization(key, word, year)
+            if app.config['MINIFY_HTML']:
+                body = minify_html(body)
+            body = body.encode('utf-8')
+            cache.put(cache_key, body)
+
+        # Compressed copies are cached next to the page, one per encoding
+        if encoding:
+            encoded_key = f"{cache_key}.{encoding}"
+            encoded = cache.get(encoded_key)
+            if encoded is None:
+                encoded = compress_body(body, encoding)
+                cache.put(encoded_key, encoded)
+            body = encoded
+
+        response = Response(body, mimetype='text/html')
+        if encoding:
+            response.content_encoding = encoding
+        response.set_etag(cache_key, weak=encoding is not None)
+        response.vary.add('Accept-Encoding')
+        return response
 
     return render_template('landing.html', year=datetime.now().year)
 
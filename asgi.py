@@ -0,0 +1,265 @@
+"""
+ASGI entry point for the Flask app.
+
+Serves the same routes as app.py, but the event loop only handles the
+connections: each request is read in full, then run through the WSGI app on
+a bounded thread pool, and the response is written back from the loop. A
+slow client therefore holds a connection, not a worker thread. When every
+worker is busy, requests wait in a queue of at most AES_ASGI_QUEUE_DEPTH
+entries and get a 503 with Retry-After beyond that. Files under /static are
+answered from memory by the loop itself.
+
+    uvicorn asgi:application [--host 0.0.0.0] [--port 8000]
+"""
+import asyncio
+import contextvars
+import io
+import mimetypes
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.http import parse_etags, quote_etag
+from werkzeug.security import safe_join
+
+from aes_lib import METRICS
+from app import app
+
+# Worker threads for the WSGI app, requests allowed to wait for one, and the
+# largest request body read into memory
+ASGI_WORKERS = int(os.environ.get('AES_ASGI_WORKERS', 4))
+ASGI_QUEUE_DEPTH = int(os.environ.get('AES_ASGI_QUEUE_DEPTH', 64))
+ASGI_MAX_BODY = int(os.environ.get('AES_ASGI_MAX_BODY', 1024 * 1024))
+
+
+class Overloaded(Exception):
+    """Raised when a request would exceed the queue depth."""
+
+
+class AsgiApp:
+    """ASGI application running a WSGI app on a bounded thread pool."""
+
+    def __init__(self, wsgi_app, static_folder, static_url_path, workers=ASGI_WORKERS,
+                 queue_depth=ASGI_QUEUE_DEPTH, max_body=ASGI_MAX_BODY):
+        self.wsgi_app = wsgi_app
+        self.static_folder = static_folder
+        self.static_prefix = static_url_path.rstrip('/') + '/'
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.max_body = max_body
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='aes-asgi')
+        self.waiting = 0
+        self._loop = self._slots = None
+        # Static files by path: (mtime_ns, size, body, etag)
+        self._static = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if scope['path'].startswith(self.static_prefix) and scope['method'] in ('GET', 'HEAD'):
+                await self.serve_static(scope, send)
+            else:
+                await self.serve_app(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def lifespan(self, receive, send):
+        """Answer the server's startup and shutdown events."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def run_in_worker(self, func, *args, reject=True):
+        """
+        Run `func` on a worker thread once one is free. With `reject`, raise
+        Overloaded instead of waiting when the queue is already full.
+        """
+        # One semaphore per event loop; servers run a single loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._slots = loop, asyncio.Semaphore(self.workers)
+        if reject and self._slots.locked() and self.waiting >= self.queue_depth:
+            raise Overloaded
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self._slots.release()
+
+    async def serve_app(self, scope, receive, send):
+        """Run one request through the WSGI app and send its response."""
+        body = await read_body(scope, receive, self.max_body)
+        if body is None:
+            await send_simple(send, 413, b'Request body too large')
+            return
+        # Every call for this request runs in one context, so a streamed
+        # response keeps its Flask request context on whichever worker
+        # produces the next chunk
+        context = contextvars.copy_context()
+        try:
+            status, headers, chunks, iterator, close = await self.run_in_worker(
+                context.run, call_wsgi, self.wsgi_app, wsgi_environ(scope, body))
+        except Overloaded:
+            METRICS.inc('asgi_rejected')
+            await send_simple(send, 503, b'Server busy, retry shortly', [(b'retry-after', b'1')])
+            return
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        try:
+            for chunk in chunks:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            # Streamed responses: fetch each further chunk on a worker thread
+            while iterator is not None:
+                chunk = await self.run_in_worker(context.run, next, iterator, None, reject=False)
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if close is not None:
+                await self.run_in_worker(context.run, close, reject=False)
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def serve_static(self, scope, send):
+        """Send a file from the static folder without going through a worker."""
+        path = safe_join(self.static_folder, scope['path'][len(self.static_prefix):])
+        entry = self.static_file(path) if path else None
+        if entry is None:
+            await send_simple(send, 404, b'Not Found')
+            return
+
+        _, size, body, etag = entry
+        headers = [(b'etag', etag.encode('latin-1')), (b'cache-control', b'no-cache')]
+        if parse_etags(header(scope, b'if-none-match')).contains_weak(etag[1:-1]):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        mimetype, _ = mimetypes.guess_type(path)
+        mimetype = mimetype or 'application/octet-stream'
+        if mimetype.startswith('text/') or mimetype in ('application/javascript', 'application/json'):
+            mimetype += '; charset=utf-8'
+        headers += [(b'content-type', mimetype.encode('latin-1')), (b'content-length', str(size).encode())]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+
+    def static_file(self, path):
+        """(mtime_ns, size, body, etag) of a static file, re-read when it changes; None if missing."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        entry = self._static.get(path)
+        if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+            with open(path, 'rb') as f:
+                body = f.read()
+            entry = (stat.st_mtime_ns, len(body), body, quote_etag(f"{stat.st_mtime_ns:x}-{len(body):x}"))
+            self._static[path] = entry
+        return entry
+
+
+async def read_body(scope, receive, max_body):
+    """Request body as bytes, or None when it is larger than `max_body`."""
+    length = header(scope, b'content-length')
+    if length and length.isdigit() and int(length) > max_body:
+        return None
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        if len(body) > max_body:
+            return None
+        if not message.get('more_body'):
+            break
+    return bytes(body)
+
+
+def header(scope, name):
+    """Value of request header `name` (lower-case bytes) as a string, or None."""
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def send_simple(send, status, body, headers=()):
+    """Send a short plain-text response."""
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'text/plain; charset=utf-8'), (b'content-length', str(len(body)).encode()), *headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope and its request body."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            if name == 'CONTENT_TYPE':
+                environ[name] = value.decode('latin-1')
+            continue
+        key = f"HTTP_{name}"
+        value = value.decode('latin-1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_wsgi(wsgi_app, environ):
+    """
+    Run the WSGI app on a worker thread. Returns (status, headers, chunks,
+    iterator, close): responses with a Content-Length are read in full and
+    closed here, so iterator and close are None; for streamed ones, chunks
+    holds the first chunk, iterator the rest and close the result's close().
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        return response.setdefault('written', []).append
+
+    result = wsgi_app(environ, start_response)
+    iterator = iter(result)
+    # Generators may only call start_response once the first chunk is produced
+    chunks = response.get('written', []) + [chunk for chunk in [next(iterator, None)] if chunk is not None]
+    close = getattr(result, 'close', None)
+    if any(name == b'content-length' for name, _ in response['headers']):
+        chunks.extend(iterator)
+        if close is not None:
+            close()
+        return response['status'], response['headers'], chunks, None, None
+    return response['status'], response['headers'], chunks, iterator, close
+
+
+application = AsgiApp(app, app.static_folder, app.static_url_path)
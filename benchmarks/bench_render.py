@@ -0,0 +1,77 @@
+"""
+Rendering cost per visualisation request.
+
+Times each stage of the uncached `/` page (trace, step building, template
+rendering) with the trace caches cleared before every call, the whole page
+with every round replayed from them, and the matrix table renderer on its
+own, with MATRIX_HTML_CACHE cold and warm.
+
+    python benchmarks/bench_render.py [--iterations N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import app, build_steps, render_visualization
+from aes_lib import MATRIX_HTML_CACHE, MIX_COLUMNS_HTML_CACHE, ROUND0_CACHE, ROUND_CACHE, matrix_to_html, trace_aes
+
+KEY = b"electricallycond"
+WORD = b"telecommunicatio"
+
+
+def best_of(func, iterations, repeat=5):
+    """Best average time of `func` in milliseconds."""
+    return min(timeit.repeat(func, number=iterations, repeat=repeat)) / iterations * 1e3
+
+
+def cold(func):
+    """`func` preceded by clearing the memoised per-state stages."""
+    def run():
+        for cache in (ROUND0_CACHE, ROUND_CACHE, MATRIX_HTML_CACHE, MIX_COLUMNS_HTML_CACHE):
+            cache.clear()
+        return func()
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+    n = args.iterations
+
+    with app.test_request_context():
+        trace = trace_aes(WORD, KEY)
+        matrices = [record['after'] for record in trace] + [trace.meta['plaintext'], trace.meta['key']]
+
+        def cold_tables():
+            MATRIX_HTML_CACHE.clear()
+            for matrix in matrices:
+                matrix_to_html(matrix)
+
+        def warm_tables():
+            for matrix in matrices:
+                matrix_to_html(matrix)
+
+        trace_ms = best_of(cold(lambda: trace_aes(WORD, KEY)), n)
+        details = not app.config['LAZY_DETAILS']
+        steps_ms = best_of(cold(lambda: build_steps(trace, KEY, WORD, details=details)), n)
+        page_ms = best_of(cold(lambda: render_visualization(KEY, WORD, 2025)), n)
+        rows = [
+            ("trace_aes", trace_ms),
+            ("build_steps", steps_ms),
+            ("visualize.html template", page_ms - trace_ms - steps_ms),
+            ("full request", page_ms),
+            ("full request (warm caches)", best_of(lambda: render_visualization(KEY, WORD, 2025), n)),
+            (f"{len(matrices)} matrix tables (cold)", best_of(cold_tables, n)),
+            (f"{len(matrices)} matrix tables (warm)", best_of(warm_tables, n)),
+        ]
+
+    width = max(len(name) for name, _ in rows)
+    for name, ms in rows:
+        print(f"{name:<{width}}  {ms:8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
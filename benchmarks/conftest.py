@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from aes_lib import MATRIX_HTML_CACHE, MIX_COLUMNS_HTML_CACHE, ROUND0_CACHE, ROUND_CACHE
+
+# Baselines saved with --benchmark-save/--benchmark-autosave, one directory per machine
+BASELINES = os.path.join(ROOT, 'benchmarks', 'baselines')
+DEFAULT_STORAGE = 'file://./.benchmarks'
+
+# (test name, bytes per second) of the throughput benchmarks, printed at the end
+THROUGHPUT = []
+
+# Memoised per-state stages; cold benchmarks clear them before every call,
+# so they time the tracing and rendering rather than cache replays
+TRACE_CACHES = (ROUND0_CACHE, ROUND_CACHE, MATRIX_HTML_CACHE, MIX_COLUMNS_HTML_CACHE)
+COLD_ROUNDS = 200
+
+
+def clear_trace_caches():
+    for cache in TRACE_CACHES:
+        cache.clear()
+
+
+def pytest_configure(config):
+    if config.pluginmanager.hasplugin('benchmark') and config.getoption('benchmark_storage') == DEFAULT_STORAGE:
+        config.option.benchmark_storage = f"file://{BASELINES}"
+
+
+@pytest.fixture
+def throughput(benchmark, request):
+    """Benchmark `func(*args)`, which processes `nbytes` per call, and record its bytes/sec."""
+    def run(nbytes, func, *args):
+        result = benchmark(func, *args)
+        if benchmark.stats is not None:
+            rate = nbytes / benchmark.stats.stats.mean
+            benchmark.extra_info['bytes'] = nbytes
+            benchmark.extra_info['bytes_per_second'] = rate
+            THROUGHPUT.append((request.node.name, rate))
+        return result
+    return run
+
+
+@pytest.fixture
+def cold_benchmark(benchmark):
+    """Benchmark `func(*args, **kwargs)` with the trace caches cleared before every call."""
+    def run(func, *args, **kwargs):
+        return benchmark.pedantic(func, args, kwargs, setup=clear_trace_caches, rounds=COLD_ROUNDS, warmup_rounds=1)
+    return run
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not THROUGHPUT:
+        return
+    terminalreporter.section('throughput')
+    width = max(len(name) for name, _ in THROUGHPUT)
+    for name, rate in THROUGHPUT:
+        terminalreporter.write_line(f"{name:<{width}}  {rate / 1e6:10.2f} MB/s")
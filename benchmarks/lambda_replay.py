@@ -0,0 +1,139 @@
+"""
+Replay Lambda Function URL events against lambda_handler and report cold
+and warm latency.
+
+A cold run starts a fresh interpreter, imports lambda_handler (the init
+phase) and invokes one event; warm runs invoke each event repeatedly in a
+single process. --importtime lists the slowest modules on the import path.
+
+    python benchmarks/lambda_replay.py [--cold N] [--warm N] [--importtime] [EVENT.json ...]
+"""
+import argparse
+import copy
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EVENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'events')
+
+# Runs in a fresh interpreter: time the init phase and one invocation
+COLD_RUN = """
+import json, sys, time
+start = time.perf_counter()
+import lambda_handler
+init = time.perf_counter()
+result = lambda_handler.handler(json.load(open(sys.argv[1])), None)
+done = time.perf_counter()
+print(json.dumps({
+    'init_ms': (init - start) * 1000,
+    'invoke_ms': (done - init) * 1000,
+    'status': result['statusCode'],
+    'init_timings_ms': lambda_handler.INIT_TIMINGS,
+}))
+"""
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    return env
+
+
+def cold_runs(event_path, runs):
+    """Start `runs` fresh interpreters that each import the handler and serve one event."""
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-c', COLD_RUN, event_path], cwd=ROOT, env=run_env(),
+                              capture_output=True, text=True, check=True)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result['process_ms'] = (time.perf_counter() - start) * 1000
+        results.append(result)
+    return results
+
+
+def warm_runs(events, runs):
+    """Invoke every event `runs` times in this process after one warm-up call."""
+    sys.path.insert(0, ROOT)
+    import lambda_handler
+
+    report = {}
+    for name, event in events.items():
+        lambda_handler.handler(copy.deepcopy(event), None)
+        timings = []
+        for _ in range(runs):
+            payload = copy.deepcopy(event)
+            start = time.perf_counter()
+            result = lambda_handler.handler(payload, None)
+            timings.append((time.perf_counter() - start) * 1000)
+        report[name] = (result['statusCode'], timings)
+    return report
+
+
+def import_times(limit):
+    """Slowest modules (cumulative microseconds) when importing lambda_handler."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import lambda_handler'],
+                          cwd=ROOT, env=run_env(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        rows.append((int(cumulative_us), int(self_us), name))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('events', nargs='*', help='Function URL event files (default: benchmarks/events/*.json)')
+    parser.add_argument('--cold', type=int, default=5, help='cold starts per event')
+    parser.add_argument('--warm', type=int, default=50, help='warm invocations per event')
+    parser.add_argument('--importtime', action='store_true', help='list the slowest imports')
+    args = parser.parse_args()
+
+    paths = args.events or sorted(glob.glob(os.path.join(EVENTS_DIR, '*.json')))
+    events = {}
+    for path in paths:
+        with open(path) as f:
+            events[os.path.basename(path)] = json.load(f)
+
+    if args.importtime:
+        print("Slowest imports (cumulative / self, ms):")
+        for cumulative_us, self_us, name in import_times(20):
+            print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+        print()
+
+    width = max(len(name) for name in events)
+    if args.cold:
+        print(f"Cold starts ({args.cold} per event, ms):")
+        print(f"  {'event':<{width}}  {'init p50':>9}  {'invoke p50':>10}  {'total p50':>9}  {'total max':>9}")
+        for path in paths:
+            name = os.path.basename(path)
+            results = cold_runs(path, args.cold)
+            init = [r['init_ms'] for r in results]
+            invoke = [r['invoke_ms'] for r in results]
+            total = [r['init_ms'] + r['invoke_ms'] for r in results]
+            print(f"  {name:<{width}}  {percentile(init, 50):9.1f}  {percentile(invoke, 50):10.1f}  "
+                  f"{percentile(total, 50):9.1f}  {max(total):9.1f}")
+        print(f"  init breakdown (last run): {json.dumps(results[-1]['init_timings_ms'])}")
+        print()
+
+    if args.warm:
+        print(f"Warm invocations ({args.warm} per event, ms):")
+        print(f"  {'event':<{width}}  {'status':>6}  {'p50':>7}  {'p99':>7}")
+        for name, (status, timings) in warm_runs(events, args.warm).items():
+            print(f"  {name:<{width}}  {status:>6}  {percentile(timings, 50):7.2f}  {percentile(timings, 99):7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Microbenchmarks for the AES primitives, the key schedule, single-block
+encryption per engine, and batch throughput in bytes/sec.
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from aes_lib import (
+    ENGINES, KEY_ROUNDS, KEY_SCHEDULE_CACHE, add_round_key, bytes_to_matrix, ctr_stream,
+    ecb_encrypt_stream, encrypt_aes, encrypt_blocks, expand_key, mix_columns,
+    parallel_ecb_encrypt, shift_rows, sub_bytes, trace_aes
+)
+
+PLAINTEXT = b"telecommunicatio"
+KEYS = {16: b"electricallycond", 24: b"electricallyconductivema", 32: b"electricallyconductivematerials1"}
+STATE = bytes_to_matrix(PLAINTEXT)
+ROUND_KEY = bytes_to_matrix(KEYS[16])
+
+# Batch sizes: big enough to amortise per-call overhead, small enough for a quick run
+BATCH_SIZE = 64 * 1024
+PARALLEL_SIZE = 4 * 1024 * 1024
+
+
+def test_sub_bytes(benchmark):
+    benchmark(sub_bytes, STATE)
+
+
+def test_shift_rows(benchmark):
+    benchmark(shift_rows, STATE)
+
+
+def test_mix_columns(benchmark):
+    benchmark(mix_columns, STATE)
+
+
+def test_add_round_key(benchmark):
+    benchmark(add_round_key, STATE, ROUND_KEY)
+
+
+@pytest.mark.parametrize('key_size', sorted(KEY_ROUNDS))
+def test_expand_key(benchmark, key_size):
+    benchmark(expand_key, KEYS[key_size])
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_encrypt_aes(benchmark, engine):
+    encrypt_aes(PLAINTEXT, KEYS[16], engine=engine)
+    benchmark(encrypt_aes, PLAINTEXT, KEYS[16], engine=engine)
+
+
+def test_encrypt_aes_cold_key(benchmark):
+    def cold():
+        KEY_SCHEDULE_CACHE.clear()
+        encrypt_aes(PLAINTEXT, KEYS[16])
+    benchmark(cold)
+
+
+def test_trace_aes(cold_benchmark):
+    cold_benchmark(trace_aes, PLAINTEXT, KEYS[16])
+
+
+def test_trace_aes_warm(benchmark):
+    """Every round replayed from the round caches."""
+    benchmark(trace_aes, PLAINTEXT, KEYS[16])
+
+
+def test_ecb_stream_throughput(throughput):
+    data = bytes(range(256)) * (BATCH_SIZE // 256)
+    throughput(len(data), lambda: b''.join(ecb_encrypt_stream([data], KEYS[16], padding=False)))
+
+
+def test_ctr_stream_throughput(throughput):
+    data = bytes(range(256)) * (BATCH_SIZE // 256)
+    throughput(len(data), lambda: b''.join(ctr_stream([data], KEYS[16], bytes(16))))
+
+
+def test_encrypt_blocks_throughput(throughput):
+    pytest.importorskip('numpy')
+    data = bytes(range(256)) * (BATCH_SIZE // 256)
+    throughput(len(data), encrypt_blocks, data, KEYS[16])
+
+
+def test_parallel_ecb_throughput(throughput):
+    data = bytes(range(256)) * (PARALLEL_SIZE // 256)
+    throughput(len(data), parallel_ecb_encrypt, data, KEYS[16], False)
@@ -0,0 +1,75 @@
+"""
+End-to-end benchmarks of the Flask routes through the test client: the
+visualisation POST in each rendering mode, and the JSON/fragment APIs.
+Page and trace benchmarks clear the trace caches before every call; the
+_warm variants replay every round from them.
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from aes_lib import LRUCache
+from app import app
+
+FORM = {'key': 'electricallycond', 'word': 'telecommunicatio'}
+FRAGMENT = {**FORM, 'round': 3, 'op': 'KeyGeneration'}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Test client with the default configuration minus caches and pre-rendered pages."""
+    monkeypatch.setitem(app.config, 'RENDER_CACHE', '')
+    monkeypatch.setitem(app.config, 'PRERENDERED', False)
+    with app.test_client() as client:
+        yield client
+
+
+def post(client, headers=None):
+    response = client.post('/', data=FORM, headers=headers)
+    assert response.status_code == 200
+    return response.get_data()
+
+
+def test_index_get(benchmark, client):
+    benchmark(client.get, '/')
+
+
+def test_index_post(cold_benchmark, client):
+    cold_benchmark(post, client)
+
+
+def test_index_post_warm(benchmark, client):
+    benchmark(post, client)
+
+
+def test_index_post_gzip(cold_benchmark, client):
+    cold_benchmark(post, client, {'Accept-Encoding': 'gzip'})
+
+
+def test_index_post_full_details(cold_benchmark, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'LAZY_DETAILS', False)
+    cold_benchmark(post, client)
+
+
+def test_index_post_full_details_warm(benchmark, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'LAZY_DETAILS', False)
+    benchmark(post, client)
+
+
+def test_index_post_streamed(cold_benchmark, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'STREAM_HTML', True)
+    cold_benchmark(post, client)
+
+
+def test_index_post_render_cache_hit(benchmark, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'RENDER_CACHE', LRUCache(8))
+    post(client, {'Accept-Encoding': 'gzip'})
+    benchmark(post, client, {'Accept-Encoding': 'gzip'})
+
+
+def test_api_trace(cold_benchmark, client):
+    cold_benchmark(client.get, '/api/trace', query_string=FORM)
+
+
+def test_api_fragment(benchmark, client):
+    benchmark(client.get, '/api/fragment', query_string=FRAGMENT)
@@ -12,7 +12,7 @@ RUNTIME="python3.12"
 
 # 0. Running tests
 echo "🧪 Running tests..."
-pytest tests/test_aes.py -q --no-header
+pytest tests -q --no-header
 
 # Check if tests passed
 if [ $? -ne 0 ]; then
@@ -120,7 +120,7 @@ if aws lambda get-function --function-name "$LAMBDA_FUNCTION_NAME" --region "$AW
     sleep 5
 else
     echo "✨ Function does not exist. Creating a new function..."
-    zip -r deployment.zip app.py lambda_handler.py templates/ static/
+    zip -r deployment.zip app.py lambda_handler.py VERSION templates/ static/
     aws lambda create-function \
       --function-name "$LAMBDA_FUNCTION_NAME" \
       --runtime "$RUNTIME" \
@@ -134,9 +134,18 @@ else
 fi
 
 # 8. Пакетиране на приложението
+# /var/task is read-only, so ship bytecode and compiled templates instead of
+# compiling them on every cold start (must match $RUNTIME to be used), plus
+# the pre-rendered pages for the common test vectors (flask prerender)
+echo "⚡ Precompiling Python modules and Jinja templates..."
+rm -rf __pycache__ jinja_cache static/prerendered
+python -m compileall -q --invalidation-mode unchecked-hash app.py lambda_handler.py aes_lib.py
+PYTHONPATH=layer/python python -m flask --app app precompile-templates jinja_cache
+PYTHONPATH=layer/python python -m flask --app app prerender
+
 echo "🗜️ Creating deployment.zip..."
 echo "📦 Including optimized static files for production..."
-zip -r deployment.zip app.py lambda_handler.py aes_lib.py templates/ static/
+zip -r deployment.zip app.py lambda_handler.py aes_lib.py VERSION templates/ static/ __pycache__/ jinja_cache/
 
 # 9. Ъпдейтване на кода на Lambda функцията
 echo "🚀 Updating Lambda function code..."
@@ -1,30 +1,122 @@
-from awsgi import response
-from app import app
+import base64
+import importlib
+import json
+import os
+import time
+from datetime import datetime
+from urllib.parse import parse_qs
+
+# Per-module import durations (ms) of the init phase, in import order.
+# Set AES_LOG_INIT_TIMINGS=1 to print them to the function log on cold start.
+INIT_TIMINGS = {}
+
+
+def _timed_import(name):
+    """Import a module and record how long it took."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    INIT_TIMINGS[name] = round((time.perf_counter() - start) * 1000, 2)
+    return module
+
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Use the template bytecode packaged next to the handler, when present
+if os.path.isdir(os.path.join(_HERE, 'jinja_cache')):
+    os.environ.setdefault('AES_JINJA_CACHE_DIR', os.path.join(_HERE, 'jinja_cache'))
+
+# Heavy imports happen once, in the init phase; flask is imported first so
+# the app and aes_lib timings only cover their own modules
+_timed_import('flask')
+awsgi = _timed_import('awsgi')
+app = _timed_import('app').app
+from app import prerendered_page, render_cache_key, validate_input
+from werkzeug.http import parse_etags, quote_etag
+
+# Load the page templates now rather than on the first request
+_start = time.perf_counter()
+for _name in ('landing.html', 'visualize.html', 'partials/step.html', 'partials/step_details.html'):
+    app.jinja_env.get_template(_name)
+INIT_TIMINGS['templates'] = round((time.perf_counter() - _start) * 1000, 2)
+
+if os.environ.get('AES_LOG_INIT_TIMINGS'):
+    print(json.dumps({'init_timings_ms': INIT_TIMINGS}))
+
+# Content types returned base64 encoded; built once, not per invocation
+BINARY_CONTENT_TYPES = (
+    'image/png',
+    'image/jpeg',
+    'image/gif',
+    'image/webp',
+    'image/svg+xml',
+    'image/x-icon',
+    'application/octet-stream',
+    'application/pdf',
+    'font/woff',
+    'font/woff2',
+)
+
+
+class StartResponse(awsgi.StartResponse_GW):
+    """awsgi start_response that also base64 encodes compressed bodies."""
+
+    def use_binary_response(self, headers, body):
+        return 'Content-Encoding' in headers or super().use_binary_response(headers, body)
+
 
 def normalize_event(event):
     """Normalize AWS Function URL event to API Gateway v1 style."""
     if "httpMethod" not in event and "requestContext" in event and "http" in event["requestContext"]:
         event["httpMethod"] = event["requestContext"]["http"]["method"]
         event["path"] = event["rawPath"]
-        event["queryStringParameters"] = {}
+        event["queryStringParameters"] = event.get("queryStringParameters") or {}
         event["headers"] = event.get("headers", {})
     return event
 
 
+def prerendered_response(event):
+    """
+    Answer a form POST for a pre-rendered input straight from the files built
+    by `flask prerender`, without going through WSGI; None for anything else.
+    """
+    if event["httpMethod"] != "POST" or event["path"] != "/":
+        return None
+    headers = {name.lower(): value for name, value in event["headers"].items()}
+    if not headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+        return None
+
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode("utf-8", "replace")
+    form = parse_qs(body)
+    key, word = form.get("key", [""])[0], form.get("word", [""])[0]
+    if validate_input(key, word):
+        return None
+
+    cache_key = render_cache_key(key.encode("utf-8"), word.encode("utf-8"), datetime.now().year)
+    page = prerendered_page(cache_key, headers.get("accept-encoding", ""))
+    if page is None:
+        return None
+
+    page_body, encoding = page
+    response_headers = {"ETag": quote_etag(cache_key, weak=encoding is not None), "Vary": "Accept-Encoding"}
+    if parse_etags(headers.get("if-none-match")).contains_weak(cache_key):
+        return {"statusCode": 304, "headers": response_headers, "body": "", "isBase64Encoded": False}
+    response_headers["Content-Type"] = "text/html; charset=utf-8"
+    if encoding:
+        response_headers["Content-Encoding"] = encoding
+        return {"statusCode": 200, "headers": response_headers,
+                "body": base64.b64encode(page_body).decode("ascii"), "isBase64Encoded": True}
+    return {"statusCode": 200, "headers": response_headers,
+            "body": page_body.decode("utf-8"), "isBase64Encoded": False}
+
+
 def handler(event, context):
     """AWS Lambda handler function."""
     event = normalize_event(event)
-    # Specify binary content types that should be base64 encoded
-    binary_content_types = [
-        'image/png',
-        'image/jpeg',
-        'image/gif',
-        'image/webp',
-        'image/svg+xml',
-        'image/x-icon',
-        'application/octet-stream',
-        'application/pdf',
-        'font/woff',
-        'font/woff2'
-    ]
-    return response(app, event, context, base64_content_types=binary_content_types)
+    prerendered = prerendered_response(event)
+    if prerendered is not None:
+        return prerendered
+    start_response = StartResponse(base64_content_types=BINARY_CONTENT_TYPES)
+    output = app(awsgi.environ(event, context), start_response)
+    return start_response.response(output)
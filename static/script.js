@@ -93,11 +93,34 @@ function initCopyButtons() {
     });
 }
 
+/**
+ * Loads a step's detailed explanation from its data-fragment-url on first expand
+ */
+function loadFragment(target) {
+    const url = target.dataset.fragmentUrl;
+    if (!url || target.dataset.loaded) return;
+
+    target.dataset.loaded = 'true';
+    fetch(url)
+        .then(response => {
+            if (!response.ok) throw new Error(response.statusText);
+            return response.text();
+        })
+        .then(html => {
+            target.innerHTML = html;
+        })
+        .catch(() => {
+            // Allow another attempt on the next toggle
+            delete target.dataset.loaded;
+            target.innerHTML = '<div class="explanation-loading">Could not load the explanation, please try again.</div>';
+        });
+}
+
 /**
  * Initializes toggle buttons for showing/hiding detailed explanations
+ * (every button on the page unless given a list)
  */
-function initToggleButtons() {
-    const toggleButtons = document.querySelectorAll('.toggle-btn');
+function initToggleButtons(toggleButtons = document.querySelectorAll('.toggle-btn')) {
     toggleButtons.forEach(button => {
         button.addEventListener('click', function() {
             const targetId = button.dataset.target;
@@ -114,6 +137,8 @@ function initToggleButtons() {
                     target.style.display = 'none';
                 }, 300);
             } else {
+                // Fetch the explanation if the page was shipped without it
+                loadFragment(target);
                 // Show the content
                 target.style.display = 'block';
                 // Use setTimeout to allow the browser to process the display change before adding the class
@@ -205,8 +230,8 @@ function setupCharacterCounters() {
         keyInput.addEventListener('input', function() {
             keyCounter.textContent = this.value.length;
 
-            // Add visual feedback
-            if (this.value.length === 16) {
+            // Add visual feedback (AES-128, AES-192 and AES-256 key sizes)
+            if ([16, 24, 32].includes(this.value.length)) {
                 keyCounter.classList.add('complete');
             } else {
                 keyCounter.classList.remove('complete');
@@ -235,6 +260,35 @@ function setupCharacterCounters() {
 
 // ===== Visualization Functionality =====
 
+/**
+ * Replaces the collapsed rounds placeholder of a lazy page with the steps
+ * fetched from its data-fragment-url; resolves once they are in the page
+ */
+function loadCollapsedRounds() {
+    const placeholder = document.getElementById('collapsedRounds');
+    if (!placeholder) return Promise.resolve();
+
+    if (!placeholder.loading) {
+        placeholder.loading = fetch(placeholder.dataset.fragmentUrl)
+            .then(response => {
+                if (!response.ok) throw new Error(response.statusText);
+                return response.text();
+            })
+            .then(html => {
+                const template = document.createElement('template');
+                template.innerHTML = html;
+                initToggleButtons(template.content.querySelectorAll('.toggle-btn'));
+                placeholder.replaceWith(template.content);
+            })
+            .catch(error => {
+                // Allow another attempt on the next click
+                delete placeholder.loading;
+                throw error;
+            });
+    }
+    return placeholder.loading;
+}
+
 /**
  * Sets up the toggle button for showing/hiding rounds 2-9
  */
@@ -242,35 +296,40 @@ function setupRounds2to9Toggle() {
     const toggleBtn = document.getElementById('toggleRounds2to9Btn');
     if (!toggleBtn) return;
 
-    const rounds2to9Steps = document.querySelectorAll('.rounds2to9-step');
-
     toggleBtn.addEventListener('click', function() {
         const isExpanded = toggleBtn.getAttribute('data-expanded') === 'true';
 
         if (isExpanded) {
             // Hide rounds 2-9
-            rounds2to9Steps.forEach(step => {
+            document.querySelectorAll('.rounds2to9-step').forEach(step => {
                 step.style.display = 'none';
             });
 
             // Update button
             toggleBtn.querySelector('.toggle-icon').textContent = '+';
-            toggleBtn.querySelector('.toggle-text').textContent = 'Show Rounds 2-9';
+            // The round range depends on the key size, so only swap the verb
+            const showText = toggleBtn.querySelector('.toggle-text');
+            showText.textContent = showText.textContent.replace('Hide', 'Show');
             toggleBtn.setAttribute('data-expanded', 'false');
         } else {
-            // Show rounds 2-9
-            rounds2to9Steps.forEach(step => {
-                step.style.display = 'flex';
-                // Trigger animation
-                setTimeout(() => {
-                    step.style.animation = 'fadeInStep 1s forwards';
-                }, 10);
-            });
+            // Lazy pages fetch rounds 2-9 the first time they are shown; on
+            // failure the button stays collapsed so it can be clicked again
+            loadCollapsedRounds().then(() => {
+                // Show rounds 2-9
+                document.querySelectorAll('.rounds2to9-step').forEach(step => {
+                    step.style.display = 'flex';
+                    // Trigger animation
+                    setTimeout(() => {
+                        step.style.animation = 'fadeInStep 1s forwards';
+                    }, 10);
+                });
 
-            // Update button
-            toggleBtn.querySelector('.toggle-icon').textContent = '−';
-            toggleBtn.querySelector('.toggle-text').textContent = 'Hide Rounds 2-9';
-            toggleBtn.setAttribute('data-expanded', 'true');
+                // Update button
+                toggleBtn.querySelector('.toggle-icon').textContent = '−';
+                const hideText = toggleBtn.querySelector('.toggle-text');
+                hideText.textContent = hideText.textContent.replace('Show', 'Hide');
+                toggleBtn.setAttribute('data-expanded', 'true');
+            }).catch(() => {});
         }
     });
 }
@@ -1,16 +1,29 @@
 import pytest
 import binascii
+import glob
+import io
 import subprocess
 import sys
+import threading
 import os
+import random
 import shutil
 
 # Add the parent directory to the Python path so we can import aes_lib
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from aes_lib import (
     Sbox, Rcon, bytes_to_matrix, matrix_to_bytes, sub_bytes, shift_rows,
-    mix_columns, add_round_key, rotate_word, expand_key, encrypt_aes
+    mix_columns, add_round_key, rotate_word, expand_key, encrypt_aes,
+    decrypt_aes, InvSbox, ENGINES, expand_key_words, encrypt_block_ttable,
+    galois_mult, GF_MUL, encrypt_blocks, pad, unpad, ecb_encrypt_stream,
+    ecb_decrypt_stream, cbc_encrypt_stream, cbc_decrypt_stream, ctr_stream,
+    parallel_ecb_encrypt, parallel_ctr, LRUCache, cached_expand_key,
+    cached_expand_key_words, KEY_SCHEDULE_CACHE, KEY_EXPANSION_HTML_CACHE,
+    trace_aes, Trace, inv_sub_bytes, inv_shift_rows, inv_mix_columns,
+    trace_aes_decrypt, decrypt_blocks, expand_key_words_decrypt, decrypt_block_ttable,
+    State, _state_round_keys, matrix_to_html, MATRIX_HTML_CACHE, Metrics, ROUND0_CACHE, ROUND_CACHE
 )
+import aesavs
 
 # Test vectors
 PLAINTEXT = "telecommunicatio"
@@ -158,6 +171,27 @@ def test_mix_columns():
     result = mix_columns(test_state, None)
     assert result == expected, f"Expected {expected}, got {result}"
 
+def test_galois_tables():
+    """Test the precomputed GF(2^8) tables against bit-by-bit multiplication."""
+    def bitwise_mult(a, b):
+        p = 0
+        for _ in range(8):
+            if b & 1:
+                p ^= a
+            carry = a & 0x80
+            a = (a << 1) & 0xFF
+            if carry:
+                a ^= 0x1B
+            b >>= 1
+        return p
+
+    for a in range(256):
+        for b in range(256):
+            assert galois_mult(a, b) == bitwise_mult(a, b), f"galois_mult({a}, {b}) mismatch"
+    for factor, table in GF_MUL.items():
+        for a in range(256):
+            assert table[a] == bitwise_mult(a, factor), f"GF_MUL[{factor}][{a}] mismatch"
+
 def test_add_round_key():
     """Test the AddRoundKey transformation."""
     # Test with the plaintext and key matrices (Round 0)
@@ -217,6 +251,52 @@ def test_expand_key():
     for i in range(1, 11):
         assert round_keys[i] != round_keys[i-1], f"Round keys {i-1} and {i} are identical"
 
+def test_lru_cache():
+    """Test LRU eviction order, counters and thread safety."""
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1          # "a" is now most recently used
+    cache.put("c", 3)                   # evicts "b"
+    assert cache.get("b") is None
+    assert cache.get_or_compute("c", lambda: 99) == 3
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 2)
+
+    cache.resize(1)
+    assert len(cache) == 1
+
+    cache = LRUCache(maxsize=8)
+    def worker(n):
+        for i in range(500):
+            cache.get_or_compute(i % 16, lambda: i % 16)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == 2000
+    assert stats['size'] <= 8
+
+def test_cached_expand_key():
+    """Test that the key schedule caches return the uncached results."""
+    KEY_SCHEDULE_CACHE.clear()
+    KEY_EXPANSION_HTML_CACHE.clear()
+
+    assert cached_expand_key(KEY_BYTES) == expand_key(KEY_BYTES)
+    assert cached_expand_key(KEY_BYTES) == expand_key(KEY_BYTES)
+    assert list(cached_expand_key_words(KEY_BYTES)) == expand_key_words(KEY_BYTES)
+    assert KEY_SCHEDULE_CACHE.stats()['hits'] == 1
+
+    expected_log = []
+    expand_key(KEY_BYTES, expected_log)
+    for _ in range(2):
+        log = []
+        assert cached_expand_key(KEY_BYTES, log) == expand_key(KEY_BYTES)
+        assert log == expected_log
+    assert KEY_EXPANSION_HTML_CACHE.stats()['hits'] == 1
+
 def test_full_encryption():
     """Test the full AES encryption process."""
     # Test with the known plaintext and key
@@ -226,6 +306,398 @@ def test_full_encryption():
     # Compare case-insensitively
     assert ciphertext_hex.lower() == EXPECTED_OPENSSL_RESULT.lower(), f"Expected {EXPECTED_OPENSSL_RESULT}, got {ciphertext_hex}"
 
+def test_traced_encryption_matches_fast_path():
+    """Test that the traced path and the compute-only path agree."""
+    log = []
+    traced = encrypt_aes(PLAINTEXT_BYTES, KEY_BYTES, log)
+    assert traced == encrypt_aes(PLAINTEXT_BYTES, KEY_BYTES)
+    assert log, "Expected the traced path to record log entries"
+
+    # Random blocks and keys
+    rng = random.Random(1234)
+    for _ in range(20):
+        block = bytes(rng.randrange(256) for _ in range(16))
+        key = bytes(rng.randrange(256) for _ in range(16))
+        assert encrypt_aes(block, key) == encrypt_aes(block, key, [])
+
+def test_expand_key_words():
+    """Test that the word key schedule matches the matrix key schedule."""
+    words = expand_key_words(KEY_BYTES)
+    assert len(words) == 44, f"Expected 44 words, got {len(words)}"
+    for round_idx, round_key in enumerate(expand_key(KEY_BYTES)):
+        for col in range(4):
+            expected = bytes(round_key[row][col] for row in range(4))
+            word = words[4 * round_idx + col].to_bytes(4, 'big')
+            assert word == expected, f"Round {round_idx}, column {col}: expected {expected.hex()}, got {word.hex()}"
+
+def test_engines_match_encrypt_aes():
+    """Cross-check every compute-only engine against the traced implementation."""
+    rng = random.Random(2024)
+    vectors = [(PLAINTEXT_BYTES, KEY_BYTES)] + [
+        (bytes(rng.randrange(256) for _ in range(16)), bytes(rng.randrange(256) for _ in range(16)))
+        for _ in range(20)
+    ]
+    for block, key in vectors:
+        expected = encrypt_aes(block, key, [])
+        for engine in ENGINES:
+            assert encrypt_aes(block, key, engine=engine) == expected, f"Engine {engine} mismatch"
+        assert encrypt_block_ttable(block, expand_key_words(key)) == expected
+
+    with pytest.raises(ValueError):
+        encrypt_aes(PLAINTEXT_BYTES, KEY_BYTES, engine='unknown')
+
+def test_encrypt_blocks():
+    """Test the NumPy batched engine against the single-block engine."""
+    np = pytest.importorskip("numpy")
+
+    rng = random.Random(99)
+    data = bytes(rng.randrange(256) for _ in range(16 * 64))
+    expected = b"".join(encrypt_aes(data[i:i + 16], KEY_BYTES) for i in range(0, len(data), 16))
+
+    # Bytes in, bytes out
+    assert encrypt_blocks(data, KEY_BYTES) == expected
+
+    # (N, 16) array in, array out, reusing a precomputed key schedule
+    blocks = np.frombuffer(data, dtype=np.uint8).reshape(-1, 16)
+    result = encrypt_blocks(blocks, None, round_keys=expand_key(KEY_BYTES))
+    assert result.shape == (64, 16)
+    assert result.tobytes() == expected
+
+    assert encrypt_blocks(PLAINTEXT_BYTES, KEY_BYTES).hex() == EXPECTED_OPENSSL_RESULT
+
+    with pytest.raises(ValueError):
+        encrypt_blocks(data[:-1], KEY_BYTES)
+
+# NIST SP 800-38A test vectors (AES-128)
+SP800_38A_KEY = binascii.unhexlify("2b7e151628aed2a6abf7158809cf4f3c")
+SP800_38A_PLAINTEXT = binascii.unhexlify(
+    "6bc1bee22e409f96e93d7e117393172aae2d8a571e03ac9c9eb76fac45af8e51"
+)
+
+def test_pad_unpad():
+    """Test padding round trips and rejection of malformed padding."""
+    for length in range(0, 40):
+        data = bytes(range(length))
+        padded = pad(data)
+        assert len(padded) % 16 == 0 and len(padded) > length
+        assert unpad(padded) == data
+
+    for bad in (b"", b"\x00" * 16, b"\x01" * 15 + b"\x02", b"\x11" * 16, b"\x01" * 17):
+        with pytest.raises(ValueError):
+            unpad(bad)
+
+def test_stream_modes_known_vectors():
+    """Test ECB, CBC and CTR streams against the NIST SP 800-38A vectors."""
+    iv = bytes(range(16))
+    ecb = b"".join(ecb_encrypt_stream([SP800_38A_PLAINTEXT], SP800_38A_KEY, padding=False))
+    assert ecb.hex() == "3ad77bb40d7a3660a89ecaf32466ef97f5d3d58503b9699de785895a96fdbaaf"
+
+    cbc = b"".join(cbc_encrypt_stream([SP800_38A_PLAINTEXT], SP800_38A_KEY, iv, padding=False))
+    assert cbc.hex() == "7649abac8119b246cee98e9b12e9197d5086cb9b507219ee95db113a917678b2"
+
+    counter = binascii.unhexlify("f0f1f2f3f4f5f6f7f8f9fafbfcfdfeff")
+    ctr = b"".join(ctr_stream([SP800_38A_PLAINTEXT], SP800_38A_KEY, counter))
+    assert ctr.hex() == "874d6191b620e3261bef6864990db6ce9806f66b7970fdff8617187bb9fffdff"
+
+    # Seeking to block 1 yields the second ciphertext block on its own
+    assert b"".join(ctr_stream([SP800_38A_PLAINTEXT[16:]], SP800_38A_KEY, counter, start_block=1)) == ctr[16:]
+
+def test_stream_modes_round_trip():
+    """Test that every stream mode round-trips with arbitrary chunking."""
+    rng = random.Random(7)
+    iv = bytes(rng.randrange(256) for _ in range(16))
+    for length in (0, 1, 15, 16, 17, 100, 1000):
+        data = bytes(rng.randrange(256) for _ in range(length))
+        chunks = [data[i:i + 7] for i in range(0, length, 7)]
+
+        ciphertext = b"".join(ecb_encrypt_stream(chunks, KEY_BYTES))
+        assert len(ciphertext) == len(pad(data))
+        assert b"".join(ecb_decrypt_stream(io.BytesIO(ciphertext), KEY_BYTES)) == data
+
+        ciphertext = b"".join(cbc_encrypt_stream(io.BytesIO(data), KEY_BYTES, iv))
+        assert b"".join(cbc_decrypt_stream([ciphertext[:5], ciphertext[5:]], KEY_BYTES, iv)) == data
+
+        ciphertext = b"".join(ctr_stream(chunks, KEY_BYTES, iv))
+        assert len(ciphertext) == length
+        assert b"".join(ctr_stream(io.BytesIO(ciphertext), KEY_BYTES, iv)) == data
+
+def test_parallel_modes():
+    """Test that the process-pool modes match the streaming modes."""
+    rng = random.Random(11)
+    nonce = bytes(rng.randrange(256) for _ in range(16))
+    data = bytes(rng.randrange(256) for _ in range(10000))
+
+    expected_ctr = b"".join(ctr_stream(data, KEY_BYTES, nonce))
+    expected_ecb = b"".join(ecb_encrypt_stream(data, KEY_BYTES))
+    for workers in (1, 2):
+        assert parallel_ctr(data, KEY_BYTES, nonce, workers=workers, chunk_size=1024) == expected_ctr
+        assert parallel_ecb_encrypt(data, KEY_BYTES, workers=workers, chunk_size=1024) == expected_ecb
+
+    with pytest.raises(ValueError):
+        parallel_ctr(data, KEY_BYTES, nonce, chunk_size=1000)
+
+def test_inverse_sbox():
+    """Test that InvSbox inverts the S-box."""
+    for b in range(256):
+        assert InvSbox[Sbox[b]] == b
+
+def test_decryption():
+    """Test AES decryption of the known ciphertext and random round trips."""
+    ciphertext = binascii.unhexlify(EXPECTED_OPENSSL_RESULT)
+    assert decrypt_aes(ciphertext, KEY_BYTES) == PLAINTEXT_BYTES
+
+    rng = random.Random(4321)
+    for _ in range(20):
+        block = bytes(rng.randrange(256) for _ in range(16))
+        key = bytes(rng.randrange(256) for _ in range(16))
+        assert decrypt_aes(encrypt_aes(block, key), key) == block
+
+def test_trace_aes():
+    """Test that the trace records the known intermediate states."""
+    trace = trace_aes(PLAINTEXT_BYTES, KEY_BYTES)
+    assert trace.meta['plaintext'] == KNOWN_MATRIX
+    assert trace.meta['key'] == KEY_MATRIX
+    assert trace.meta['round_keys'] == expand_key(KEY_BYTES)
+    assert trace.meta['ciphertext'].hex() == EXPECTED_OPENSSL_RESULT
+
+    assert trace.rounds() == list(range(11))
+    assert trace.get(0, 'AddRoundKey')['after'] == AFTER_ROUND0
+    assert trace.get(1, 'SubBytes')['after'] == AFTER_SUBBYTES_ROUND1
+    assert trace.get(1, 'ShiftRows')['after'] == AFTER_SHIFTROWS_ROUND1
+    assert trace.get(1, 'MixColumns')['after'] == AFTER_MIXCOLUMNS_ROUND1
+    assert trace.get(10, 'MixColumns') is None
+    assert [r.op for r in trace.round_records(10)] == ['SubBytes', 'ShiftRows', 'AddRoundKey']
+
+def test_trace_round_memoisation():
+    """Test that rounds with unchanged inputs are replayed from the round caches."""
+    ROUND0_CACHE.clear()
+    ROUND_CACHE.clear()
+    first = trace_aes(PLAINTEXT_BYTES, KEY_BYTES)
+    assert (ROUND0_CACHE.misses, ROUND_CACHE.misses, ROUND_CACHE.hits) == (1, 10, 0)
+
+    # A resubmission replays every round with identical records
+    again = trace_aes(PLAINTEXT_BYTES, KEY_BYTES)
+    assert (ROUND0_CACHE.hits, ROUND_CACHE.hits) == (1, 10)
+    assert [(r.round, r.op, r.fields) for r in again] == [(r.round, r.op, r.fields) for r in first]
+
+    # A changed plaintext misses round 0 and every round its state reaches
+    other = trace_aes(b"Telecommunicatio", KEY_BYTES)
+    assert (ROUND0_CACHE.misses, ROUND_CACHE.misses) == (2, 20)
+    assert other.meta['ciphertext'] == encrypt_aes(b"Telecommunicatio", KEY_BYTES)
+
+def test_structured_trace():
+    """Test that Trace records keep raw values and format them lazily."""
+    trace = Trace()
+    round_keys = expand_key(KEY_BYTES, trace)
+    assert len(trace) == 10
+
+    record = trace.get(1, 'KeyExpansion')
+    assert record['new_key'] == round_keys[1]
+    assert record['rcon'] == Rcon[0]
+
+    # The formatted rows match the legacy list log, minus the HTML entry
+    log = []
+    expand_key(KEY_BYTES, log)
+    legacy = [entry for entry in log if not entry[0].endswith("Detailed")]
+    formatted = [row for r in range(1, 11) for row in trace.rows(r, 'KeyExpansion')]
+    assert formatted == legacy
+
+    # Step functions record into the current round
+    trace = Trace()
+    trace.round = 3
+    mix_columns(AFTER_SHIFTROWS_ROUND1, trace)
+    assert trace.get(3, 'MixColumns')['after'] == AFTER_MIXCOLUMNS_ROUND1
+    assert trace.rows(3, 'MixColumns')[0] == ("Column 0, Row 0", f"Result: 0x{AFTER_MIXCOLUMNS_ROUND1[0][0]:02X}")
+
+def test_inverse_transformations():
+    """Test that each inverse transformation undoes its forward counterpart."""
+    assert inv_sub_bytes(AFTER_SUBBYTES_ROUND1) == AFTER_ROUND0
+    assert inv_shift_rows(AFTER_SHIFTROWS_ROUND1) == AFTER_SUBBYTES_ROUND1
+    assert inv_mix_columns(AFTER_MIXCOLUMNS_ROUND1) == AFTER_SHIFTROWS_ROUND1
+
+def test_decryption_engines():
+    """Cross-check the decryption engines, including the traced path."""
+    rng = random.Random(77)
+    for _ in range(20):
+        block = bytes(rng.randrange(256) for _ in range(16))
+        key = bytes(rng.randrange(256) for _ in range(16))
+        ciphertext = encrypt_aes(block, key)
+        for engine in ENGINES:
+            assert decrypt_aes(ciphertext, key, engine=engine) == block
+        assert decrypt_block_ttable(ciphertext, expand_key_words_decrypt(key)) == block
+        assert decrypt_aes(ciphertext, key, Trace()) == block
+
+def test_state():
+    """Test the in-place State against the matrix-based transformations."""
+    state = State(PLAINTEXT_BYTES)
+    assert state.to_matrix() == KNOWN_MATRIX
+    assert State.from_matrix(KNOWN_MATRIX) == state
+    buffer = state.data
+    round_key = expand_key(KEY_BYTES)[1]
+
+    matrix = add_round_key(mix_columns(shift_rows(sub_bytes(KNOWN_MATRIX))), round_key)
+    state.sub_bytes().shift_rows().mix_columns().add_round_key(matrix_to_bytes(round_key))
+    assert state.to_matrix() == matrix
+
+    matrix = inv_sub_bytes(inv_shift_rows(inv_mix_columns(add_round_key(matrix, round_key))))
+    state.add_round_key(matrix_to_bytes(round_key)).inv_mix_columns().inv_shift_rows().inv_sub_bytes()
+    assert state.to_matrix() == matrix == KNOWN_MATRIX
+    assert bytes(state) == PLAINTEXT_BYTES
+    # Every step rewrote the same buffer
+    assert state.data is buffer
+
+    # AddRoundKey with the precomputed word pair of a round key
+    round_key = matrix_to_bytes(round_key)
+    state.add_round_key(_state_round_keys([round_key])[0])
+    assert bytes(state) == bytes(a ^ b for a, b in zip(PLAINTEXT_BYTES, round_key))
+    assert state.data is buffer
+
+def test_matrix_to_html():
+    """Test the table renderer output format and fragment cache."""
+    matrix = [[0, 1, 2, 3], [16, 17, 18, 19], [160, 171, 188, 205], [238, 239, 254, 255]]
+    expected = "<table border='1'>" + "".join(
+        "<tr>" + "".join(f"<td>{hex(cell)}</td>" for cell in row) + "</tr>" for row in matrix
+    ) + "</table>"
+    MATRIX_HTML_CACHE.clear()
+    assert matrix_to_html(matrix) == expected
+    hits = MATRIX_HTML_CACHE.hits
+    assert matrix_to_html([row[:] for row in matrix]) == expected
+    assert MATRIX_HTML_CACHE.hits == hits + 1
+
+def test_metrics():
+    """Test stage histograms, counters and their Prometheus text."""
+    metrics = Metrics()
+    with metrics.stage('idle'):
+        pass
+    metrics.inc('calls')
+    assert metrics.to_prometheus().count('\n') == 4
+
+    metrics.enabled = True
+    metrics.start_request()
+    with metrics.stage('work'):
+        pass
+    metrics.observe('work', 0.002, 0.001)
+    metrics.inc('calls', 2, kind='x')
+    assert set(metrics.finish_request()) == {'work'}
+    assert metrics.finish_request() == {}
+
+    text = metrics.to_prometheus()
+    assert 'aes_stage_wall_seconds_bucket{stage="work",le="0.001"} 1' in text
+    assert 'aes_stage_wall_seconds_bucket{stage="work",le="+Inf"} 2' in text
+    assert 'aes_stage_cpu_seconds_count{stage="work"} 2' in text
+    assert 'aes_calls_total{kind="x"} 2' in text
+    assert 'idle' not in text
+    assert 'aes_cache' not in text
+
+    cache = LRUCache()
+    cache.put('a', 1)
+    cache.get('a')
+    cache.get('b')
+    metrics.register_cache('lookup', cache)
+    text = metrics.to_prometheus()
+    assert 'aes_cache_hits_total{stage="lookup"} 1' in text
+    assert 'aes_cache_misses_total{stage="lookup"} 1' in text
+    assert 'aes_cache_hit_ratio{stage="lookup"} 0.5' in text
+
+def test_trace_aes_decrypt():
+    """Test that the decryption trace retraces the encryption states in reverse."""
+    ciphertext = binascii.unhexlify(EXPECTED_OPENSSL_RESULT)
+    trace = trace_aes_decrypt(ciphertext, KEY_BYTES)
+    assert trace.meta['plaintext'] == PLAINTEXT_BYTES
+    assert trace.get(10, 'AddRoundKey')['after'] == KNOWN_MATRIX
+    assert trace.get(9, 'InvMixColumns')['after'] == AFTER_SHIFTROWS_ROUND1
+    assert trace.get(10, 'InvSubBytes')['after'] == AFTER_ROUND0
+    assert trace.rows(10, 'AddRoundKey')[0][0] == "State[0][0] ⊕ Key[0][0]"
+
+def test_decrypt_blocks():
+    """Test the NumPy batched decryption engine."""
+    pytest.importorskip("numpy")
+    rng = random.Random(5)
+    data = bytes(rng.randrange(256) for _ in range(16 * 64))
+    assert decrypt_blocks(encrypt_blocks(data, KEY_BYTES), KEY_BYTES) == data
+
+# FIPS-197 Appendix C example vectors (key, ciphertext) for plaintext 00112233...eeff
+FIPS_197_PLAINTEXT = binascii.unhexlify("00112233445566778899aabbccddeeff")
+FIPS_197_VECTORS = [
+    ("000102030405060708090a0b0c0d0e0f", "69c4e0d86a7b0430d8cdb78070b4c55a"),
+    ("000102030405060708090a0b0c0d0e0f1011121314151617", "dda97ca4864cdfe06eaf70a0ec0d7191"),
+    ("000102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f", "8ea2b7ca516745bfeafc49904b496089"),
+]
+
+@pytest.mark.parametrize("key_hex,expected_hex", FIPS_197_VECTORS)
+def test_key_sizes(key_hex, expected_hex):
+    """Test AES-128/192/256 against FIPS-197 across every engine and the traces."""
+    key = binascii.unhexlify(key_hex)
+    expected = binascii.unhexlify(expected_hex)
+    rounds = {16: 10, 24: 12, 32: 14}[len(key)]
+
+    assert len(expand_key_words(key)) == 4 * (rounds + 1)
+    assert len(expand_key(key)) == rounds + 1
+    for engine in ENGINES:
+        assert encrypt_aes(FIPS_197_PLAINTEXT, key, engine=engine) == expected
+        assert decrypt_aes(expected, key, engine=engine) == FIPS_197_PLAINTEXT
+    assert encrypt_aes(FIPS_197_PLAINTEXT, key, []) == expected
+
+    trace = trace_aes(FIPS_197_PLAINTEXT, key)
+    assert trace.meta['ciphertext'] == expected
+    assert trace.rounds() == list(range(rounds + 1))
+    assert trace.meta['key'] == bytes_to_matrix(key)
+    assert trace_aes_decrypt(expected, key).meta['plaintext'] == FIPS_197_PLAINTEXT
+
+    key_trace = Trace()
+    expand_key(key, key_trace)
+    assert key_trace.rounds() == list(range(1, rounds + 1))
+    assert key_trace.rows(1, 'KeyExpansion')[0][0] == "Round 1 Key Generation"
+
+def test_blocks_key_sizes():
+    """Test the NumPy batched engines with 192- and 256-bit keys."""
+    pytest.importorskip("numpy")
+    for key_hex, expected_hex in FIPS_197_VECTORS[1:]:
+        key, expected = binascii.unhexlify(key_hex), binascii.unhexlify(expected_hex)
+        assert encrypt_blocks(FIPS_197_PLAINTEXT * 4, key) == expected * 4
+        assert decrypt_blocks(expected * 4, key) == FIPS_197_PLAINTEXT * 4
+
+def test_aes256_key_schedule_subword():
+    """Test the extra SubWord step of the AES-256 schedule (FIPS-197 A.3, w12)."""
+    key = binascii.unhexlify("603deb1015ca71be2b73aef0857d77811f352c073b6108d72d9810a30914dff4")
+    words = expand_key_words(key)
+    assert words[8] == 0x9ba35411
+    assert words[12] == 0xa8b09c1a
+    assert words[59] == 0x706c631e
+    with pytest.raises(ValueError):
+        expand_key_words(key[:20])
+
+def test_aesavs_known_answers():
+    """Test every engine against the bundled NIST AESAVS KAT and MMT files."""
+    paths = sorted(glob.glob(os.path.join(aesavs.VECTORS_DIR, '*.rsp')))
+    report = aesavs.verify(paths, workers=1, skip_mct=True)
+    assert len(report) == 18 * len(ENGINES)
+    assert all(not failed for _, failed, _, _ in report.values())
+    assert sum(passed for passed, _, _, _ in report.values()) == 2198 * len(ENGINES)
+
+def test_aesavs_monte_carlo():
+    """Test the first Monte Carlo record of each CBC MCT file in both directions."""
+    for key_size in (128, 192, 256):
+        with open(os.path.join(aesavs.VECTORS_DIR, f'CBCMCT{key_size}.rsp')) as f:
+            records = [item for item in aesavs.parse_rsp(f) if item[1]['COUNT'] == '0']
+        assert [direction for direction, _ in records] == ['ENCRYPT', 'DECRYPT']
+        name, engine, passed, failed, blocks, _ = aesavs.run_batch(('CBCMCT', 'CBC', 'MCT', 'ttable', records))
+        assert (passed, failed, blocks) == (2, [], 2 * aesavs.MCT_ITERATIONS)
+
+def test_aesavs_monte_carlo_chain():
+    """Test the outer Monte Carlo loop: each record's inputs derive from the previous one."""
+    for key_size in (128, 192, 256):
+        with open(os.path.join(aesavs.VECTORS_DIR, f'CBCMCT{key_size}.rsp')) as f:
+            records = [item for item in aesavs.parse_rsp(f) if item[0] == 'ENCRYPT'][:3]
+        results = aesavs.check_mct('CBC', records, 'ttable')
+        assert [ok for ok, _ in results] == [True, True, True]
+
+        # A KEY that does not follow from the previous record fails that record only
+        tampered = [(direction, dict(record)) for direction, record in records]
+        tampered[1][1]['KEY'] = tampered[0][1]['KEY']
+        results = aesavs.check_mct('CBC', tampered, 'ttable')
+        assert [ok for ok, _ in results] == [True, False, True]
+
 def test_openssl_comparison():
     """Test that our implementation matches OpenSSL's output."""
     # Check if OpenSSL is available
@@ -0,0 +1,511 @@
+import pytest
+import gzip
+import asyncio
+import io
+import json
+import sys
+import os
+import zipfile
+
+# Add the parent directory to the Python path so we can import app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import app, render_cache_key, DiskRenderCache, FRAGMENT_CACHE, PackagedBytecodeCache
+from aes_lib import LRUCache, METRICS
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+# Test vectors
+PLAINTEXT = "telecommunicatio"
+KEY = "electricallycond"
+EXPECTED_OPENSSL_RESULT = "2d096dd8c7a46b5614d4f47b7161d648"
+
+FORM = {'key': KEY, 'word': PLAINTEXT}
+
+
+@pytest.fixture
+def client():
+    """Flask test client with the render cache, pre-rendered pages and HTML minification disabled."""
+    app.config['TESTING'] = True
+    app.config['RENDER_CACHE'] = ''
+    app.config['PRERENDERED'] = False
+    app.config['MINIFY_HTML'] = False
+    app.extensions.pop('render_cache', None)
+    with app.test_client() as client:
+        yield client
+    app.config['RENDER_CACHE'] = ''
+    app.extensions.pop('render_cache', None)
+
+
+def test_landing_page(client):
+    """Test that the landing page renders."""
+    response = client.get('/')
+    assert response.status_code == 200
+    assert b'<form method="POST">' in response.data
+
+
+def test_visualization_page(client):
+    """Test that a POST renders the visualisation with the expected ciphertext."""
+    response = client.post('/', data=FORM)
+    assert response.status_code == 200
+    assert EXPECTED_OPENSSL_RESULT.upper().encode() in response.data
+    assert 'ETag' not in response.headers
+
+
+def test_invalid_input(client):
+    """Test that inputs of the wrong length are rejected."""
+    response = client.post('/', data={'key': 'short', 'word': PLAINTEXT})
+    assert response.status_code == 200
+    assert b'16, 24 or 32 characters' in response.data
+
+    response = client.post('/', data={'key': KEY, 'word': 'short'})
+    assert b'exactly 16 characters' in response.data
+
+    # Lengths are counted in UTF-8 bytes: 16 characters, 17 bytes
+    non_ascii = 'é' + KEY[1:]
+    response = client.post('/', data={'key': non_ascii, 'word': PLAINTEXT})
+    assert response.status_code == 200
+    assert b'16, 24 or 32 characters' in response.data
+    for path in ('/api/trace', '/api/fragment'):
+        response = client.get(path, query_string={'key': non_ascii, 'word': PLAINTEXT, 'round': 1, 'op': 'SubBytes'})
+        assert response.status_code == 400
+    response = client.post('/api/batch', json=[{'key': KEY, 'word': 'é' + PLAINTEXT[1:]}])
+    assert response.status_code == 400
+
+
+def test_visualization_page_aes256(client):
+    """Test that a 32-character key renders all 14 rounds of AES-256."""
+    response = client.post('/', data={'key': 'electricallyconductivematerials1', 'word': PLAINTEXT})
+    assert response.status_code == 200
+    assert b'AES-256 Encryption Visualization' in response.data
+    assert b'Round 14 (Final)' in response.data
+    assert b'Show Rounds 2-13' in response.data
+    assert b'D9310A97BA827AB8213D38C10002A00F' in response.data
+
+
+def test_streamed_visualization_page(client):
+    """Test that the streamed page is chunked and identical to the rendered one."""
+    rendered = client.post('/', data=FORM).data
+
+    app.config['STREAM_HTML'] = True
+    app.config['STREAM_CHUNK_SIZE'] = 4096
+    try:
+        response = client.post('/', data=FORM)
+        assert response.is_streamed
+        chunks = list(response.response)
+    finally:
+        app.config['STREAM_HTML'] = False
+    assert len(chunks) > 1
+    assert b''.join(chunks) == rendered
+
+
+def test_lazy_details(client):
+    """Test that details and collapsed rounds are fetched and match the full page."""
+    lazy = client.post('/', data=FORM).data
+    assert b'data-fragment-url="/api/fragment?' in lazy
+    assert b'key-expansion-explanation' not in lazy
+    assert b'id="collapsedRounds"' in lazy and b'op=Rounds' in lazy
+    assert b'Round 2' not in lazy
+
+    app.config['LAZY_DETAILS'] = False
+    try:
+        full = client.post('/', data=FORM).data
+    finally:
+        app.config['LAZY_DETAILS'] = True
+    assert b'data-fragment-url' not in full
+    assert b'collapsedRounds"' not in full
+    assert len(lazy) < len(full) / 5
+
+    rounds = client.get('/api/fragment', query_string={'key': KEY, 'word': PLAINTEXT, 'op': 'Rounds'})
+    assert rounds.status_code == 200
+    assert b'rounds2to9-step' in rounds.data and b'Round 2' in rounds.data
+    assert b'Round 1<' not in rounds.data and b'Round 10' not in rounds.data
+
+    FRAGMENT_CACHE.clear()
+    query = {'key': KEY, 'word': PLAINTEXT, 'round': 3, 'op': 'KeyGeneration'}
+    response = client.get('/api/fragment', query_string=query)
+    assert response.status_code == 200
+    assert b'How Round Key 3 Is Generated' in response.data
+    assert response.data.strip() in full
+    assert client.get('/api/fragment', query_string=query).data == response.data
+    assert FRAGMENT_CACHE.stats()['hits'] == 1
+
+    for bad in ({'op': 'Nope'}, {'round': 11}, {'round': 'x'}, {'key': 'short'}):
+        assert client.get('/api/fragment', query_string={**query, **bad}).status_code == 400
+
+
+def test_memory_render_cache(client):
+    """Test the in-process render cache and the ETag short-circuit."""
+    uncached = client.post('/', data=FORM).data
+
+    cache = LRUCache(4)
+    app.config['RENDER_CACHE'] = cache
+    first = client.post('/', data=FORM)
+    second = client.post('/', data=FORM)
+    assert first.data == second.data == uncached
+    assert cache.stats()['hits'] == 1
+    assert first.headers['ETag'] == second.headers['ETag']
+
+    not_modified = client.post('/', data=FORM, headers={'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+
+
+def test_disk_render_cache(client, tmp_path):
+    """Test the on-disk render cache backend."""
+    cache = DiskRenderCache(str(tmp_path))
+    app.config['RENDER_CACHE'] = cache
+    first = client.post('/', data=FORM)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    cache_key = render_cache_key(KEY.encode(), PLAINTEXT.encode(), 2000)
+    assert cache.get(cache_key) is None
+    cache.put(cache_key, b'page')
+    assert cache.get(cache_key) == b'page'
+    assert client.post('/', data=FORM).data == first.data
+
+
+def test_precompile_templates(client, tmp_path):
+    """Test the packaged template bytecode cache."""
+    result = app.test_cli_runner().invoke(args=['precompile-templates', str(tmp_path)])
+    assert result.exit_code == 0
+    names = app.jinja_env.list_templates(extensions=['html'])
+    assert len(list(tmp_path.iterdir())) == len(names)
+
+    env = app.jinja_env.overlay(bytecode_cache=PackagedBytecodeCache(str(tmp_path)), cache_size=0)
+    with app.test_request_context():
+        assert env.get_template('landing.html').render(year=2000) == \
+            app.jinja_env.get_template('landing.html').render(year=2000)
+
+
+def test_compressed_responses(client, monkeypatch):
+    """Test minification and Accept-Encoding negotiation, with and without the render cache."""
+    monkeypatch.setitem(app.config, 'MINIFY_HTML', True)
+    full = client.post('/', data=FORM, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in full.headers
+    assert full.headers['Vary'] == 'Accept-Encoding'
+    assert b'\n    ' not in full.data
+
+    response = client.post('/', data=FORM, headers={'Accept-Encoding': 'gzip;q=1.0, br;q=0'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == full.data
+
+    monkeypatch.setitem(app.config, 'COMPRESS', False)
+    assert client.post('/', data=FORM, headers={'Accept-Encoding': 'gzip'}).data == full.data
+    monkeypatch.setitem(app.config, 'COMPRESS', True)
+
+    trace = client.get('/api/trace', query_string=FORM, headers={'Accept-Encoding': 'gzip'})
+    assert json.loads(gzip.decompress(trace.data))['ciphertext'] == EXPECTED_OPENSSL_RESULT
+
+    cache = LRUCache(8)
+    app.config['RENDER_CACHE'] = cache
+    first = client.post('/', data=FORM, headers={'Accept-Encoding': 'gzip;q=1.0, br;q=0'})
+    second = client.post('/', data=FORM, headers={'Accept-Encoding': 'gzip;q=1.0, br;q=0'})
+    assert first.data == second.data
+    assert gzip.decompress(first.data) == full.data
+    assert first.headers['ETag'].startswith('W/')
+    assert len(cache) == 2 and cache.stats()['hits'] == 2
+
+    not_modified = client.post('/', data=FORM, headers={'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304
+
+
+def test_brotli_responses(client, monkeypatch):
+    """Test that brotli is negotiated when the module is installed."""
+    brotli = pytest.importorskip('brotli')
+    monkeypatch.setitem(app.config, 'MINIFY_HTML', True)
+    full = client.post('/', data=FORM, headers={'Accept-Encoding': 'identity'})
+
+    response = client.post('/', data=FORM, headers={'Accept-Encoding': 'gzip, deflate, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert brotli.decompress(response.data) == full.data
+
+
+def test_prerendered_pages(client, tmp_path, monkeypatch):
+    """Test that pre-rendered vectors are served from the files built by `flask prerender`."""
+    monkeypatch.setitem(app.config, 'MINIFY_HTML', True)
+    dynamic = client.post('/', data=FORM).data
+    result = app.test_cli_runner().invoke(args=['prerender', '--output', str(tmp_path)])
+    assert result.exit_code == 0
+    assert (tmp_path / 'manifest.json').exists()
+
+    monkeypatch.setitem(app.config, 'PRERENDERED', True)
+    monkeypatch.setitem(app.config, 'PRERENDER_DIR', str(tmp_path))
+    monkeypatch.setitem(app.extensions, 'prerendered', {})
+    plain = client.post('/', data=FORM)
+    assert plain.data == dynamic
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+    assert 'Content-Encoding' not in plain.headers
+
+    compressed = client.post('/', data=FORM, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+
+    not_modified = client.post('/', data=FORM, headers={'If-None-Match': plain.headers['ETag']})
+    assert not_modified.status_code == 304
+
+    other = client.post('/', data={'key': KEY, 'word': 'not pre-rendered'})
+    assert other.status_code == 200
+    assert 'ETag' not in other.headers
+
+
+def test_prerendered_brotli(client, tmp_path, monkeypatch):
+    """Test that `flask prerender` writes brotli copies and that they are served."""
+    brotli = pytest.importorskip('brotli')
+    monkeypatch.setitem(app.config, 'MINIFY_HTML', True)
+    dynamic = client.post('/', data=FORM).data
+    result = app.test_cli_runner().invoke(args=['prerender', '--output', str(tmp_path)])
+    assert result.exit_code == 0
+    assert list(tmp_path.glob('*.br'))
+
+    monkeypatch.setitem(app.config, 'PRERENDERED', True)
+    monkeypatch.setitem(app.config, 'PRERENDER_DIR', str(tmp_path))
+    monkeypatch.setitem(app.extensions, 'prerendered', {})
+    response = client.post('/', data=FORM, headers={'Accept-Encoding': 'br, gzip'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data) == dynamic
+
+
+def test_metrics(client, monkeypatch):
+    """Test the Server-Timing header and the /metrics endpoint."""
+    assert client.get('/metrics').status_code == 404
+    assert 'Server-Timing' not in client.post('/', data=FORM).headers
+
+    monkeypatch.setattr(METRICS, 'enabled', True)
+    METRICS.reset()
+    response = client.post('/', data=FORM)
+    timing = response.headers['Server-Timing']
+    for stage in ('trace', 'build_steps', 'render_template', 'request'):
+        assert f'{stage};dur=' in timing
+
+    # Streamed pages render after the headers: no header, recorded at teardown
+    app.config['STREAM_HTML'] = True
+    try:
+        response = client.post('/', data=FORM)
+        assert 'Server-Timing' not in response.headers
+        assert EXPECTED_OPENSSL_RESULT.upper().encode() in response.data
+        response.close()
+    finally:
+        app.config['STREAM_HTML'] = False
+
+    text = client.get('/metrics').data.decode('utf-8')
+    assert 'aes_stage_wall_seconds_count{stage="render_template"} 1' in text
+    assert 'aes_stage_wall_seconds_count{stage="request"} 2' in text
+    assert 'aes_template_renders_total{template="visualize.html"} 1' in text
+    assert 'aes_requests_total{endpoint="index",status="200"} 2' in text
+    assert 'aes_trace_records_total ' in text
+    assert 'aes_cache_hit_ratio{stage="round"}' in text
+    METRICS.reset()
+
+
+def test_api_trace(client):
+    """Test the JSON trace endpoint."""
+    response = client.get('/api/trace', query_string=FORM)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert b'<' not in response.data
+
+    trace = json.loads(response.data)
+    assert trace['direction'] == 'encrypt'
+    assert trace['plaintext'] == PLAINTEXT.encode().hex()
+    assert trace['ciphertext'] == EXPECTED_OPENSSL_RESULT
+    assert trace['input'] == trace['rounds'][0]['steps'][0]['before']
+    assert len(trace['round_keys']) == 11
+    assert [r['round'] for r in trace['rounds']] == list(range(11))
+    assert [s['op'] for s in trace['rounds'][1]['steps']] == ['SubBytes', 'ShiftRows', 'MixColumns', 'AddRoundKey']
+    assert [s['op'] for s in trace['rounds'][10]['steps']] == ['SubBytes', 'ShiftRows', 'AddRoundKey']
+
+    # Each step starts from the state the previous step produced
+    states = [s for r in trace['rounds'] for s in r['steps']]
+    for prev, step in zip(states, states[1:]):
+        assert step['before'] == prev['after']
+
+    # JSON bodies are accepted too
+    assert client.post('/api/trace', json=FORM).data == response.data
+
+
+def test_api_trace_decrypt(client):
+    """Test tracing decryption through the inverse rounds."""
+    response = client.get('/api/trace', query_string={'key': KEY, 'ciphertext': EXPECTED_OPENSSL_RESULT})
+    assert response.status_code == 200
+
+    trace = json.loads(response.data)
+    assert bytes.fromhex(trace['plaintext']).decode() == PLAINTEXT
+    assert trace['ciphertext'] == EXPECTED_OPENSSL_RESULT
+    assert trace['direction'] == 'decrypt'
+    assert trace['input'] == trace['rounds'][0]['steps'][0]['before']
+
+    # Same document shape in both directions
+    encrypted = json.loads(client.get('/api/trace', query_string=FORM).data)
+    assert trace.keys() == encrypted.keys()
+    assert {name: type(value) for name, value in trace.items()} == \
+        {name: type(value) for name, value in encrypted.items()}
+    assert [s['op'] for s in trace['rounds'][1]['steps']] == ['InvShiftRows', 'InvSubBytes', 'AddRoundKey', 'InvMixColumns']
+    assert [s['op'] for s in trace['rounds'][10]['steps']] == ['InvShiftRows', 'InvSubBytes', 'AddRoundKey']
+
+    response = client.get('/api/trace', query_string={'key': KEY, 'ciphertext': 'zz'})
+    assert response.status_code == 400
+
+
+def test_api_trace_invalid_input(client):
+    """Test that the JSON trace endpoint rejects invalid input."""
+    response = client.post('/api/trace', json={'key': KEY, 'word': 'short'})
+    assert response.status_code == 400
+    assert 'error' in json.loads(response.data)
+
+    # Bodies of the wrong JSON type
+    for body in ([KEY, PLAINTEXT], {'key': KEY, 'word': 1234}, {'key': None, 'word': PLAINTEXT},
+                 {'key': KEY, 'ciphertext': 1234}, {'key': KEY, 'ciphertext': ['00'] * 16}):
+        response = client.post('/api/trace', json=body)
+        assert response.status_code == 400, body
+        assert 'error' in json.loads(response.data)
+
+
+def test_api_batch(client):
+    """Test the batch endpoint with JSON, CSV and ZIP output."""
+    other = {'key': 'Thats my Kung Fu', 'word': 'Two One Nine Two'}
+    response = client.post('/api/batch', json=[FORM, other, [KEY, PLAINTEXT]])
+    assert response.status_code == 200
+    body = json.loads(response.data)
+    assert (body['count'], body['unique']) == (3, 2)
+    assert [r['ciphertext'] for r in body['results']] == [
+        EXPECTED_OPENSSL_RESULT, '29c3505f571420f6402299b31a02d73a', EXPECTED_OPENSSL_RESULT]
+
+    # CSV bodies and uploads, with an optional header row
+    csv_body = f"key,word\n{KEY},{PLAINTEXT}\n"
+    response = client.post('/api/batch', data=csv_body, content_type='text/csv')
+    assert json.loads(response.data)['results'][0]['ciphertext'] == EXPECTED_OPENSSL_RESULT
+    response = client.post('/api/batch', data={'file': (io.BytesIO(csv_body.encode()), 'pairs.csv')})
+    assert json.loads(response.data)['count'] == 1
+
+    response = client.post('/api/batch?format=zip', json=[FORM, other])
+    assert response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.namelist() == ['001.html', '002.html', 'index.json']
+        assert EXPECTED_OPENSSL_RESULT.upper().encode() in archive.read('001.html')
+        assert json.loads(archive.read('index.json'))[1]['key'] == other['key']
+
+
+def test_api_batch_limits(client):
+    """Test that the batch endpoint rejects invalid and oversized batches."""
+    response = client.post('/api/batch', json=[FORM, {'key': KEY, 'word': 'short'}])
+    assert response.status_code == 400
+    assert json.loads(response.data)['error'].startswith('Pair 2:')
+    assert client.post('/api/batch', json=[]).status_code == 400
+    assert client.post('/api/batch', data='a,b,c', content_type='text/csv').status_code == 400
+
+    max_pairs = app.config['BATCH_MAX_PAIRS']
+    app.config['BATCH_MAX_PAIRS'] = 1
+    try:
+        assert client.post('/api/batch', json=[FORM, FORM]).status_code == 413
+    finally:
+        app.config['BATCH_MAX_PAIRS'] = max_pairs
+    assert client.post('/api/batch', json=[FORM] * 5000).status_code == 413
+
+    # Chunked bodies have no Content-Length but are capped all the same
+    for content_type in ('application/json', 'text/csv'):
+        # One valid pair padded past the byte limit
+        pair = json.dumps([FORM]) if content_type == 'application/json' else f"{KEY},{PLAINTEXT}"
+        body = pair + '\n' * app.config['BATCH_MAX_BYTES']
+        environ = EnvironBuilder('/api/batch', method='POST', data=body, content_type=content_type).get_environ()
+        del environ['CONTENT_LENGTH']
+        environ['wsgi.input_terminated'] = True
+        assert client.open(Request(environ)).status_code == 413
+    csv_upload = io.BytesIO(f"{KEY},{PLAINTEXT}".encode() + b'\n' * app.config['BATCH_MAX_BYTES'])
+    assert client.post('/api/batch', data={'file': (csv_upload, 'pairs.csv')}).status_code == 413
+
+
+def asgi_request(application, method, path, body=b'', headers=()):
+    """Send one request through an ASGI app; returns (status, headers, body)."""
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'root_path': '',
+             'headers': [(name.encode(), value.encode()) for name, value in headers]}
+    messages = [{'type': 'http.request', 'body': body}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return sent[0]['status'], dict(sent[0]['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def test_asgi(client):
+    """Test the ASGI entry point: app routes, static files and back-pressure."""
+    from asgi import AsgiApp
+    application = AsgiApp(app, app.static_folder, app.static_url_path, workers=4)
+    form = f"key={KEY}&word={PLAINTEXT}".encode()
+    status, headers, body = asgi_request(application, 'POST', '/', form,
+                                         [('content-type', 'application/x-www-form-urlencoded')])
+    assert status == 200
+    assert EXPECTED_OPENSSL_RESULT.upper().encode() in body
+
+    # Concurrent streamed pages arrive chunk by chunk, each chunk produced on
+    # whichever worker is free
+    async def streamed_page():
+        scope = {'type': 'http', 'method': 'POST', 'path': '/', 'query_string': b'',
+                 'headers': [(b'content-type', b'application/x-www-form-urlencoded')]}
+        messages = [{'type': 'http.request', 'body': form}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            await asyncio.sleep(0)
+
+        await application(scope, receive, send)
+        return sent
+
+    async def streamed_pages():
+        return await asyncio.gather(*[streamed_page() for _ in range(8)])
+
+    app.config['STREAM_HTML'] = True
+    try:
+        pages = asyncio.run(streamed_pages())
+    finally:
+        app.config['STREAM_HTML'] = False
+    for sent in pages:
+        assert sent[0]['status'] == 200
+        assert len(sent) > 3
+        assert EXPECTED_OPENSSL_RESULT.upper().encode() in b''.join(m.get('body', b'') for m in sent[1:])
+
+    application = AsgiApp(app, app.static_folder, app.static_url_path, workers=1, queue_depth=0)
+
+    status, headers, body = asgi_request(application, 'GET', '/static/css/styles.css')
+    assert status == 200
+    assert headers[b'content-type'] == b'text/css; charset=utf-8'
+    assert asgi_request(application, 'GET', '/static/css/styles.css',
+                        headers=[('if-none-match', headers[b'etag'].decode())])[0] == 304
+    assert asgi_request(application, 'GET', '/static/../app.py')[0] == 404
+
+    application.max_body = 10
+    assert asgi_request(application, 'POST', '/', form)[0] == 413
+
+    # With the only worker busy and no queue, further requests are turned away
+    async def overloaded():
+        application._loop, application._slots = asyncio.get_running_loop(), asyncio.Semaphore(1)
+        await application._slots.acquire()
+        scope = {'type': 'http', 'method': 'GET', 'path': '/', 'query_string': b'', 'headers': []}
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            sent.append(message)
+
+        await application(scope, receive, send)
+        return sent[0]
+
+    response = asyncio.run(overloaded())
+    assert response['status'] == 503
+    assert (b'retry-after', b'1') in response['headers']
+
+
+if __name__ == "__main__":
+    # Run the tests
+    pytest.main(["-v", __file__])